@@ -0,0 +1,162 @@
+"""Admission control for the upstream-bound endpoints.
+
+- RateLimiter: per-client token buckets.
+- AdmissionController: at most max_concurrent requests run at once; up to
+  max_queue more wait (highest priority first) for at most max_wait
+  seconds. Anything beyond that is rejected immediately so clients get a
+  fast "busy" answer with Retry-After instead of a gateway timeout.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Priority classes (lower runs first)
+PRIORITY_INTERACTIVE = 0  # short texts
+PRIORITY_NORMAL = 1       # regular texts, short recordings
+PRIORITY_BULK = 2         # long texts and long audio
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token bucket per client (refill `rate` tokens/second up to `burst`)."""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, client, cost=1.0):
+        """Take `cost` tokens; returns (allowed, retry_after_seconds)."""
+        if self.rate <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil((cost - tokens) / self.rate))
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'event', 'granted', 'cancelled')
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded priority wait queue."""
+
+    def __init__(self, max_concurrent=4, max_queue=16, max_wait=10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []
+        self._queued = [0, 0, 0]
+        self._seq = itertools.count()
+        # Moving average of service time, for Retry-After estimates
+        self._avg_service = 1.0
+        self._counters = {
+            'admitted': 0,
+            'queued': 0,
+            'rejected_queue_full': 0,
+            'rejected_timeout': 0,
+            'wait_seconds_total': 0.0,
+        }
+
+    def _retry_after(self):
+        backlog = self._active + sum(self._queued)
+        return max(1, math.ceil(self._avg_service * backlog / self.max_concurrent))
+
+    def acquire(self, priority=PRIORITY_NORMAL):
+        """Wait for a slot; returns seconds waited or raises Overloaded."""
+        priority = min(max(priority, 0), len(self._queued) - 1)
+        with self._lock:
+            if self._active < self.max_concurrent and not sum(self._queued):
+                self._active += 1
+                self._counters['admitted'] += 1
+                return 0.0
+            if sum(self._queued) >= self.max_queue:
+                self._counters['rejected_queue_full'] += 1
+                raise Overloaded('queue full', self._retry_after())
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+            self._queued[priority] += 1
+            self._counters['queued'] += 1
+
+        start = time.monotonic()
+        waiter.event.wait(self.max_wait)
+        waited = time.monotonic() - start
+        with self._lock:
+            if not waiter.granted:
+                # Timed out; the entry is skipped when it reaches the head
+                waiter.cancelled = True
+                self._queued[priority] -= 1
+                self._counters['rejected_timeout'] += 1
+                raise Overloaded('queue wait timeout', self._retry_after())
+            self._counters['admitted'] += 1
+            self._counters['wait_seconds_total'] += waited
+        return waited
+
+    def release(self, service_seconds=None):
+        """Free a slot, handing it to the highest-priority waiter if any."""
+        with self._lock:
+            if service_seconds is not None:
+                self._avg_service = 0.9 * self._avg_service + 0.1 * service_seconds
+            while self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._queued[waiter.priority] -= 1
+                waiter.event.set()
+                return
+            self._active -= 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update(
+                active=self._active,
+                max_concurrent=self.max_concurrent,
+                queue_length=sum(self._queued),
+                queue_by_priority={
+                    'interactive': self._queued[PRIORITY_INTERACTIVE],
+                    'normal': self._queued[PRIORITY_NORMAL],
+                    'bulk': self._queued[PRIORITY_BULK],
+                },
+                max_queue=self.max_queue,
+                max_wait_seconds=self.max_wait,
+                avg_service_seconds=round(self._avg_service, 3)
+            )
+        stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 3)
+        return stats
@@ -1,37 +1,88 @@
-from flask import Flask, request, jsonify, render_template
-from deep_translator import GoogleTranslator
-from gtts import gTTS
+from flask import Flask, Request, request, jsonify, render_template, Response, stream_with_context, g, send_file
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
-import tempfile
 import base64
-import speech_recognition as sr
-from werkzeug.utils import secure_filename
 import logging
 import json
 from datetime import datetime
-from functools import lru_cache
+from functools import lru_cache, wraps
 import time
-from pydub import AudioSegment
-import imageio_ffmpeg
 import io
+import threading
+import hmac
+import uuid
+import select
+import socket
+import itertools
+import contextvars
+import math
+from collections import deque
+from cache_backends import create_cache, make_cache_key
+from translation_memory import TranslationMemory, diff_segments, split_sentences
+from long_text import MAX_CHUNK_CHARS, iter_chunks, iter_text_blocks, map_ordered, translate_ordered
+from subtitles import (
+    FORMATS as SUBTITLE_FORMATS, MAX_BATCH_CUES, MIMETYPES as SUBTITLE_MIMETYPES,
+    Cue, batch_cues, format_item, read_subtitles, speech_text
+)
+from audio_formats import AUDIO_FORMATS, DEFAULT_FORMAT, negotiate_format, transcode_mp3
+from metrics import metrics
+from http_caching import IMMUTABLE_CACHE_CONTROL, apply_http_caching, content_etag
+from warmup import TrafficStats, acquire_warmup_lock, run_warmup
+from tracing import Tracer, create_exporter, install_log_record_trace_ids, span
+from profiling import SamplingProfiler
+from language_id import identify_language
+from recognition_race import race_recognition
+from audio_ingest import AudioIngest, UploadRejected, read_multipart, sniff_container
+from single_flight import SharedFlight
+from jobs import FINISHED_STATUSES, STATUS_SUCCEEDED, JobStore
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from admission import (
+    PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_NORMAL,
+    AdmissionController, Overloaded, RateLimiter
+)
+
+# Heavy dependencies (deep_translator, gtts, speech_recognition, pydub,
+# imageio_ffmpeg) are imported on first use so that a cold worker can serve
+# /healthz immediately. Call warm_up() to load them ahead of traffic.
+
+# Bulk job uploads (/jobs) may be larger than other request bodies
+JOB_MAX_UPLOAD_BYTES = int(os.environ.get('JOB_MAX_UPLOAD_BYTES', 512 * 1024 * 1024))
+# Upload budget for /speech-to-text, enforced while the audio streams in
+MAX_AUDIO_UPLOAD_BYTES = int(os.environ.get('MAX_AUDIO_UPLOAD_BYTES', 16 * 1024 * 1024))
+# Room for the multipart headers and form fields around the audio
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+ENDPOINT_MAX_CONTENT_LENGTH = {
+    'create_job': JOB_MAX_UPLOAD_BYTES,
+    'speech_to_text': MAX_AUDIO_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+}
+
+class AppRequest(Request):
+    """Request whose body size limit can be raised per endpoint."""
+
+    @property
+    def max_content_length(self):
+        limit = ENDPOINT_MAX_CONTENT_LENGTH.get(self.endpoint)
+        return limit if limit is not None else super().max_content_length
 
 app = Flask(__name__, template_folder='templates')
+app.request_class = AppRequest
+
+# Number of proxies in front of the app (Render's load balancer is one).
+# Each appends the address it saw to X-Forwarded-For, so only the last
+# TRUSTED_PROXY_HOPS entries are trustworthy; earlier ones are client-set.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
 app.logger.setLevel(logging.DEBUG)
 
 # Setup logging formatter
+install_log_record_trace_ids()
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s',
     level=logging.INFO
 )
 
-# Configure pydub to use bundled ffmpeg (via imageio-ffmpeg)
-try:
-    ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
-    AudioSegment.converter = ffmpeg_path
-except Exception as e:
-    # Log and proceed; conversion will be skipped if not available
-    logging.warning(f"FFmpeg binary not found via imageio-ffmpeg: {e}")
-
 # Configure upload folder
 UPLOAD_FOLDER = '/tmp/audio_uploads'
 if not os.path.exists(UPLOAD_FOLDER):
@@ -57,16 +108,240 @@ LANGUAGE_CODES = {
     "Gujarati": "gu",
     "Punjabi": "pa"
 }
+LANGUAGE_NAMES = {code: name for name, code in LANGUAGE_CODES.items()}
+
+# Locales passed to Google speech recognition per language code
+SPEECH_LOCALES = {
+    "en": "en-US",
+    "hi": "hi-IN",
+    "bn": "bn-IN",
+    "es": "es-ES",
+    "zh-CN": "zh-CN",
+    "ru": "ru-RU",
+    "ja": "ja-JP",
+    "ko": "ko-KR",
+    "de": "de-DE",
+    "fr": "fr-FR",
+    "ta": "ta-IN",
+    "te": "te-IN",
+    "kn": "kn-IN",
+    "gu": "gu-IN",
+    "pa": "pa-Guru-IN"
+}
+
+MAX_AUDIO_SECONDS = float(os.environ.get('MAX_AUDIO_SECONDS', 120))
 
+# Speech-to-text results by upload content hash and languages: [text, language]
+transcription_cache = create_cache(
+    'transcriptions', max_entries=int(os.environ.get('TRANSCRIPTION_CACHE_ENTRIES', 2000))
+)
+# Retries of an upload that is still being processed wait for the original,
+# in any worker: the leader holds a lease row in transcription_cache
+TRANSCRIPTION_WAIT_SECONDS = float(os.environ.get('TRANSCRIPTION_WAIT_SECONDS', 60))
+transcription_flights = SharedFlight(
+    transcription_cache,
+    lease_seconds=float(os.environ.get('TRANSCRIPTION_LEASE_SECONDS', 2 * MAX_AUDIO_SECONDS))
+)
+
+# Recognition races: several candidate languages recognized concurrently;
+# the first result at RECOGNITION_RACE_MIN_CONFIDENCE wins
+RECOGNITION_RACE_MAX_LANGUAGES = int(os.environ.get('RECOGNITION_RACE_MAX_LANGUAGES', 3))
+RECOGNITION_RACE_MIN_CONFIDENCE = float(os.environ.get('RECOGNITION_RACE_MIN_CONFIDENCE', 0.8))
+recognition_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('RECOGNITION_RACE_WORKERS', 8)), thread_name_prefix='recognize'
+)
+
+# 'auto' sources identified locally with at least this confidence skip
+# upstream detection
+LANGID_MIN_CONFIDENCE = float(os.environ.get('LANGID_MIN_CONFIDENCE', 0.9))
+
+# Caches shared by all workers on the host (see cache_backends.py)
 # TTS Cache: (text, lang) -> base64 audio
-tts_cache = {}
-MAX_CACHE_SIZE = 100
+# Translation Cache: (text, from_lang, to_lang) -> translated text
+MAX_CACHE_SIZE = int(os.environ.get('CACHE_MAX_ENTRIES', 1000))
+tts_cache = create_cache('tts', max_entries=MAX_CACHE_SIZE)
+translation_cache = create_cache('translations', max_entries=MAX_CACHE_SIZE)
+
+# Sentence-level translation memory: sentence -> translation, plus an
+# in-process near-duplicate index (see translation_memory.py)
+TM_MAX_SENTENCES = int(os.environ.get('TM_MAX_SENTENCES', 20000))
+translation_memory = TranslationMemory(
+    create_cache('translation_memory', max_entries=TM_MAX_SENTENCES)
+)
+
+# Request counts of short phrases, used to warm caches after a restart
+traffic_stats = TrafficStats(os.environ.get('TRAFFIC_STATS_PATH', '/tmp/linguasync_stats.sqlite3'))
+
+# Admission control for upstream-bound endpoints (per worker)
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('ADMISSION_MAX_CONCURRENT', 4)),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', 16)),
+    max_wait=float(os.environ.get('ADMISSION_MAX_WAIT', 10))
+)
+rate_limiter = RateLimiter(
+    rate=float(os.environ.get('RATE_LIMIT_PER_MINUTE', 60)) / 60.0,
+    burst=float(os.environ.get('RATE_LIMIT_BURST', 20))
+)
+
+# Long-document mode: number of chunks translated in parallel per request
+LONG_TEXT_CONCURRENCY = int(os.environ.get('LONG_TEXT_CONCURRENCY', 4))
+
+# Subtitle dubbing: per-cue speech synthesis shared by all requests
+SUBTITLE_TTS_WORKERS = int(os.environ.get('SUBTITLE_TTS_WORKERS', 4))
+subtitle_tts_pool = ThreadPoolExecutor(max_workers=SUBTITLE_TTS_WORKERS, thread_name_prefix='subtitle-tts')
+
+# Typical size of an SRT/WebVTT cue, for estimating the cues in a raw upload
+SUBTITLE_CUE_BYTES = 64
+
+# Multi-target fan-out: targets translated and synthesized at once per request
+FANOUT_CONCURRENCY = int(os.environ.get('FANOUT_CONCURRENCY', 4))
+
+# Bulk jobs: state and files on the persistent disk, run by jobs_worker.py
+job_store = JobStore(os.environ.get('JOBS_DIR', '/tmp/linguasync_jobs'))
+JOB_KINDS = ('translate', 'transcribe')
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+# Server-Sent Events: poll interval and how long one stream stays open
+# (EventSource reconnects by itself). Each open stream holds one of the
+# worker's gunicorn threads, so at most JOB_EVENTS_MAX_STREAMS stay open per
+# worker; beyond that a request gets the current status once and is told to
+# reconnect after JOB_EVENTS_BUSY_RETRY_MS, which turns it into polling
+JOB_EVENTS_POLL_SECONDS = float(os.environ.get('JOB_EVENTS_POLL_SECONDS', 1.0))
+JOB_EVENTS_MAX_SECONDS = float(os.environ.get('JOB_EVENTS_MAX_SECONDS', 25))
+JOB_EVENTS_MAX_STREAMS = int(os.environ.get(
+    'JOB_EVENTS_MAX_STREAMS', max(1, int(os.environ.get('GUNICORN_THREADS', 8)) // 4)
+))
+JOB_EVENTS_RETRY_MS = 1000
+JOB_EVENTS_BUSY_RETRY_MS = int(os.environ.get('JOB_EVENTS_BUSY_RETRY_MS', 5000))
+job_event_streams = threading.BoundedSemaphore(JOB_EVENTS_MAX_STREAMS)
+
+# Request tracing: TRACE_EXPORT=file:/path.jsonl or http://collector/path
+tracer = Tracer(
+    create_exporter(os.environ.get('TRACE_EXPORT', '')),
+    slow_threshold=float(os.environ.get('SLOW_REQUEST_SECONDS', 2.0)),
+    slow_log_path=os.environ.get('SLOW_REQUEST_LOG')
+)
+
+# Opt-in sampling profiler; PROFILE_TOKEN protects /debug/profile and the
+# X-Profile request header (both are disabled when it is unset)
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DUMP_DIR = os.environ.get('PROFILE_DUMP_DIR', '/tmp/linguasync_profiles')
+profiler = SamplingProfiler(
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000,
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+)
+
+# Incremental translation documents: document id -> JSON state
+# {version, from_lang, to_lang, segments: [[sentence, trailing, translation]]}
+document_store = create_cache(
+    'documents', max_entries=int(os.environ.get('DOCUMENT_MAX_ENTRIES', 1000))
+)
+
+_ffmpeg_configured = False
+
+def get_audio_segment():
+    """Import pydub lazily and point it at the bundled ffmpeg binary once."""
+    global _ffmpeg_configured
+    from pydub import AudioSegment
+
+    if not _ffmpeg_configured:
+        _ffmpeg_configured = True
+        # Configure pydub to use bundled ffmpeg (via imageio-ffmpeg)
+        try:
+            import imageio_ffmpeg
+            AudioSegment.converter = imageio_ffmpeg.get_ffmpeg_exe()
+        except Exception as e:
+            # Log and proceed; conversion will be skipped if not available
+            logging.warning(f"FFmpeg binary not found via imageio-ffmpeg: {e}")
+    return AudioSegment
+
+def get_ffmpeg_path():
+    """Path of the bundled ffmpeg binary (resolved by get_audio_segment)."""
+    return get_audio_segment().converter
+
+def warm_up():
+    """Import heavy dependencies and resolve ffmpeg ahead of the first request."""
+    start_time = time.time()
+    import deep_translator  # noqa: F401
+    import gtts  # noqa: F401
+    import speech_recognition  # noqa: F401
+    get_audio_segment()
+    app.logger.info(f"Warm-up completed in {time.time() - start_time:.2f}s")
+
+def warm_phrase(text, from_lang, to_lang):
+    """Fill translation and TTS caches for one phrase; True if upstream was called."""
+    called_upstream = False
+    translated_text = get_cached_translation(text, from_lang, to_lang)
+    if not translated_text:
+        translated_text, tm_counts = translation_memory.translate(
+            text, from_lang, to_lang,
+            lambda chunk: translate_with_retry(chunk, from_lang, to_lang)
+        )
+        called_upstream = tm_counts['upstream_characters'] > 0
+        if not translated_text:
+            return called_upstream
+        cache_translation(text, from_lang, to_lang, translated_text)
+    if not get_cached_tts(translated_text, to_lang):
+        synthesize_speech(translated_text, to_lang)
+        called_upstream = True
+    return called_upstream
+
+def start_cache_warmup():
+    """Pre-fill caches from recent traffic in a background thread.
+
+    Only one worker per host runs it. Limits come from WARMUP_TOP_N (phrases
+    per language pair), WARMUP_RATE (upstream calls per second) and
+    WARMUP_MAX_CALLS.
+    """
+    lock_file = acquire_warmup_lock(os.environ.get('WARMUP_LOCK_PATH', '/tmp/linguasync_warmup.lock'))
+    if lock_file is None:
+        return None
 
-def get_temp_filepath(prefix='audio_', suffix='.wav'):
-    """Generate a temporary file path."""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-    filename = f"{prefix}{timestamp}{suffix}"
-    return os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    def run():
+        try:
+            start_time = time.time()
+            checked, calls = run_warmup(
+                traffic_stats, warm_phrase,
+                per_pair=int(os.environ.get('WARMUP_TOP_N', 50)),
+                calls_per_second=float(os.environ.get('WARMUP_RATE', 1.0)),
+                max_calls=int(os.environ.get('WARMUP_MAX_CALLS', 500))
+            )
+            app.logger.info(
+                f"Cache warm-up checked {checked} phrases with {calls} upstream calls "
+                f"in {time.time() - start_time:.1f}s"
+            )
+        except Exception as e:
+            app.logger.warning(f"Cache warm-up failed: {e}")
+        finally:
+            lock_file.close()
+
+    thread = threading.Thread(target=run, name='cache-warmup', daemon=True)
+    thread.start()
+    return thread
+
+def save_cache_snapshots():
+    """Persist traffic stats and in-memory caches before shutdown."""
+    traffic_stats.flush()
+    for cache in (tts_cache, translation_cache, translation_memory.cache, document_store, transcription_cache):
+        try:
+            saved = cache.snapshot()
+            if saved:
+                app.logger.info(f"Saved {saved} entries of cache '{cache.name}'")
+        except Exception as e:
+            app.logger.warning(f"Could not snapshot cache '{cache.name}': {e}")
+
+def dump_profiles():
+    """Write collected profiler samples to PROFILE_DUMP_DIR before shutdown."""
+    if not profiler.profiled_requests:
+        return
+    try:
+        for path in profiler.dump(PROFILE_DUMP_DIR):
+            app.logger.info(f"Saved profile {path}")
+    except OSError as e:
+        app.logger.warning(f"Could not save profiles: {e}")
+
+def has_debug_token(value):
+    """Check a debug token against PROFILE_TOKEN (never matches when unset)."""
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(value or '', PROFILE_TOKEN)
 
 def cleanup_old_files(max_age_seconds=3600):
     """Remove audio files older than max_age_seconds."""
@@ -81,40 +356,414 @@ def cleanup_old_files(max_age_seconds=3600):
     except Exception as e:
         app.logger.warning(f"Error cleaning up old files: {e}")
 
-def convert_audio_to_wav(audio_data, input_format):
-    """Convert various audio formats to WAV for speech recognition."""
-    try:
-        # Try to load the audio
-        audio = AudioSegment.from_file(io.BytesIO(audio_data), format=input_format.replace('audio/', '').split(';')[0])
-        
-        # Convert to WAV format (mono, 16kHz)
-        wav_audio = audio.set_channels(1).set_frame_rate(16000)
-        
-        # Export to bytes
-        wav_buffer = io.BytesIO()
-        wav_audio.export(wav_buffer, format='wav')
-        wav_buffer.seek(0)
-        return wav_buffer.read()
-    except Exception as e:
-        app.logger.warning(f"Could not convert audio format: {e}. Attempting direct recognition...")
-        return audio_data
-
 def cache_tts(text, lang_code, audio_base64):
-    """Cache TTS result with LRU eviction."""
-    global tts_cache
-    
-    cache_key = (text[:100], lang_code)  # Limit key size
-    
-    if len(tts_cache) >= MAX_CACHE_SIZE:
-        # Remove oldest entry (simple FIFO)
-        tts_cache.pop(next(iter(tts_cache)))
-    
-    tts_cache[cache_key] = audio_base64
+    """Cache TTS result (the backend handles LRU eviction)."""
+    tts_cache.set(audio_cache_key(text, lang_code), audio_base64)
 
 def get_cached_tts(text, lang_code):
     """Retrieve cached TTS audio."""
-    cache_key = (text[:100], lang_code)
-    return tts_cache.get(cache_key)
+    with span('cache.tts') as attrs:
+        audio_base64 = tts_cache.get(audio_cache_key(text, lang_code))
+        attrs['hit'] = audio_base64 is not None
+    return audio_base64
+
+def cache_translation(text, from_lang, to_lang, translated_text):
+    """Cache a translation result."""
+    translation_cache.set(make_cache_key(text, from_lang, to_lang), translated_text)
+
+def get_cached_translation(text, from_lang, to_lang):
+    """Retrieve a cached translation."""
+    with span('cache.translation') as attrs:
+        translated_text = translation_cache.get(make_cache_key(text, from_lang, to_lang))
+        attrs['hit'] = translated_text is not None
+    return translated_text
+
+def get_language_codes(from_lang_name, to_lang_name):
+    """Map language names from a request to (from_lang, to_lang) codes."""
+    from_lang = LANGUAGE_CODES.get(from_lang_name, 'en') if from_lang_name != 'auto' else 'auto'
+    to_lang = LANGUAGE_CODES.get(to_lang_name, 'en')
+    return from_lang, to_lang
+
+def resolve_source_language(from_lang, text):
+    """Replace an 'auto' source with a locally identified language code.
+
+    Stays 'auto' (upstream detection) when the text is too short or
+    ambiguous to identify confidently.
+    """
+    if from_lang != 'auto':
+        return from_lang
+    with span('language_id') as attrs:
+        lang, confidence = identify_language(text, LANGUAGE_NAMES)
+        attrs.update(lang=lang, confidence=round(confidence, 3))
+    if lang is not None and confidence >= LANGID_MIN_CONFIDENCE:
+        metrics.incr('langid_local')
+        return lang
+    metrics.incr('langid_upstream')
+    return 'auto'
+
+def speech_language_code(value):
+    """Language code for a language name or code, or None if unsupported."""
+    value = (value or '').strip()
+    if value in LANGUAGE_CODES:
+        return LANGUAGE_CODES[value]
+    if value in LANGUAGE_NAMES:
+        return value
+    return None
+
+def accepted_speech_languages():
+    """Supported language codes from Accept-Language, most preferred first."""
+    codes = []
+    for value, _ in request.accept_languages:
+        code = speech_language_code(value) or speech_language_code(value.split('-')[0])
+        if code is None and value.lower().startswith('zh'):
+            code = 'zh-CN'
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+def get_speech_language(fields):
+    """Language code for speech recognition.
+
+    Uses the upload's `language` field (a name from LANGUAGE_CODES or a
+    code); for 'auto' or none, the best Accept-Language match, else English.
+    """
+    code = speech_language_code(fields.get('language'))
+    if code:
+        return code
+    accepted = accepted_speech_languages()
+    return accepted[0] if accepted else 'en'
+
+def get_race_languages(language, fields):
+    """Candidate languages for a recognition race, `language` first.
+
+    Taken from the `candidates` field (comma-separated names or codes), else
+    from Accept-Language plus English; at most RECOGNITION_RACE_MAX_LANGUAGES.
+    """
+    requested = fields.get('candidates')
+    if requested:
+        extra = [speech_language_code(value) for value in requested.split(',')]
+    else:
+        extra = accepted_speech_languages() + ['en']
+    languages = [language]
+    for code in extra:
+        if code and code not in languages:
+            languages.append(code)
+    return languages[:RECOGNITION_RACE_MAX_LANGUAGES]
+
+def translate_with_retry(text, from_lang, to_lang, max_retries=2):
+    """Translate text upstream, retrying on failure."""
+    from deep_translator import GoogleTranslator
+
+    for attempt in range(max_retries):
+        try:
+            with span('translate.upstream', characters=len(text), attempt=attempt + 1):
+                translator = GoogleTranslator(source=from_lang, target=to_lang)
+                return translator.translate(text=text)
+        except Exception as e:
+            app.logger.warning(f"Translation attempt {attempt + 1} failed: {e}")
+            if attempt == max_retries - 1:
+                raise
+            time.sleep(1)  # Brief delay before retry
+
+def translate_document_chunk(chunk, from_lang, to_lang):
+    """Translate one chunk of a long document through the translation memory."""
+    translated_text, _ = translation_memory.translate(
+        chunk, from_lang, to_lang,
+        lambda batch: translate_with_retry(batch, from_lang, to_lang)
+    )
+    if not translated_text:
+        raise ValueError('Translation produced empty result')
+    return translated_text
+
+def audio_cache_key(text, lang_code, audio_format=DEFAULT_FORMAT, bitrate=None):
+    """Cache key of a synthesized audio variant; also its /audio/ URL id."""
+    if audio_format == DEFAULT_FORMAT:
+        return make_cache_key(text, lang_code)
+    return make_cache_key(text, lang_code, audio_format, bitrate)
+
+def audio_url(text, lang_code, audio_format=DEFAULT_FORMAT, bitrate=None):
+    """URL where a cached audio variant can be fetched with HTTP caching."""
+    return f"/audio/{audio_cache_key(text, lang_code, audio_format, bitrate)}.{audio_format}"
+
+def mp3_size_key(variant_key):
+    """Cache key holding the base64 size of the MP3 a variant was made from."""
+    return make_cache_key('mp3_size', variant_key)
+
+def parse_bool(value, default=False):
+    """Interpret a JSON or query-string flag."""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def synthesize_speech(text, lang_code, audio_format=DEFAULT_FORMAT, bitrate=None):
+    """Return (base64 audio, format) for text, using the TTS cache.
+
+    gTTS produces MP3; other formats are transcoded from it once and cached
+    per (text, lang, format, bitrate). If transcoding fails the MP3 is
+    returned instead. Audio is None if synthesis fails; callers still return
+    the translation.
+    """
+    if audio_format != DEFAULT_FORMAT:
+        variant_key = audio_cache_key(text, lang_code, audio_format, bitrate)
+        with span('cache.tts_variant', format=audio_format) as attrs:
+            cached_variant = tts_cache.get(variant_key)
+            attrs['hit'] = cached_variant is not None
+        if cached_variant:
+            metrics.incr('audio_variant_cache_hits')
+            return cached_variant, audio_format
+
+    audio_base64 = get_cached_tts(text, lang_code)
+    if audio_base64:
+        app.logger.info("Using cached audio")
+    else:
+        from gtts import gTTS
+
+        app.logger.info("Generating new audio with gTTS")
+        try:
+            with span('tts.generate', characters=len(text), lang=lang_code):
+                tts = gTTS(text=text, lang=lang_code, slow=False)
+                
+                # Save to bytes buffer
+                mp3_buffer = io.BytesIO()
+                tts.write_to_fp(mp3_buffer)
+            
+            # Encode straight from the buffer instead of copying it out first
+            audio_base64 = base64.b64encode(mp3_buffer.getbuffer()).decode('ascii')
+            
+            # Cache the result
+            cache_tts(text, lang_code, audio_base64)
+        except Exception as e:
+            app.logger.warning(f"gTTS generation failed: {e}. Will still return translation.")
+            return None, DEFAULT_FORMAT
+
+    if audio_format == DEFAULT_FORMAT:
+        return audio_base64, DEFAULT_FORMAT
+
+    try:
+        app.logger.info(f"Transcoding audio to {audio_format} at {bitrate}")
+        with span('tts.transcode', format=audio_format, bitrate=bitrate):
+            encoded = transcode_mp3(
+                base64.b64decode(audio_base64), audio_format, bitrate, get_ffmpeg_path()
+            )
+        variant_base64 = base64.b64encode(encoded).decode('utf-8')
+        tts_cache.set(variant_key, variant_base64)
+        tts_cache.set(mp3_size_key(variant_key), str(len(audio_base64)))
+        metrics.incr('audio_transcodes')
+    except Exception as e:
+        app.logger.warning(f"Audio transcoding to {audio_format} failed: {e}. Returning MP3.")
+        metrics.incr('audio_transcode_failures')
+        return audio_base64, DEFAULT_FORMAT
+
+    return variant_base64, audio_format
+
+def note_audio_sent(audio_format, audio_id, size, binary=False):
+    """Queue audio in this response for the wire-byte metrics.
+
+    size is what goes on the wire: base64 characters for audio inline in
+    JSON, raw bytes (binary=True) for /audio/ responses. It is counted in
+    after_request, only if the response is a 200 (not a 304 or an error).
+    """
+    g.setdefault('audio_sent', []).append((audio_format, audio_id, size, binary))
+
+def record_audio_metrics(audio_sent):
+    """Count audio bytes sent and what the MP3 would have cost.
+
+    A variant's MP3 size is stored when it is transcoded; without it (older
+    entries) no saving is claimed.
+    """
+    for audio_format, audio_id, size, binary in audio_sent:
+        mp3_size = size
+        if audio_format != DEFAULT_FORMAT:
+            stored = tts_cache.get(mp3_size_key(audio_id))
+            if stored:
+                mp3_size = int(stored) * 3 // 4 if binary else int(stored)
+        metrics.incr(f'audio_responses_{audio_format}')
+        metrics.incr('audio_wire_bytes', size)
+        metrics.incr('audio_wire_bytes_mp3', mp3_size)
+
+def get_client_id():
+    """Identify the client for rate limiting.
+
+    remote_addr is the address the trusted proxy saw (ProxyFix applies
+    TRUSTED_PROXY_HOPS), never a hop the client wrote itself.
+    """
+    return request.remote_addr or 'unknown'
+
+# Non-standard status (from nginx) for requests the client gave up on
+CLIENT_CLOSED_REQUEST = 499
+
+def client_disconnected():
+    """True if the client has closed its connection while we were working.
+
+    A closed socket polls readable with nothing to read; a pipelined next
+    request has data and does not count. Only gunicorn exposes the socket,
+    so this is always False under the development server.
+    """
+    sock = request.environ.get('gunicorn.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+def client_gone_response(stage):
+    """Abandon a request whose client disconnected before `stage`."""
+    metrics.incr('client_disconnects')
+    app.logger.info(f"Client disconnected; abandoning {request.path} before {stage}")
+    return jsonify({
+        'success': False,
+        'error': 'Client closed the request'
+    }), CLIENT_CLOSED_REQUEST
+
+def text_priority():
+    """Short texts go ahead of long ones."""
+    data = (request.args if request.method == 'GET' else request.get_json(silent=True)) or {}
+    length = len(data.get('text') or '')
+    if length <= 200:
+        return PRIORITY_INTERACTIVE
+    return PRIORITY_NORMAL if length <= 2000 else PRIORITY_BULK
+
+def audio_priority():
+    """Short recordings go ahead of long ones; all audio trails short texts."""
+    return PRIORITY_NORMAL if (request.content_length or 0) <= 512 * 1024 else PRIORITY_BULK
+
+def bulk_priority():
+    """Documents and other multi-request work trail everything else."""
+    return PRIORITY_BULK
+
+def long_text_cost():
+    """Upstream chunks a /translate/long request needs, estimated from its size.
+
+    A raw body's byte count is an upper bound on its characters; a body of
+    unknown length is charged the whole burst.
+    """
+    if request.is_json:
+        length = len((request.get_json(silent=True) or {}).get('text') or '')
+    else:
+        length = request.content_length
+        if length is None:
+            return rate_limiter.burst
+    return max(1, math.ceil(length / MAX_CHUNK_CHARS))
+
+def subtitle_cost():
+    """Upstream calls a /translate/subtitles request needs, from its cue count.
+
+    Cues are counted by their timing lines in JSON, or estimated from the
+    size of a raw body. Each batch of cues is one translation request; with
+    audio, each cue is also one speech synthesis.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        cues = str(data.get('text') or '').count('-->')
+    else:
+        data = request.args
+        if request.content_length is None:
+            return rate_limiter.burst
+        cues = math.ceil(request.content_length / SUBTITLE_CUE_BYTES)
+    cost = max(1, math.ceil(cues / MAX_BATCH_CUES))
+    if parse_bool(data.get('with_audio')):
+        cost += cues
+    return cost
+
+def requested_target_count():
+    """Number of distinct to_langs in a /translate/multi request."""
+    data = request.get_json(silent=True) or {}
+    names = data.get('to_langs') or list(LANGUAGE_CODES)
+    if not isinstance(names, list):
+        names = [names]
+    return len({str(name) for name in names})
+
+def fanout_priority():
+    """Fan-outs of more than one wave of targets count as bulk work."""
+    if requested_target_count() > FANOUT_CONCURRENCY:
+        return PRIORITY_BULK
+    return text_priority()
+
+def rate_limit_response(cost=1.0):
+    """429 response if the client is over its rate limit, else None."""
+    allowed, retry_after = rate_limiter.allow(get_client_id(), cost)
+    if allowed:
+        return None
+    metrics.incr('admission_rejected_rate_limited')
+    response = jsonify({
+        'success': False,
+        'error': 'Too many requests. Please slow down.'
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def release_when_done(body, release):
+    """Wrap a streamed body so release() runs once it is exhausted or closed."""
+    try:
+        yield from body
+    finally:
+        release()
+
+def admission_controlled(priority_fn, cost_fn=None):
+    """Apply per-client rate limiting and bounded queueing to a view.
+
+    cost_fn returns how many requests' worth of the client's rate limit the
+    request uses (default 1, at most RATE_LIMIT_BURST). Rejected requests
+    get 429 (rate limited) or 503 (overloaded) with a Retry-After header
+    instead of waiting for the gunicorn timeout. A streamed response keeps
+    its slot until its body has been sent or the response is closed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cost = min(cost_fn(), rate_limiter.burst) if cost_fn is not None else 1.0
+            limited = rate_limit_response(cost)
+            if limited is not None:
+                return limited
+            
+            try:
+                waited = admission.acquire(priority_fn())
+            except Overloaded as e:
+                app.logger.warning(f"Rejecting {request.path}: {e.reason}")
+                response = jsonify({
+                    'success': False,
+                    'error': 'Server is busy. Please try again shortly.'
+                })
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 503
+            
+            if waited:
+                app.logger.info(f"{request.path} waited {waited:.2f}s for admission")
+            start_time = time.time()
+            
+            released = False
+            
+            def release():
+                nonlocal released
+                if not released:
+                    released = True
+                    admission.release(time.time() - start_time)
+            
+            streamed = False
+            try:
+                # Skip requests whose client gave up while they were queued
+                if waited and client_disconnected():
+                    return client_gone_response('admission')
+                response = view(*args, **kwargs)
+                # The body of a streamed response is produced after the view
+                # returns: release when it has been sent, or when the server
+                # closes the response early (client gone)
+                if isinstance(response, Response) and response.is_streamed:
+                    response.response = release_when_done(response.response, release)
+                    response.call_on_close(release)
+                    streamed = True
+                return response
+            finally:
+                if not streamed:
+                    release()
+        return wrapper
+    return decorator
 
 @app.route('/healthz', methods=['GET'])
 def health_check():
@@ -124,6 +773,93 @@ def health_check():
         'timestamp': datetime.utcnow().isoformat()
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Report this worker's counters and cache statistics."""
+    snapshot = metrics.snapshot()
+    counters = snapshot['counters']
+    snapshot['audio'] = {
+        'wire_bytes': counters.get('audio_wire_bytes', 0),
+        'wire_bytes_as_mp3': counters.get('audio_wire_bytes_mp3', 0),
+        'wire_bytes_saved': counters.get('audio_wire_bytes_mp3', 0) - counters.get('audio_wire_bytes', 0)
+    }
+    snapshot['caches'] = {
+        'tts': tts_cache.stats(),
+        'translations': translation_cache.stats(),
+        'documents': document_store.stats(),
+        'transcriptions': transcription_cache.stats()
+    }
+    snapshot['audio_decode'] = {
+        route: counters.get(f'audio_decode_{route}', 0)
+        for route in ('passthrough', 'numpy', 'ffmpeg', 'skipped')
+    }
+    snapshot['client_uploads'] = {
+        choice: counters.get(f'client_upload_{choice}', 0)
+        for choice in ('wav', 'original', 'undecoded')
+    }
+    snapshot['client_uploads'].update(
+        upload_bytes=counters.get('client_upload_bytes', 0),
+        recorded_bytes=counters.get('client_upload_recorded_bytes', 0)
+    )
+    snapshot['translation_memory'] = translation_memory.stats()
+    snapshot['jobs'] = job_store.counts()
+    snapshot['admission'] = admission.stats()
+    races = counters.get('recognition_races', 0)
+    snapshot['recognition_race'] = {
+        'races': races,
+        'helped': counters.get('recognition_race_helped', 0),
+        'helped_rate': round(counters.get('recognition_race_helped', 0) / races, 3) if races else 0.0,
+        'attempts_abandoned': counters.get('recognition_race_attempts_abandoned', 0)
+    }
+    return jsonify(snapshot), 200
+
+@app.route('/debug/profile', methods=['GET'])
+def debug_profile():
+    """Aggregated profiler samples for this worker.
+
+    Requires the X-Debug-Token header. `kind` is wall or cpu; format=collapsed
+    returns flame-graph input instead of the hotspot summary; reset=1 clears
+    the samples after reading them.
+    """
+    if not has_debug_token(request.headers.get('X-Debug-Token')):
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    
+    kind = request.args.get('kind', 'wall')
+    if kind not in ('wall', 'cpu'):
+        return jsonify({
+            'success': False,
+            'error': 'kind must be wall or cpu'
+        }), 400
+    
+    if request.args.get('format') == 'collapsed':
+        response = Response(profiler.collapsed(kind), mimetype='text/plain')
+    else:
+        limit = min(request.args.get('limit', 30, type=int), 500)
+        response = jsonify({
+            'success': True,
+            'pid': os.getpid(),
+            'kind': kind,
+            'profiler': profiler.stats(),
+            'hotspots': profiler.hotspots(kind, limit)
+        })
+    response.headers['Cache-Control'] = 'no-store'
+    if parse_bool(request.args.get('reset')):
+        profiler.reset()
+    return response
+
+@app.route('/debug/profile/dump', methods=['POST'])
+def debug_profile_dump():
+    """Write this worker's samples to PROFILE_DUMP_DIR as collapsed stacks."""
+    if not has_debug_token(request.headers.get('X-Debug-Token')):
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    
+    try:
+        paths = profiler.dump(PROFILE_DUMP_DIR)
+    except OSError as e:
+        app.logger.error(f"Could not save profiles: {e}")
+        return jsonify({'success': False, 'error': f'Could not save profiles: {e}'}), 500
+    return jsonify({'success': True, 'paths': paths})
+
 @app.route('/')
 def index():
     """Serve the main page."""
@@ -134,14 +870,43 @@ def desktop_download():
     """Serve the desktop download/instructions page."""
     return render_template('desktop.html')
 
-@app.route('/translate', methods=['POST'])
+@app.route('/audio/<audio_id>.<audio_format>', methods=['GET'])
+def get_audio(audio_id, audio_format):
+    """Serve cached synthesized audio; URLs are content-addressed and immutable.
+
+    The extension must match the stored audio's container, so an MP3 id is
+    never served as Opus or the other way round.
+    """
+    audio_base64 = tts_cache.get(audio_id) if audio_format in AUDIO_FORMATS else None
+    if audio_base64:
+        audio = base64.b64decode(audio_base64)
+        expected = AUDIO_FORMATS[audio_format].get('container', DEFAULT_FORMAT)
+        if sniff_container(audio[:16]) != expected:
+            audio_base64 = None
+    if not audio_base64:
+        return jsonify({
+            'success': False,
+            'error': 'Audio not found'
+        }), 404
+    
+    note_audio_sent(audio_format, audio_id, len(audio), binary=True)
+    response = Response(audio, mimetype=AUDIO_FORMATS[audio_format]['mime'])
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@app.route('/translate', methods=['GET', 'POST'])
+@admission_controlled(text_priority)
 def translate():
-    """Translate text from one language to another."""
+    """Translate text from one language to another.
+
+    GET takes the same fields as query parameters, so identical requests can
+    be answered from browser and CDN caches.
+    """
     try:
         start_time = time.time()
         app.logger.info("Received translation request")
         
-        data = request.json
+        data = request.args if request.method == 'GET' else request.json
         text = data.get('text', '').strip()
         from_lang_name = data.get('from_lang', 'English')
         to_lang_name = data.get('to_lang', 'Hindi')
@@ -160,198 +925,1026 @@ def translate():
             }), 400
         
         # Get language codes
-        from_lang = LANGUAGE_CODES.get(from_lang_name, 'en') if from_lang_name != 'auto' else 'auto'
-        to_lang = LANGUAGE_CODES.get(to_lang_name, 'en')
+        from_lang, to_lang = get_language_codes(from_lang_name, to_lang_name)
+        from_lang = resolve_source_language(from_lang, text)
         
         app.logger.info(f"Translating from {from_lang} to {to_lang}: {text[:50]}...")
+        traffic_stats.record(text, from_lang, to_lang)
         
-        # Translate text with retry logic
-        translated_text = None
-        max_retries = 2
+        # Translate text with cache check; on a miss, only sentences the
+        # translation memory has not seen are sent upstream
+        translated_text = get_cached_translation(text, from_lang, to_lang)
         
-        for attempt in range(max_retries):
-            try:
-                translator = GoogleTranslator(source=from_lang, target=to_lang)
-                translated_text = translator.translate(text=text)
-                break
-            except Exception as e:
-                app.logger.warning(f"Translation attempt {attempt + 1} failed: {e}")
-                if attempt == max_retries - 1:
-                    raise
-                time.sleep(1)  # Brief delay before retry
+        if translated_text:
+            app.logger.info("Using cached translation")
+        elif client_disconnected():
+            return client_gone_response('translation')
+        else:
+            translated_text, tm_counts = translation_memory.translate(
+                text, from_lang, to_lang,
+                lambda chunk: translate_with_retry(chunk, from_lang, to_lang)
+            )
+            app.logger.info(
+                f"Translation memory: {tm_counts['exact']} exact, {tm_counts['fuzzy']} fuzzy, "
+                f"{tm_counts['upstream_characters']} characters sent upstream"
+            )
+            
+            if not translated_text:
+                return jsonify({
+                    'success': False,
+                    'error': 'Translation produced empty result'
+                }), 500
+            
+            cache_translation(text, from_lang, to_lang, translated_text)
         
-        if not translated_text:
+        app.logger.info(f"Translation successful: {translated_text[:50]}...")
+        
+        # Generate audio for translated text with cache check; a client
+        # that left (or cancelled a superseded request) gets no speech
+        if client_disconnected():
+            return client_gone_response('speech synthesis')
+        audio_format, bitrate = negotiate_format(
+            data.get('audio_format'), data.get('audio_bitrate'), request.accept_mimetypes
+        )
+        audio_base64, audio_format = synthesize_speech(translated_text, to_lang, audio_format, bitrate)
+        if audio_format == DEFAULT_FORMAT:
+            bitrate = None
+        
+        elapsed = time.time() - start_time
+        app.logger.info(f"Translation completed in {elapsed:.2f}s")
+        
+        # Clients that fetch audio_url can let HTTP caches hold the audio
+        # instead of receiving it inline every time
+        audio_inline = parse_bool(data.get('audio_inline'), default=request.method == 'POST')
+        if audio_inline and audio_base64:
+            note_audio_sent(
+                audio_format, audio_cache_key(translated_text, to_lang, audio_format, bitrate),
+                len(audio_base64)
+            )
+        
+        result = {
+            'success': True,
+            'translated_text': translated_text,
+            'audio': audio_base64 if audio_inline else None,
+            'audio_url': audio_url(translated_text, to_lang, audio_format, bitrate) if audio_base64 else None,
+            'audio_format': audio_format,
+            'audio_mime': AUDIO_FORMATS[audio_format]['mime']
+        }
+        if from_lang_name == 'auto' and from_lang != 'auto':
+            result['detected_lang'] = LANGUAGE_NAMES[from_lang]
+        # The ETag covers everything except the timing. Only GET responses
+        # are cacheable, so POST (with the audio inline) skips serializing
+        # the result twice
+        etag = None
+        if request.method == 'GET':
+            etag = content_etag(json.dumps(result, sort_keys=True).encode('utf-8'))
+        result['elapsed_seconds'] = round(elapsed, 2)
+        
+        response = jsonify(result)
+        if etag is not None:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'public, max-age=3600'
+            if not data.get('audio_format'):
+                # The format was negotiated from Accept, so shared caches
+                # must not hand this response to clients accepting another
+                response.vary.add('Accept')
+        return response
+
+    except Exception as e:
+        app.logger.error(f"Translation error: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': f'Translation failed: {str(e)}'
+        }), 500
+
+@app.route('/translate/incremental', methods=['POST'])
+@admission_controlled(text_priority)
+def translate_incremental():
+    """Re-translate only the sentences that changed since the last version.
+
+    The client sends a document id, the full current text and the version it
+    last applied. The response is a patch: each op replaces the previous
+    version's segments [start:end] with new translated segments.
+
+    Versions are random tokens. If another edit of the same document was
+    stored while this one was being translated, this one is not stored;
+    the response rebuilds the whole text and has version null, so the
+    client's next edit starts from a full re-sync.
+    """
+    try:
+        start_time = time.time()
+        
+        data = request.json
+        document_id = str(data.get('document_id', '')).strip()
+        text = data.get('text', '')
+        base_version = data.get('base_version')
+        with_audio = parse_bool(data.get('with_audio'))
+        audio_format, bitrate = negotiate_format(
+            data.get('audio_format'), data.get('audio_bitrate'), request.accept_mimetypes
+        )
+        from_lang, to_lang = get_language_codes(
+            data.get('from_lang', 'English'), data.get('to_lang', 'Hindi')
+        )
+        from_lang = resolve_source_language(from_lang, text)
+        
+        # Validate input
+        if not document_id or len(document_id) > 128:
+            return jsonify({
+                'success': False,
+                'error': 'A document_id of at most 128 characters is required'
+            }), 400
+        
+        if len(text) > 5000:
+            return jsonify({
+                'success': False,
+                'error': 'Text is too long (max 5000 characters)'
+            }), 400
+        
+        # Load the previous version; start over if the client is out of sync
+        store_key = make_cache_key('document', document_id)
+        stored = document_store.get(store_key)
+        state = json.loads(stored) if stored else None
+        reset = (
+            state is None
+            or state['from_lang'] != from_lang
+            or state['to_lang'] != to_lang
+            or state['version'] != base_version
+        )
+        old_segments = [] if reset else state['segments']
+        version = uuid.uuid4().hex
+        
+        new_pairs = split_sentences(text)
+        changes = diff_segments([(s, t) for s, t, _ in old_segments], new_pairs)
+        
+        # Translate only the sentences in changed ranges
+        changed = [new_pairs[j][0] for _, _, j1, j2 in changes for j in range(j1, j2)]
+        if changed and client_disconnected():
+            # Superseded by a newer edit; the stored version stays as it was
+            return client_gone_response('translation')
+        translations, tm_counts = translation_memory.translate_sentences(
+            changed, from_lang, to_lang,
+            lambda chunk: translate_with_retry(chunk, from_lang, to_lang)
+        )
+        if any(t is None for t in translations):
             return jsonify({
                 'success': False,
                 'error': 'Translation produced empty result'
             }), 500
+        translated = iter(translations)
         
-        app.logger.info(f"Translation successful: {translated_text[:50]}...")
+        def make_segment(translation, trailing):
+            segment = {'text': translation, 'trailing': trailing}
+            if with_audio and translation.strip():
+                segment['audio'], segment_format = synthesize_speech(
+                    translation, to_lang, audio_format, bitrate
+                )
+                segment['audio_mime'] = AUDIO_FORMATS[segment_format]['mime']
+                if segment['audio']:
+                    note_audio_sent(
+                        segment_format, audio_cache_key(translation, to_lang, segment_format, bitrate),
+                        len(segment['audio'])
+                    )
+            return segment
         
-        # Generate audio for translated text with cache check
-        cached_audio = get_cached_tts(translated_text, to_lang)
+        ops = []
+        new_segments = []
+        old_position = 0
+        for i1, i2, j1, j2 in changes:
+            new_segments.extend(old_segments[old_position:i1])
+            op_segments = []
+            for j in range(j1, j2):
+                sentence, trailing = new_pairs[j]
+                translation = next(translated)
+                new_segments.append([sentence, trailing, translation])
+                op_segments.append(make_segment(translation, trailing))
+            ops.append({'start': i1, 'end': i2, 'segments': op_segments})
+            old_position = i2
+        new_segments.extend(old_segments[old_position:])
         
-        if cached_audio:
-            app.logger.info("Using cached audio")
-            audio_base64 = cached_audio
-        else:
-            app.logger.info("Generating new audio with gTTS")
-            try:
-                tts = gTTS(text=translated_text, lang=to_lang, slow=False)
-                
-                # Save to bytes buffer
-                mp3_buffer = io.BytesIO()
-                tts.write_to_fp(mp3_buffer)
-                mp3_buffer.seek(0)
-                
-                audio_base64 = base64.b64encode(mp3_buffer.read()).decode('utf-8')
-                
-                # Cache the result
-                cache_tts(translated_text, to_lang, audio_base64)
-            except Exception as e:
-                app.logger.warning(f"gTTS generation failed: {e}. Will still return translation.")
-                audio_base64 = None
+        # Store only if no other edit was stored since we read the document;
+        # the backend checks and writes atomically across workers
+        conflict = not document_store.compare_and_set(store_key, stored, json.dumps({
+            'version': version,
+            'from_lang': from_lang,
+            'to_lang': to_lang,
+            'segments': new_segments
+        }))
+        if conflict:
+            app.logger.info(f"Incremental translation of {document_id} lost a race; sending the full text")
+            reset = True
+            version = None
+            ops = [{
+                'start': 0,
+                'end': 0,
+                'segments': [make_segment(translation, trailing)
+                             for _, trailing, translation in new_segments]
+            }]
         
         elapsed = time.time() - start_time
-        app.logger.info(f"Translation completed in {elapsed:.2f}s")
+        app.logger.info(
+            f"Incremental translation of {document_id} v{version}: {len(changed)} of "
+            f"{len(new_pairs)} sentences changed, {tm_counts['upstream_characters']} "
+            f"characters sent upstream in {elapsed:.2f}s"
+        )
         
         return jsonify({
             'success': True,
-            'translated_text': translated_text,
-            'audio': audio_base64,
+            'document_id': document_id,
+            'version': version,
+            'reset': reset,
+            'ops': ops,
+            'changed_sentences': len(changed),
+            'total_sentences': len(new_pairs),
+            'upstream_characters': tm_counts['upstream_characters'],
             'elapsed_seconds': round(elapsed, 2)
         })
 
     except Exception as e:
-        app.logger.error(f"Translation error: {str(e)}", exc_info=True)
+        app.logger.error(f"Incremental translation error: {str(e)}", exc_info=True)
         return jsonify({
             'success': False,
             'error': f'Translation failed: {str(e)}'
         }), 500
 
+@app.route('/translate/long', methods=['POST'])
+@admission_controlled(bulk_priority, long_text_cost)
+def translate_long():
+    """Translate a document of any length, streaming the result in order.
+
+    Accepts either JSON ({"text", "from_lang", "to_lang"}) or a raw
+    text/plain body with from_lang and to_lang as query parameters. The
+    response is newline-delimited JSON: one {"index", "text"} line per chunk
+    in input order, then a final {"done": true, ...} summary line.
+    """
+    start_time = time.time()
+    
+    if request.is_json:
+        data = request.json
+        source = io.StringIO(data.get('text', ''))
+    else:
+        data = request.args
+        source = request.stream
+    from_lang, to_lang = get_language_codes(
+        data.get('from_lang', 'English'), data.get('to_lang', 'Hindi')
+    )
+    blocks = iter_text_blocks(source)
+    if from_lang == 'auto':
+        # Identify the language from the first block, then put it back
+        first_block = next(blocks, '')
+        from_lang = resolve_source_language(from_lang, first_block)
+        blocks = itertools.chain([first_block], blocks)
+    app.logger.info(f"Received long translation request from {from_lang} to {to_lang}")
+
+    def generate():
+        chunks = 0
+        characters = 0
+        try:
+            for index, translated in translate_ordered(
+                    iter_chunks(blocks),
+                    lambda chunk: translate_document_chunk(chunk, from_lang, to_lang),
+                    concurrency=LONG_TEXT_CONCURRENCY):
+                chunks += 1
+                characters += len(translated)
+                yield json.dumps({'index': index, 'text': translated}) + '\n'
+        except Exception as e:
+            app.logger.error(f"Long translation error: {str(e)}", exc_info=True)
+            yield json.dumps({'success': False, 'error': f'Translation failed: {str(e)}'}) + '\n'
+            return
+        
+        elapsed = time.time() - start_time
+        app.logger.info(f"Long translation of {chunks} chunks completed in {elapsed:.2f}s")
+        yield json.dumps({
+            'success': True,
+            'done': True,
+            'chunks': chunks,
+            'characters': characters,
+            'source_lang': from_lang,
+            'elapsed_seconds': round(elapsed, 2)
+        }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/translate/subtitles', methods=['POST'])
+@admission_controlled(bulk_priority, subtitle_cost)
+def translate_subtitles():
+    """Translate an SRT or WebVTT file, streaming the result as it is produced.
+
+    Accepts the subtitle file as a raw body with from_lang, to_lang and the
+    options below as query parameters, or JSON with the file in `text`.
+    Cues are batched into few upstream requests (repeated lines come from
+    the translation memory); timing and cue boundaries are kept.
+
+    - format: 'srt' or 'vtt' output (default: same as the input)
+    - with_audio: 1 to also synthesize every translated cue; the response is
+      then newline-delimited JSON, one {index, start, end, text, audio_url}
+      line per cue and a final {"done": true, ...} summary line
+    """
+    start_time = time.time()
+    
+    if request.is_json:
+        data = request.json
+        source = io.StringIO(data.get('text', ''))
+    else:
+        data = request.args
+        source = request.stream
+    from_lang, to_lang = get_language_codes(
+        data.get('from_lang', 'English'), data.get('to_lang', 'Hindi')
+    )
+    with_audio = parse_bool(data.get('with_audio'))
+    audio_format, bitrate = negotiate_format(
+        data.get('audio_format'), data.get('audio_bitrate'), request.accept_mimetypes
+    )
+    
+    subtitle_format, items = read_subtitles(iter_text_blocks(source))
+    output_format = data.get('format') or subtitle_format
+    if output_format not in SUBTITLE_FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f"Unsupported subtitle format '{output_format}' (expected srt or vtt)"
+        }), 400
+    
+    # Read up to the first batch of cues to validate the input and identify
+    # the source language, then put it back
+    batches = batch_cues(items)
+    first_batch = next(batches, [])
+    first_cues = [item for item in first_batch if isinstance(item, Cue)]
+    if not first_cues:
+        return jsonify({
+            'success': False,
+            'error': 'No subtitle cues found'
+        }), 400
+    from_lang = resolve_source_language(from_lang, ' '.join(cue.text for cue in first_cues))
+    batches = itertools.chain([first_batch], batches)
+    app.logger.info(
+        f"Received {subtitle_format} subtitle translation from {from_lang} to {to_lang}"
+        f"{' with audio' if with_audio else ''}"
+    )
+
+    def translate_batch(batch):
+        texts = [item.text for item in batch if isinstance(item, Cue)]
+        translations, _ = translation_memory.translate_sentences(
+            texts, from_lang, to_lang,
+            lambda text: translate_with_retry(text, from_lang, to_lang)
+        )
+        if any(translation is None for translation in translations):
+            raise ValueError('Translation produced empty result')
+        return batch, translations
+
+    def translated_cues():
+        """(item, translation) in input order; translation is None for passthrough."""
+        for _, (batch, translations) in map_ordered(
+                batches, translate_batch, concurrency=LONG_TEXT_CONCURRENCY,
+                thread_name_prefix='subtitles'):
+            translations = iter(translations)
+            for item in batch:
+                yield item, next(translations) if isinstance(item, Cue) else None
+
+    def synthesize_cue(text):
+        speech = speech_text(text)
+        if not speech:
+            return None
+        audio_base64, cue_format = synthesize_speech(speech, to_lang, audio_format, bitrate)
+        return audio_url(speech, to_lang, cue_format, bitrate) if audio_base64 else None
+
+    def generate_subtitles():
+        cues = 0
+        if output_format == 'vtt' and subtitle_format == 'srt':
+            yield 'WEBVTT\n\n'
+        try:
+            for item, translation in translated_cues():
+                if translation is not None:
+                    cues += 1
+                yield format_item(item, output_format, cues, translation)
+        except Exception as e:
+            app.logger.error(f"Subtitle translation error: {str(e)}", exc_info=True)
+            if output_format == 'vtt':
+                yield f'NOTE Translation failed: {str(e)}\n\n'
+            return
+        app.logger.info(f"Subtitle translation of {cues} cues completed in {time.time() - start_time:.2f}s")
+
+    def cue_line(number, cue, text, audio_future):
+        return json.dumps({
+            'index': number,
+            'start': cue.start,
+            'end': cue.end,
+            'text': text,
+            'audio_url': audio_future.result()
+        }, ensure_ascii=False) + '\n'
+
+    def generate_dubbing():
+        cues = 0
+        pending = deque()
+        try:
+            for item, translation in translated_cues():
+                if translation is None:
+                    continue
+                cues += 1
+                # Synthesis runs on the shared pool; at most two cues per
+                # worker wait here, which bounds memory per request
+                context = contextvars.copy_context()
+                pending.append((cues, item, translation,
+                                subtitle_tts_pool.submit(context.run, synthesize_cue, translation)))
+                while pending and (pending[0][3].done() or len(pending) >= SUBTITLE_TTS_WORKERS * 2):
+                    yield cue_line(*pending.popleft())
+            while pending:
+                yield cue_line(*pending.popleft())
+        except Exception as e:
+            app.logger.error(f"Subtitle dubbing error: {str(e)}", exc_info=True)
+            yield json.dumps({'success': False, 'error': f'Translation failed: {str(e)}'}) + '\n'
+            return
+        finally:
+            for *_, future in pending:
+                future.cancel()
+        
+        elapsed = time.time() - start_time
+        app.logger.info(f"Subtitle dubbing of {cues} cues completed in {elapsed:.2f}s")
+        yield json.dumps({
+            'success': True,
+            'done': True,
+            'cues': cues,
+            'source_lang': from_lang,
+            'elapsed_seconds': round(elapsed, 2)
+        }) + '\n'
+
+    if with_audio:
+        return Response(stream_with_context(generate_dubbing()), mimetype='application/x-ndjson')
+    return Response(
+        stream_with_context(generate_subtitles()),
+        content_type=f'{SUBTITLE_MIMETYPES[output_format]}; charset=utf-8'
+    )
+
+@app.route('/translate/multi', methods=['POST'])
+@admission_controlled(fanout_priority, requested_target_count)
+def translate_multi():
+    """Translate one text into several languages, streaming each as it completes.
+
+    JSON body: {"text", "from_lang", "to_langs": [...]}; to_langs holds
+    language names or codes and defaults to every supported language. The
+    source language is identified once for all targets, and up to
+    FANOUT_CONCURRENCY targets are translated and synthesized at a time.
+    The response is newline-delimited JSON: one {index, to_lang,
+    translated_text, audio_url} line per target in completion order (index
+    is the target's position in to_langs), then a {"done": true, ...}
+    summary line. with_audio=false skips speech synthesis. The request
+    counts as one /translate call per target against the rate limit.
+    """
+    start_time = time.time()
+    
+    data = request.get_json(silent=True) or {}
+    text = str(data.get('text') or '').strip()
+    from_lang_name = data.get('from_lang', 'auto')
+    to_lang_names = data.get('to_langs') or list(LANGUAGE_CODES)
+    with_audio = parse_bool(data.get('with_audio'), default=True)
+    
+    if not text:
+        return jsonify({
+            'success': False,
+            'error': 'No text provided for translation'
+        }), 400
+    
+    if len(text) > 5000:
+        return jsonify({
+            'success': False,
+            'error': 'Text is too long (max 5000 characters)'
+        }), 400
+    
+    if not isinstance(to_lang_names, list):
+        to_lang_names = [to_lang_names]
+    targets = []
+    for name in to_lang_names:
+        code = speech_language_code(str(name))
+        if code is None:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported target language: {name}'
+            }), 400
+        if code not in targets:
+            targets.append(code)
+    
+    from_lang, _ = get_language_codes(from_lang_name, 'English')
+    # Identify the source once; if it stays 'auto' (text too short to tell
+    # locally), each target's upstream request detects it along the way
+    from_lang = resolve_source_language(from_lang, text)
+    audio_format, bitrate = negotiate_format(
+        data.get('audio_format'), data.get('audio_bitrate'), request.accept_mimetypes
+    )
+    app.logger.info(f"Received fan-out translation from {from_lang} to {len(targets)} languages")
+
+    def translate_target(to_lang):
+        target_start = time.time()
+        traffic_stats.record(text, from_lang, to_lang)
+        if to_lang == from_lang:
+            translated_text = text
+        else:
+            translated_text = get_cached_translation(text, from_lang, to_lang)
+            if not translated_text:
+                translated_text, _ = translation_memory.translate(
+                    text, from_lang, to_lang,
+                    lambda chunk: translate_with_retry(chunk, from_lang, to_lang)
+                )
+                if not translated_text:
+                    raise ValueError('Translation produced empty result')
+                cache_translation(text, from_lang, to_lang, translated_text)
+        result = {'translated_text': translated_text, 'audio_url': None}
+        if with_audio:
+            audio_base64, target_format = synthesize_speech(translated_text, to_lang, audio_format, bitrate)
+            if audio_base64:
+                target_bitrate = None if target_format == DEFAULT_FORMAT else bitrate
+                result['audio_url'] = audio_url(translated_text, to_lang, target_format, target_bitrate)
+                result['audio_format'] = target_format
+        result['elapsed_seconds'] = round(time.time() - target_start, 2)
+        return result
+
+    def generate():
+        failed = 0
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, min(FANOUT_CONCURRENCY, len(targets))),
+            thread_name_prefix='fanout'
+        )
+        try:
+            # Run in copies of the request context so tracing follows
+            futures = {
+                pool.submit(contextvars.copy_context().run, translate_target, to_lang): index
+                for index, to_lang in enumerate(targets)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                line = {'index': index, 'to_lang': LANGUAGE_NAMES[targets[index]]}
+                try:
+                    line.update(future.result())
+                except Exception as e:
+                    app.logger.error(f"Fan-out translation to {targets[index]} failed: {str(e)}", exc_info=True)
+                    failed += 1
+                    line.update(success=False, error=f'Translation failed: {str(e)}')
+                yield json.dumps(line, ensure_ascii=False) + '\n'
+        finally:
+            # The client may have disconnected: drop targets not started yet
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        elapsed = time.time() - start_time
+        app.logger.info(
+            f"Fan-out translation to {len(targets)} languages completed in {elapsed:.2f}s"
+            f"{f' ({failed} failed)' if failed else ''}"
+        )
+        summary = {
+            'success': failed < len(targets),
+            'done': True,
+            'targets': len(targets),
+            'failed': failed,
+            'elapsed_seconds': round(elapsed, 2)
+        }
+        if from_lang != 'auto':
+            summary['source_lang'] = LANGUAGE_NAMES[from_lang]
+        yield json.dumps(summary) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def recognize_race(recognizer, audio_data, languages):
+    """Recognize audio in several languages at once; returns (text, language).
+
+    The race "helped" when a language other than the requested one won.
+    """
+    def recognize_in(language):
+        with span('recognize', language=language, race=True):
+            return recognizer.recognize_google(
+                audio_data, language=SPEECH_LOCALES[language], show_all=True
+            )
+
+    winner, text, confidence, abandoned = race_recognition(
+        recognition_pool, recognize_in, languages,
+        min_confidence=RECOGNITION_RACE_MIN_CONFIDENCE
+    )
+    metrics.incr('recognition_races')
+    metrics.incr('recognition_race_attempts_abandoned', abandoned)
+    if winner is not None and winner != languages[0]:
+        metrics.incr('recognition_race_helped')
+    app.logger.info(
+        f"Recognition race over {languages}: {winner} won with confidence {confidence:.2f}, "
+        f"{abandoned} attempts abandoned"
+    )
+    return text, winner or languages[0]
+
+def receive_speech_upload(ingest):
+    """Stream the request's audio into the decoder as it arrives.
+
+    Accepts multipart/form-data (an `audio` file plus form fields) or a raw
+    audio body with fields in the query string. Returns the fields once the
+    whole upload has been fed to ingest (decoding may still be running);
+    raises UploadRejected for missing, invalid or over-budget audio.
+    """
+    with span('upload') as attrs:
+        if request.mimetype == 'multipart/form-data':
+            fields, content_type = read_multipart(
+                request.stream, request.mimetype_params.get('boundary'), 'audio', ingest.feed
+            )
+            if content_type is None:
+                raise UploadRejected('No audio file provided')
+        else:
+            fields = request.args.to_dict()
+            for block in iter(lambda: request.stream.read(64 * 1024), b''):
+                ingest.feed(block)
+        attrs.update(bytes=ingest.size, container=ingest.container)
+    return fields
+
+def decode_speech_upload(ingest):
+    """Wait for the decoder to finish; returns DecodedAudio."""
+    with span('decode', container=ingest.container) as attrs:
+        audio = ingest.finish()
+        attrs['decoder'] = audio.decoder
+    # Pre-normalized uploads (16 kHz mono WAV from the web client) pass
+    # through without any conversion
+    metrics.incr(f'audio_decode_{audio.decoder}')
+    app.logger.info(
+        f"Audio format: {audio.container} ({audio.decoder}), {audio.duration:.1f}s, "
+        f"{audio.upload_bytes} bytes"
+    )
+    return audio
+
+def record_upload_choice(fields, upload_bytes):
+    """Count what the web client chose to upload (see prepareUpload in index.html)."""
+    choice = fields.get('upload_choice')
+    if choice not in ('wav', 'original', 'undecoded'):
+        return
+    metrics.incr(f'client_upload_{choice}')
+    recorded_bytes = fields.get('recorded_bytes', '')
+    if recorded_bytes.isdigit():
+        metrics.incr('client_upload_bytes', upload_bytes)
+        metrics.incr('client_upload_recorded_bytes', int(recorded_bytes))
+
+def transcribe_audio(audio, languages):
+    """Recognize decoded audio; returns (text, language).
+
+    text is None if the audio was not understood. Several languages run a
+    recognition race.
+    """
+    import speech_recognition as sr
+
+    recognizer = sr.Recognizer()
+    audio_data = sr.AudioData(audio.pcm, audio.sample_rate, audio.sample_width)
+    
+    if len(languages) > 1:
+        return recognize_race(recognizer, audio_data, languages)
+    
+    # Process the audio with retry logic
+    language = languages[0]
+    max_retries = 2
+    for attempt in range(max_retries):
+        try:
+            with span('recognize', attempt=attempt + 1, language=language):
+                text = recognizer.recognize_google(
+                    audio_data, language=SPEECH_LOCALES[language]
+                )
+            return text, language
+        except sr.UnknownValueError:
+            return None, language
+        except sr.RequestError as e:
+            app.logger.warning(f"Recognition attempt {attempt + 1} failed: {e}")
+            if attempt == max_retries - 1:
+                raise
+            time.sleep(1)
+
 @app.route('/speech-to-text', methods=['POST'])
+@admission_controlled(audio_priority)
 def speech_to_text():
-    """Convert speech from audio file to text."""
+    """Convert speech from audio file to text.
+
+    The upload is decoded while it streams in. Results are cached by content
+    hash, which is known as soon as the last byte arrives: a re-uploaded
+    recording is answered from the cache without waiting for the decoder
+    (which is stopped), and a retry arriving while the original upload is
+    still being recognized waits for that result instead of decoding and
+    recognizing it again.
+    """
+    import speech_recognition as sr
+
+    ingest = AudioIngest(
+        get_ffmpeg_path(), MAX_AUDIO_UPLOAD_BYTES, MAX_AUDIO_SECONDS, app.config['UPLOAD_FOLDER']
+    )
     try:
         start_time = time.time()
         app.logger.info("Received speech-to-text request")
         
-        if 'audio' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'No audio file provided'
-            }), 400
-
-        audio_file = request.files['audio']
-        if not audio_file or audio_file.filename == '':
+        fields = receive_speech_upload(ingest)
+        if not ingest.size:
+            raise UploadRejected('Empty audio file')
+        record_upload_choice(fields, ingest.size)
+        
+        language = get_speech_language(fields)
+        languages = get_race_languages(language, fields) if parse_bool(fields.get('race')) else [language]
+        app.logger.info(f"Audio upload: {ingest.size} bytes, language: {language}")
+        
+        # The transcription depends on the audio and the languages tried
+        cache_key = make_cache_key('speech', ingest.digest, *languages)
+        with span('cache.transcription') as attrs:
+            cached = transcription_cache.get(cache_key)
+            attrs['hit'] = cached is not None
+        
+        if cached:
+            metrics.incr('transcription_cache_hits')
+            ingest.close()
+            metrics.incr('audio_decode_skipped')
+            text, language = json.loads(cached)
+            shared = True
+        elif client_disconnected():
+            return client_gone_response('recognition')
+        else:
+            # Only the leader decodes; callers sharing its result stop their
+            # decoder before waiting
+            (text, language), shared = transcription_flights.do(
+                cache_key, lambda: transcribe_audio(decode_speech_upload(ingest), languages),
+                timeout=TRANSCRIPTION_WAIT_SECONDS, on_wait=ingest.close
+            )
+            if shared:
+                metrics.incr('transcription_shared_in_flight')
+                metrics.incr('audio_decode_skipped')
+            elif text:
+                transcription_cache.set(cache_key, json.dumps([text, language]))
+        
+        if not text:
             return jsonify({
                 'success': False,
-                'error': 'Empty audio file'
+                'error': 'Could not understand audio. Please speak clearly.'
             }), 400
-
-        # Get content type
-        content_type = audio_file.content_type or 'audio/wav'
-        app.logger.info(f"Audio format: {content_type}")
         
-        # Save the uploaded file
-        temp_path = get_temp_filepath(suffix=f'.{content_type.split("/")[-1].split(";")[0]}')
-        temp_wav_path = None
+        elapsed = time.time() - start_time
+        app.logger.info(f"Speech-to-text completed in {elapsed:.2f}s: {text[:50]}...")
         
-        try:
-            audio_file.save(temp_path)
-            app.logger.info(f"Audio saved to {temp_path}")
-            
-            # Convert to WAV if needed
-            if 'wav' not in content_type.lower() and 'webm' in content_type.lower() or 'ogg' in content_type.lower():
-                app.logger.info("Converting audio to WAV format...")
-                temp_wav_path = get_temp_filepath(suffix='.wav')
-                
-                with open(temp_path, 'rb') as f:
-                    audio_data = f.read()
-                
-                wav_data = convert_audio_to_wav(audio_data, content_type)
-                
-                with open(temp_wav_path, 'wb') as f:
-                    f.write(wav_data)
-                
-                processing_path = temp_wav_path
-            else:
-                processing_path = temp_path
-            
-            # Initialize recognizer
-            recognizer = sr.Recognizer()
-            
-            # Process the audio file with retry logic
-            text = None
-            max_retries = 2
-            
-            for attempt in range(max_retries):
-                try:
-                    with sr.AudioFile(processing_path) as source:
-                        audio_data = recognizer.record(source)
-                        text = recognizer.recognize_google(audio_data)
-                    break
-                except sr.UnknownValueError:
-                    return jsonify({
-                        'success': False,
-                        'error': 'Could not understand audio. Please speak clearly.'
-                    }), 400
-                except sr.RequestError as e:
-                    app.logger.warning(f"Recognition attempt {attempt + 1} failed: {e}")
-                    if attempt == max_retries - 1:
-                        raise
-                    time.sleep(1)
-            
-            if not text:
-                return jsonify({
-                    'success': False,
-                    'error': 'Could not transcribe audio'
-                }), 400
-            
-            elapsed = time.time() - start_time
-            app.logger.info(f"Speech-to-text completed in {elapsed:.2f}s: {text[:50]}...")
-            
-            return jsonify({
-                'success': True,
-                'text': text,
-                'elapsed_seconds': round(elapsed, 2)
-            })
-            
-        finally:
-            # Clean up temporary files
-            for filepath in [temp_path, temp_wav_path]:
-                if filepath and os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except Exception as e:
-                        app.logger.warning(f"Could not remove temp file {filepath}: {e}")
+        return jsonify({
+            'success': True,
+            'text': text,
+            'language': LANGUAGE_NAMES[language],
+            'deduplicated': shared,
+            'elapsed_seconds': round(elapsed, 2)
+        })
         
+    except UploadRejected as e:
+        app.logger.warning(f"Rejected audio upload: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except HTTPException as e:
+        # Raised by request.stream, e.g. 413 for a body over the endpoint's limit
+        app.logger.warning(f"Rejected audio upload: {e}")
+        error = (
+            f'Audio file is too large (max {round(MAX_AUDIO_UPLOAD_BYTES / (1024 * 1024), 1):g}MB)'
+            if e.code == 413 else e.description
+        )
+        return jsonify({
+            'success': False,
+            'error': error
+        }), e.code
     except sr.RequestError as e:
         app.logger.error(f"Speech recognition service error: {str(e)}")
         return jsonify({
             'success': False,
             'error': f'Speech recognition service error: {str(e)}'
         }), 503
+    except TimeoutError as e:
+        app.logger.warning(f"Speech-to-text gave up waiting for an identical upload: {e}")
+        response = jsonify({
+            'success': False,
+            'error': 'An identical recording is being processed by another request. Please retry shortly.'
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 503
     except Exception as e:
         app.logger.error(f"Speech-to-text error: {str(e)}", exc_info=True)
         return jsonify({
             'success': False,
             'error': f'Processing failed: {str(e)}'
         }), 500
+    finally:
+        ingest.close()
+
+def receive_job_input(input_path):
+    """Stream the job's input to input_path; returns (fields, size).
+
+    Accepts multipart/form-data (a `file` plus form fields), JSON with the
+    text in `text`, or a raw body with fields in the query string. Raises
+    UploadRejected for missing or oversized input.
+    """
+    size = 0
+    with open(input_path, 'wb') as target:
+        def write(data):
+            nonlocal size
+            size += len(data)
+            if size > JOB_MAX_UPLOAD_BYTES:
+                raise UploadRejected(
+                    f'Upload is too large (max {JOB_MAX_UPLOAD_BYTES / (1024 * 1024):g}MB)', 413
+                )
+            target.write(data)
+
+        if request.mimetype == 'multipart/form-data':
+            fields, content_type = read_multipart(
+                request.stream, request.mimetype_params.get('boundary'), 'file', write
+            )
+            if content_type is None:
+                raise UploadRejected('No file provided')
+        elif request.is_json:
+            if (request.content_length or 0) > app.config['MAX_CONTENT_LENGTH']:
+                raise UploadRejected('JSON body is too large; upload a file instead', 413)
+            data = request.get_json(silent=True) or {}
+            fields = {key: str(value) for key, value in data.items() if key != 'text'}
+            write(str(data.get('text', '')).encode('utf-8'))
+        else:
+            fields = request.args.to_dict()
+            for block in iter(lambda: request.stream.read(64 * 1024), b''):
+                write(block)
+    if not size:
+        raise UploadRejected('Empty input')
+    return fields, size
+
+def job_links(job_id):
+    return {
+        'status_url': f'/jobs/{job_id}',
+        'events_url': f'/jobs/{job_id}/events',
+        'result_url': f'/jobs/{job_id}/result'
+    }
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue bulk translation or transcription and return a job id at once.
+
+    `kind` is 'translate' (from_lang, to_lang) or 'transcribe' (language).
+    The work runs in the worker tier (jobs_worker.py); follow it with
+    GET /jobs/<id> or the /jobs/<id>/events stream.
+    """
+    limited = rate_limit_response()
+    if limited is not None:
+        return limited
+    
+    job_id = job_store.new_job()
+    try:
+        fields, size = receive_job_input(job_store.input_path(job_id))
+        kind = fields.get('kind', 'translate')
+        if kind not in JOB_KINDS:
+            raise UploadRejected(f"Unknown job kind '{kind}' (expected one of {', '.join(JOB_KINDS)})")
+        if kind == 'translate':
+            from_lang, to_lang = get_language_codes(
+                fields.get('from_lang', 'English'), fields.get('to_lang', 'Hindi')
+            )
+            params = {'from_lang': from_lang, 'to_lang': to_lang}
+        else:
+            params = {'language': get_speech_language(fields)}
+        job_store.create(job_id, kind, params, max_attempts=JOB_MAX_ATTEMPTS)
+    except UploadRejected as e:
+        job_store.discard(job_id)
+        app.logger.warning(f"Rejected job upload: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except Exception as e:
+        job_store.discard(job_id)
+        app.logger.error(f"Job submission error: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': f'Could not queue job: {str(e)}'
+        }), 500
+    
+    metrics.incr(f'jobs_submitted_{kind}')
+    app.logger.info(f"Queued {kind} job {job_id} ({size} bytes, {params})")
+    response = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        **job_links(job_id)
+    })
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response, 202
+
+def job_not_found():
+    return jsonify({
+        'success': False,
+        'error': 'Job not found'
+    }), 404
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and progress of a job."""
+    job = job_store.get(job_id)
+    if job is None:
+        return job_not_found()
+    response = jsonify({'success': True, 'job': {**job, **job_links(job_id)}})
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-Sent Events: a `progress` event whenever the job changes and a
+    final `done` event once it succeeded or failed.
+
+    The stream closes after JOB_EVENTS_MAX_SECONDS, or right after the
+    first event when JOB_EVENTS_MAX_STREAMS streams are already open;
+    EventSource reconnects. Events carry an id, so a reconnecting client
+    (Last-Event-ID) is not sent an unchanged status again.
+    """
+    if job_store.get(job_id) is None:
+        return job_not_found()
+
+    streaming = job_event_streams.acquire(blocking=False)
+    if not streaming:
+        metrics.incr('job_events_polled')
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    def generate():
+        last_id = last_event_id
+        last_sent = time.time()
+        deadline = time.time() + JOB_EVENTS_MAX_SECONDS
+        yield f'retry: {JOB_EVENTS_RETRY_MS if streaming else JOB_EVENTS_BUSY_RETRY_MS}\n\n'
+        while True:
+            job = job_store.get(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+            finished = job['status'] in FINISHED_STATUSES
+            payload = json.dumps({**job, **job_links(job_id)})
+            event_id = content_etag(payload.encode('utf-8'))[:16]
+            # The final event is always sent, so a client that reconnects
+            # after it still learns the job is over
+            if event_id != last_id or finished:
+                yield f"id: {event_id}\nevent: {'done' if finished else 'progress'}\ndata: {payload}\n\n"
+                last_id = event_id
+                last_sent = time.time()
+            elif time.time() - last_sent >= 15:
+                # Keep proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                last_sent = time.time()
+            if finished or not streaming or time.time() >= deadline:
+                return
+            time.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    if streaming:
+        response.call_on_close(job_event_streams.release)
+    return response
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """The finished job's output as UTF-8 text."""
+    job = job_store.get(job_id)
+    if job is None:
+        return job_not_found()
+    if job['status'] != STATUS_SUCCEEDED:
+        return jsonify({
+            'success': False,
+            'error': f"Job is {job['status']}",
+            'job': job
+        }), 409
+    return send_file(
+        job_store.result_path(job_id), mimetype='text/plain; charset=utf-8',
+        download_name=f'{job_id}.txt', conditional=True
+    )
 
 @app.after_request
 def after_request(response):
-    """Add CORS headers."""
+    """Add CORS headers, ETags and response compression."""
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+    response.headers.add('Access-Control-Expose-Headers', 'X-Trace-Id')
     response.headers.add('X-Content-Type-Options', 'nosniff')
+    trace = g.get('trace')
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace.trace_id
+        trace.attrs['status'] = response.status_code
+    response = apply_http_caching(response, request)
+    if response.status_code == 200 and g.get('audio_sent'):
+        record_audio_metrics(g.audio_sent)
     return response
 
 @app.before_request
 def before_request():
-    """Cleanup old files before each request."""
-    cleanup_old_files()
+    """Start the request trace and cleanup old files."""
+    g.trace, g.trace_token = tracer.start(
+        f"{request.method} {request.path}", request.headers.get('X-Trace-Id')
+    )
+    if profiler.should_profile(has_debug_token(request.headers.get('X-Profile'))):
+        g.profile_token = profiler.start(g.trace.name)
+        g.trace.attrs['profiled'] = True
+    with span('cleanup'):
+        cleanup_old_files()
+
+@app.teardown_request
+def teardown_request(exc):
+    """Stop profiling and export the request trace (slow requests are logged)."""
+    profile_token = g.pop('profile_token', None)
+    if profile_token is not None:
+        profiler.stop(profile_token)
+    trace = g.pop('trace', None)
+    if trace is not None:
+        if exc is not None:
+            trace.attrs['error'] = f'{type(exc).__name__}: {exc}'
+        tracer.finish(trace, g.pop('trace_token'))
 
 if __name__ == '__main__':
-    app.run(debug=False)
+    if os.environ.get('CACHE_WARMUP', '0') == '1':
+        start_cache_warmup()
+    try:
+        app.run(debug=False)
+    finally:
+        save_cache_snapshots()
+        dump_profiles()
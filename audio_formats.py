@@ -0,0 +1,83 @@
+"""Output audio formats for synthesized speech.
+
+gTTS always produces MP3. Clients on slow links can ask for Opus, which is
+transcoded once per (text, lang, format, bitrate) and cached.
+"""
+import subprocess
+
+DEFAULT_FORMAT = 'mp3'
+
+# name -> container/codec settings and the MIME type sent to the client
+AUDIO_FORMATS = {
+    'mp3': {'mime': 'audio/mpeg'},
+    'opus': {
+        'mime': 'audio/ogg; codecs=opus',
+        'container': 'ogg',
+        'codec': 'libopus',
+        'default_bitrate': '24k',
+    },
+    'webm': {
+        'mime': 'audio/webm; codecs=opus',
+        'container': 'webm',
+        'codec': 'libopus',
+        'default_bitrate': '24k',
+    },
+}
+
+# Bitrates a client may request (bounds the number of cached variants)
+ALLOWED_BITRATES = ('12k', '16k', '24k', '32k', '48k', '64k')
+
+# Accept header MIME types that select a format
+ACCEPT_TYPES = {
+    'audio/ogg': 'opus',
+    'audio/opus': 'opus',
+    'audio/webm': 'webm',
+    'audio/mpeg': 'mp3',
+    'audio/mp3': 'mp3',
+}
+
+
+def negotiate_format(requested=None, bitrate=None, accept=None):
+    """Pick (audio_format, bitrate) from a request parameter or Accept header.
+
+    `requested` (e.g. "opus") wins over `accept`, a werkzeug MIMEAccept.
+    Unknown formats (including non-string JSON values) fall back to MP3;
+    unknown bitrates to the format default.
+    """
+    audio_format = None
+    if requested:
+        requested = str(requested).lower()
+        audio_format = requested if requested in AUDIO_FORMATS else None
+    elif accept is not None:
+        # Only explicit audio types count; "*/*" keeps the MP3 default
+        for mimetype, quality in accept:
+            audio_format = ACCEPT_TYPES.get(mimetype.split(';')[0].strip().lower())
+            if audio_format and quality > 0:
+                break
+            audio_format = None
+    audio_format = audio_format or DEFAULT_FORMAT
+
+    settings = AUDIO_FORMATS[audio_format]
+    if 'codec' not in settings:
+        return audio_format, None
+    if bitrate not in ALLOWED_BITRATES:
+        bitrate = settings['default_bitrate']
+    return audio_format, bitrate
+
+
+def transcode_mp3(mp3_data, audio_format, bitrate, ffmpeg_path='ffmpeg', timeout=30):
+    """Transcode MP3 bytes to the given format by piping through ffmpeg.
+
+    Raises RuntimeError if ffmpeg fails.
+    """
+    settings = AUDIO_FORMATS[audio_format]
+    command = [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+        '-f', 'mp3', '-i', 'pipe:0',
+        '-vn', '-c:a', settings['codec'], '-b:a', bitrate, '-application', 'voip',
+        '-f', settings['container'], 'pipe:1'
+    ]
+    result = subprocess.run(command, input=mp3_data, capture_output=True, timeout=timeout)
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(result.stderr.decode('utf-8', 'replace').strip() or 'ffmpeg failed')
+    return result.stdout
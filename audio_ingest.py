@@ -0,0 +1,473 @@
+"""Streaming ingestion of uploaded audio.
+
+Uploads are consumed block by block as they arrive instead of being
+buffered and saved first:
+
+- the container is sniffed from the first bytes (magic numbers), not
+  trusted from the declared content type;
+- size and duration budgets are enforced while data arrives, so an
+  oversized upload is rejected as soon as it crosses the limit;
+- 16 kHz 16-bit mono PCM WAV is passed through as-is; other PCM WAV is
+  downmixed and resampled to 16 kHz mono with NumPy (audio_resample.py);
+  compressed formats are piped straight into an ffmpeg process that emits
+  16 kHz mono PCM. Without NumPy, all 16-bit mono WAV passes through at
+  its own rate and other WAV goes to ffmpeg.
+
+Only the decoded PCM is held in memory (bounded by the duration budget).
+The upload itself is never buffered whole, except MP4/M4A, which ffmpeg
+cannot read from a pipe and which is spooled to a temporary file.
+
+read_multipart() feeds one file field of a multipart/form-data body to a
+callback while collecting the other (small) fields.
+"""
+import hashlib
+import os
+import struct
+import subprocess
+import tempfile
+import threading
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+READ_BLOCK_SIZE = 64 * 1024
+SNIFF_BYTES = 12
+MAX_WAV_HEADER_BYTES = 64 * 1024
+MAX_FIELD_BYTES = 4 * 1024
+
+# Output of the ffmpeg route
+DECODED_SAMPLE_RATE = 16000
+DECODED_SAMPLE_WIDTH = 2
+
+# ffmpeg demuxer per sniffed container
+FFMPEG_FORMATS = {
+    'ogg': 'ogg',
+    'webm': 'matroska',
+    'mp3': 'mp3',
+    'flac': 'flac',
+    'wav': 'wav',
+    'aiff': 'aiff',
+}
+
+
+class UploadRejected(Exception):
+    """The upload is invalid or over budget; carries the HTTP status."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_container(head):
+    """Container format from the first bytes of a file, or None."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'\x1aE\xdf\xa3':
+        return 'webm'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    if head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        return 'aiff'
+    if head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return None
+
+
+def parse_wav_header(head):
+    """Parse a RIFF/WAVE header.
+
+    Returns None if more bytes are needed, else (fmt, data_offset,
+    data_size) where fmt has format, channels, sample_rate, block_align and
+    bits. data_size is None when the writer left it unset (streamed WAV).
+    """
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        chunk_size = struct.unpack_from('<I', head, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'data':
+            if fmt is None:
+                raise UploadRejected('Invalid WAV file: data before format chunk')
+            data_size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else None
+            return fmt, body, data_size
+        if chunk_id == b'fmt ':
+            if body + 16 > len(head):
+                return None
+            audio_format, channels, sample_rate, _, block_align, bits = struct.unpack_from(
+                '<HHIIHH', head, body
+            )
+            if audio_format == 0xFFFE and chunk_size >= 40 and body + 26 <= len(head):
+                # WAVE_FORMAT_EXTENSIBLE: the real format is in the subformat GUID
+                audio_format = struct.unpack_from('<H', head, body + 24)[0]
+            fmt = {
+                'format': audio_format,
+                'channels': channels,
+                'sample_rate': sample_rate,
+                'block_align': block_align,
+                'bits': bits,
+            }
+        offset = body + chunk_size + (chunk_size & 1)
+    if len(head) > MAX_WAV_HEADER_BYTES:
+        raise UploadRejected('Invalid WAV file: no data chunk')
+    return None
+
+
+class DecodedAudio:
+    """PCM audio ready for recognition."""
+
+    def __init__(self, pcm, sample_rate, sample_width, container, digest, upload_bytes,
+                 decoder=None):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.container = container
+        self.digest = digest
+        self.upload_bytes = upload_bytes
+        # 'passthrough', 'numpy' or 'ffmpeg': how the upload was decoded
+        self.decoder = decoder
+
+    @property
+    def duration(self):
+        return len(self.pcm) / (self.sample_rate * self.sample_width)
+
+
+class _PcmPassthrough:
+    """Collects the data chunk of a 16-bit mono PCM WAV as-is."""
+
+    route = 'passthrough'
+
+    def __init__(self, fmt, data_size, max_seconds):
+        self.sample_rate = fmt['sample_rate']
+        self.sample_width = fmt['block_align']
+        self.remaining = data_size
+        self.max_seconds = max_seconds
+        self.max_bytes = int(max_seconds * self.sample_rate * self.sample_width)
+        self.pcm = bytearray()
+
+    def feed(self, data):
+        if self.remaining is not None:
+            # Ignore chunks after the data chunk (e.g. LIST metadata)
+            data = data[:self.remaining]
+            self.remaining -= len(data)
+        if len(self.pcm) + len(data) > self.max_bytes:
+            raise UploadRejected(f'Audio is too long (max {self.max_seconds:g} seconds)', 413)
+        self.pcm += data
+
+    def finish(self):
+        usable = len(self.pcm) - len(self.pcm) % self.sample_width
+        del self.pcm[usable:]
+        return self.pcm, self.sample_rate, self.sample_width
+
+    def close(self):
+        pass
+
+
+class _WavResampler:
+    """Downmixes and resamples PCM WAV data to 16 kHz mono with NumPy."""
+
+    route = 'numpy'
+
+    def __init__(self, fmt, data_size, max_seconds):
+        from audio_resample import StreamingResampler
+
+        self.remaining = data_size
+        self.max_seconds = max_seconds
+        self.max_bytes = int(max_seconds * fmt['sample_rate']) * fmt['block_align']
+        self.received = 0
+        self.resampler = StreamingResampler(
+            fmt['sample_rate'], fmt['channels'], fmt['format'], fmt['bits'], DECODED_SAMPLE_RATE
+        )
+
+    def feed(self, data):
+        if self.remaining is not None:
+            data = data[:self.remaining]
+            self.remaining -= len(data)
+        self.received += len(data)
+        if self.received > self.max_bytes:
+            raise UploadRejected(f'Audio is too long (max {self.max_seconds:g} seconds)', 413)
+        self.resampler.feed(data)
+
+    def finish(self):
+        return self.resampler.finish(), DECODED_SAMPLE_RATE, DECODED_SAMPLE_WIDTH
+
+    def close(self):
+        pass
+
+
+_resampling_supported = None
+
+
+def numpy_resampling_supported(audio_format, bits):
+    """True if NumPy is installed and can convert this WAV sample format."""
+    global _resampling_supported
+    if _resampling_supported is None:
+        try:
+            from audio_resample import is_supported
+            _resampling_supported = is_supported
+        except ImportError:
+            _resampling_supported = False
+    return bool(_resampling_supported) and _resampling_supported(audio_format, bits)
+
+
+class _FfmpegDecoder:
+    """Pipes the upload through ffmpeg into 16 kHz mono 16-bit PCM."""
+
+    route = 'ffmpeg'
+
+    def __init__(self, ffmpeg_path, container, max_seconds, spool_dir=None, timeout=60):
+        self.max_seconds = max_seconds
+        self.max_bytes = int(max_seconds * DECODED_SAMPLE_RATE * DECODED_SAMPLE_WIDTH)
+        self.timeout = timeout
+        self.pcm = bytearray()
+        self.too_long = False
+        self._spool = None
+        self._spool_dir = spool_dir
+        self._ffmpeg_path = ffmpeg_path
+        self._input_format = FFMPEG_FORMATS.get(container)
+        self._process = None
+        self._reader = None
+        self._stderr = None
+        if container == 'mp4':
+            # MP4 usually keeps its index at the end; ffmpeg needs to seek
+            self._spool = tempfile.NamedTemporaryFile(
+                dir=spool_dir, prefix='upload_', suffix='.mp4', delete=False
+            )
+        else:
+            self._start('pipe:0')
+
+    def _start(self, source):
+        command = [self._ffmpeg_path, '-hide_banner', '-loglevel', 'error']
+        if self._input_format and source == 'pipe:0':
+            command += ['-f', self._input_format]
+        command += [
+            '-i', source, '-vn', '-ac', '1', '-ar', str(DECODED_SAMPLE_RATE),
+            '-f', 's16le', 'pipe:1'
+        ]
+        # A pipe that nobody reads until finish() would block ffmpeg once
+        # its buffer fills with warnings; a file never does
+        self._stderr = tempfile.TemporaryFile(dir=self._spool_dir, prefix='ffmpeg_stderr_')
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if source == 'pipe:0' else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr
+        )
+        self._reader = threading.Thread(target=self._read_output, name='ffmpeg-reader', daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        stdout = self._process.stdout
+        while True:
+            block = stdout.read1(READ_BLOCK_SIZE)
+            if not block:
+                return
+            if len(self.pcm) + len(block) > self.max_bytes:
+                self.too_long = True
+                self._process.kill()
+                return
+            self.pcm += block
+
+    def feed(self, data):
+        if self.too_long:
+            raise UploadRejected(f'Audio is too long (max {self.max_seconds:g} seconds)', 413)
+        if self._spool is not None:
+            self._spool.write(data)
+            return
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, ValueError):
+            if self.too_long:
+                raise UploadRejected(f'Audio is too long (max {self.max_seconds:g} seconds)', 413)
+            raise UploadRejected('Could not decode audio', 415)
+
+    def finish(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._start(self._spool.name)
+        else:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+        try:
+            self._process.wait(self.timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            raise UploadRejected('Audio decoding timed out', 500)
+        self._reader.join()
+        if self.too_long:
+            raise UploadRejected(f'Audio is too long (max {self.max_seconds:g} seconds)', 413)
+        if self._process.returncode != 0 or not self.pcm:
+            self._stderr.seek(0)
+            error = self._stderr.read().decode('utf-8', 'replace').strip()
+            raise UploadRejected(f"Could not decode audio: {error.splitlines()[-1] if error else 'no audio'}", 415)
+        usable = len(self.pcm) - len(self.pcm) % DECODED_SAMPLE_WIDTH
+        del self.pcm[usable:]
+        return self.pcm, DECODED_SAMPLE_RATE, DECODED_SAMPLE_WIDTH
+
+    def close(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if self._stderr is not None:
+            self._stderr.close()
+        if self._spool is not None:
+            self._spool.close()
+            try:
+                os.remove(self._spool.name)
+            except OSError:
+                pass
+
+
+class AudioIngest:
+    """Consumes an upload block by block: hash, budget checks and decoding."""
+
+    def __init__(self, ffmpeg_path, max_bytes, max_seconds, spool_dir=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.spool_dir = spool_dir
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.container = None
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._head = bytearray()
+        self._decoder = None
+
+    def feed(self, data):
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadRejected(
+                f'Audio file is too large (max {round(self.max_bytes / (1024 * 1024), 1):g}MB)', 413
+            )
+        self._hasher.update(data)
+        if self._decoder is not None:
+            self._decoder.feed(data)
+            return
+        self._head += data
+        self._start_decoder(final=False)
+
+    def _start_decoder(self, final):
+        """Pick a decoder once enough of the header is known."""
+        if len(self._head) < SNIFF_BYTES and not final:
+            return
+        if self.container is None:
+            self.container = sniff_container(bytes(self._head[:SNIFF_BYTES]))
+
+        if self.container == 'wav':
+            parsed = parse_wav_header(self._head)
+            if parsed is None:
+                if not final:
+                    return
+                raise UploadRejected('Invalid WAV file: truncated header')
+            fmt, data_offset, data_size = parsed
+            mono16 = fmt['format'] == 1 and fmt['channels'] == 1 and fmt['bits'] == 16
+            can_resample = fmt['channels'] > 0 and numpy_resampling_supported(fmt['format'], fmt['bits'])
+            if mono16 and (fmt['sample_rate'] == DECODED_SAMPLE_RATE or not can_resample):
+                self._decoder = _PcmPassthrough(fmt, data_size, self.max_seconds)
+                head = self._head[data_offset:]
+            elif can_resample:
+                self._decoder = _WavResampler(fmt, data_size, self.max_seconds)
+                head = self._head[data_offset:]
+            else:
+                self._decoder = _FfmpegDecoder(
+                    self.ffmpeg_path, self.container, self.max_seconds, self.spool_dir
+                )
+                head = self._head
+        else:
+            # Unknown formats are left to ffmpeg's own probing
+            self._decoder = _FfmpegDecoder(
+                self.ffmpeg_path, self.container, self.max_seconds, self.spool_dir
+            )
+            head = self._head
+        self._head = bytearray()
+        self._decoder.feed(bytes(head))
+
+    @property
+    def digest(self):
+        """SHA-256 of the bytes received so far (the whole upload once fed)."""
+        return self._hasher.hexdigest()
+
+    def finish(self):
+        """Wait for decoding to complete; returns DecodedAudio."""
+        if not self.size:
+            raise UploadRejected('Empty audio file')
+        if self._decoder is None:
+            self._start_decoder(final=True)
+        pcm, sample_rate, sample_width = self._decoder.finish()
+        if not pcm:
+            raise UploadRejected('Audio file contains no samples')
+        audio = DecodedAudio(
+            bytes(pcm), sample_rate, sample_width, self.container or 'unknown',
+            self.digest, self.size, self._decoder.route
+        )
+        # The ingest may outlive decoding (it is closed when the request
+        # ends); don't keep the decoder's buffer alongside the copy
+        del pcm
+        self._decoder.close()
+        self._decoder = None
+        return audio
+
+    def close(self):
+        """Stop decoding (killing ffmpeg if it is still running)."""
+        if self._decoder is not None:
+            self._decoder.close()
+
+
+def _next_event(decoder):
+    """decoder.next_event(), rejecting malformed or truncated bodies."""
+    try:
+        return decoder.next_event()
+    except ValueError:
+        raise UploadRejected('Incomplete multipart body')
+
+
+def read_multipart(stream, boundary, file_field, on_file_data, block_size=READ_BLOCK_SIZE):
+    """Read a multipart/form-data body incrementally.
+
+    Data of the part named file_field is passed to on_file_data as it
+    arrives; other parts are collected as text fields (at most
+    MAX_FIELD_BYTES each). Returns (fields, file_content_type), where
+    file_content_type is None if the file part was missing.
+    """
+    if not boundary:
+        raise UploadRejected('Missing multipart boundary')
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_form_memory_size=None)
+    fields = {}
+    file_content_type = None
+    current = None  # (kind, name, buffer)
+    complete = False
+    while not complete:
+        block = stream.read(block_size)
+        decoder.receive_data(block or None)
+        event = _next_event(decoder)
+        while not isinstance(event, NeedData):
+            if isinstance(event, File) and event.name == file_field and file_content_type is None:
+                file_content_type = event.headers.get('Content-Type', 'application/octet-stream')
+                current = ('file', event.name, None)
+            elif isinstance(event, (Field, File)):
+                current = ('field', event.name, bytearray())
+            elif isinstance(event, Data) and current is not None:
+                kind, name, buffer = current
+                if kind == 'file':
+                    on_file_data(event.data)
+                elif len(buffer) + len(event.data) > MAX_FIELD_BYTES:
+                    raise UploadRejected(f"Form field '{name}' is too large", 413)
+                else:
+                    buffer += event.data
+                if not event.more_data:
+                    if kind == 'field':
+                        fields[name] = buffer.decode('utf-8', 'replace')
+                    current = None
+            elif isinstance(event, Epilogue):
+                complete = True
+                break
+            event = _next_event(decoder)
+        if not block and not complete:
+            raise UploadRejected('Incomplete multipart body')
+    return fields, file_content_type
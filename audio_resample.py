@@ -0,0 +1,142 @@
+"""Vectorized PCM downmix and resampling with NumPy.
+
+StreamingResampler turns interleaved PCM of any common WAV sample format,
+channel count and rate into 16-bit mono PCM at the target rate, block by
+block as the upload arrives:
+
+- samples are read with np.frombuffer (no copy) and summed per channel
+  into one preallocated float32 buffer;
+- downsampling applies a windowed-sinc low-pass filter, evaluated only at
+  the output positions (a matrix-vector product over sliding windows)
+  rather than convolving the whole signal;
+- fractional rate ratios (e.g. 44.1 kHz to 16 kHz) interpolate linearly
+  between filtered samples.
+
+Only a filter's length of history is carried between blocks.
+"""
+import math
+
+import numpy as np
+
+# Taps per output sample step of the anti-aliasing filter
+TAPS_PER_STEP = 16
+
+# (WAV format tag, bits per sample) -> (dtype, scale to [-1, 1], offset)
+SAMPLE_FORMATS = {
+    (1, 8): (np.dtype('u1'), 1 / 128.0, -128.0),
+    (1, 16): (np.dtype('<i2'), 1 / 32768.0, 0.0),
+    (1, 32): (np.dtype('<i4'), 1 / 2147483648.0, 0.0),
+    (3, 32): (np.dtype('<f4'), 1.0, 0.0),
+    (3, 64): (np.dtype('<f8'), 1.0, 0.0),
+}
+
+
+def is_supported(audio_format, bits):
+    """True if the WAV sample format can be converted here (24-bit included)."""
+    return (audio_format, bits) in SAMPLE_FORMATS or (audio_format == 1 and bits == 24)
+
+
+def lowpass_filter(step):
+    """Windowed-sinc low-pass for decimating by `step` (input samples per output)."""
+    half = int(math.ceil(TAPS_PER_STEP * step / 2))
+    n = np.arange(-half, half + 1, dtype=np.float64)
+    # Cut off a little below the output Nyquist frequency
+    cutoff = 0.9 / step
+    taps = cutoff * np.sinc(cutoff * n) * np.blackman(len(n))
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class StreamingResampler:
+    """Converts interleaved PCM blocks to 16-bit mono PCM at out_rate."""
+
+    def __init__(self, in_rate, channels, audio_format=1, bits=16, out_rate=16000):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.bits = bits
+        self.frame_bytes = channels * bits // 8
+        self.step = in_rate / out_rate
+        if bits == 24:
+            self._dtype, self._scale, self._offset = None, 1 / 2147483648.0, 0.0
+        else:
+            self._dtype, self._scale, self._offset = SAMPLE_FORMATS[(audio_format, bits)]
+        self._filter = lowpass_filter(self.step) if self.step > 1 else np.ones(1, dtype=np.float32)
+        self._half = len(self._filter) // 2
+        # Filter taps for samples i and i + 1 side by side, for interpolation
+        self._pair_filter = np.zeros((len(self._filter) + 1, 2), dtype=np.float32)
+        self._pair_filter[:-1, 0] = self._filter
+        self._pair_filter[1:, 1] = self._filter
+        # Zero history so the first output sample is centred on input sample 0
+        self._history = np.zeros(self._half, dtype=np.float32)
+        self._position = float(self._half)
+        self._pending = b''
+        self.frames_in = 0
+        self.output = bytearray()
+
+    def _to_mono(self, data):
+        """Interleaved PCM bytes -> mono float32 in [-1, 1]."""
+        if self.bits == 24:
+            # Widen 3-byte little-endian samples to int32 (top-aligned)
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            samples = np.zeros((len(raw), 4), dtype=np.uint8)
+            samples[:, 1:] = raw
+            samples = samples.view('<i4').reshape(-1)
+        else:
+            samples = np.frombuffer(data, dtype=self._dtype)
+        frames = len(samples) // self.channels
+        mono = np.zeros(frames, dtype=np.float32)
+        for channel in range(self.channels):
+            np.add(mono, samples[channel::self.channels], out=mono, casting='unsafe')
+        if self._offset:
+            mono += self._offset * self.channels
+        mono *= self._scale / self.channels
+        return mono
+
+    def _emit(self, signal):
+        """Produce every output sample whose filter window lies inside signal."""
+        half = self._half
+        last_index = len(signal) - half - 2  # need samples i and i + 1
+        if last_index < self._position:
+            return signal
+        count = int((last_index - self._position) // self.step) + 1
+        positions = self._position + self.step * np.arange(count)
+        index = positions.astype(np.int64)
+        fraction = (positions - index).astype(np.float32)
+        if fraction.any():
+            # One gather of taps + 1 samples yields both neighbours at once
+            windows = np.lib.stride_tricks.sliding_window_view(signal, len(self._pair_filter))
+            pair = windows[index - half] @ self._pair_filter
+            values = pair[:, 0]
+            pair[:, 1] -= values
+            pair[:, 1] *= fraction
+            values += pair[:, 1]
+        else:
+            windows = np.lib.stride_tricks.sliding_window_view(signal, len(self._filter))
+            values = windows[index - half] @ self._filter
+        np.clip(values, -1.0, 1.0, out=values)
+        values *= 32767.0
+        self.output += values.astype('<i2').tobytes()
+
+        self._position += count * self.step
+        drop = max(0, int(self._position) - half)
+        self._position -= drop
+        return signal[drop:]
+
+    def feed(self, data):
+        if self._pending:
+            data = self._pending + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        if not usable:
+            return
+        signal = np.concatenate((self._history, self._to_mono(memoryview(data)[:usable])))
+        self.frames_in += usable // self.frame_bytes
+        self._history = self._emit(signal)
+
+    def finish(self):
+        """Flush the remaining samples; returns the 16-bit mono PCM."""
+        signal = np.concatenate((self._history, np.zeros(self._half + 2, dtype=np.float32)))
+        self._emit(signal)
+        expected = int(round(self.frames_in / self.step))
+        del self.output[expected * 2:]
+        return self.output
@@ -0,0 +1,134 @@
+"""Accuracy and latency benchmark for language_id.identify_language.
+
+Runs short phrases in every supported language, plus out-of-set phrases
+(Portuguese, Ukrainian, Marathi, ...) and loanwords that must be left to
+upstream detection, and reports accuracy, false accepts and mean time per
+call. A phrase counts as identified only at or above --min-confidence, the
+same threshold as LANGID_MIN_CONFIDENCE in the app. Exits with status 1
+below the accuracy budget, above the false-accept budget or above the
+latency budget.
+
+Usage:
+    python benchmarks/language_id_benchmark.py [--iterations 2000]
+        [--min-confidence 0.9] [--min-accuracy 0.95]
+        [--max-false-accepts 0] [--max-call-us 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from language_id import identify_language  # noqa: E402
+
+# (expected language code, phrase)
+PHRASES = [
+    ('en', 'Where is the nearest hospital?'),
+    ('en', 'Thank you for your help yesterday.'),
+    ('en', 'I lost my passport at the airport this morning.'),
+    ('es', '¿Dónde está el hospital más cercano?'),
+    ('es', 'Gracias por tu ayuda de ayer.'),
+    ('es', 'Perdí mi pasaporte en el aeropuerto esta mañana.'),
+    ('de', 'Wo ist das nächste Krankenhaus?'),
+    ('de', 'Danke für deine Hilfe gestern.'),
+    ('de', 'Ich habe heute Morgen meinen Pass am Flughafen verloren.'),
+    ('fr', "Où est l'hôpital le plus proche ?"),
+    ('fr', "Merci pour votre aide d'hier."),
+    ('fr', "J'ai perdu mon passeport à l'aéroport ce matin."),
+    ('ru', 'Где ближайшая больница?'),
+    ('ru', 'Сколько стоит билет до центра города?'),
+    ('hi', 'सबसे नज़दीकी अस्पताल कहाँ है?'),
+    ('hi', 'शहर के केंद्र तक का टिकट कितने का है?'),
+    ('bn', 'সবচেয়ে কাছের হাসপাতাল কোথায়?'),
+    ('ta', 'அருகிலுள்ள மருத்துவமனை எங்கே?'),
+    ('te', 'దగ్గరలోని ఆసుపత్రి ఎక్కడ ఉంది?'),
+    ('kn', 'ಹತ್ತಿರದ ಆಸ್ಪತ್ರೆ ಎಲ್ಲಿದೆ?'),
+    ('gu', 'નજીકની હોસ્પિટલ ક્યાં છે?'),
+    ('pa', 'ਸਭ ਤੋਂ ਨੇੜੇ ਹਸਪਤਾਲ ਕਿੱਥੇ ਹੈ?'),
+    ('zh-CN', '最近的医院在哪里？'),
+    ('ja', '一番近い病院はどこですか？'),
+    ('ko', '가장 가까운 병원이 어디에 있나요?'),
+]
+
+# (language, phrase) that must not be identified locally: too short, or in
+# a language the models do not cover
+NEGATIVES = [
+    ('en', 'good morning'),
+    ('es', 'buenos días'),
+    ('de', 'guten Morgen'),
+    ('fr', 'bonjour'),
+    ('-', 'hotel'),
+    ('-', 'Pizza'),
+    ('pt', 'Onde fica o hospital mais próximo?'),
+    ('pt', 'Obrigado pela sua ajuda ontem.'),
+    ('it', 'Quanto costa un biglietto per il centro città?'),
+    ('nl', 'Waar is het dichtstbijzijnde ziekenhuis?'),
+    ('nl', 'Bedankt voor je hulp gisteren.'),
+    ('sv', 'Var ligger närmaste sjukhus?'),
+    ('tr', 'En yakın hastane nerede?'),
+    ('tr', 'Bu sabah havalimanında pasaportumu kaybettim.'),
+    ('pl', 'Dziś rano zgubiłem paszport na lotnisku.'),
+    ('ro', 'Unde este cel mai apropiat spital?'),
+    ('ca', "On és l'hospital més proper?"),
+    ('id', 'Saya kehilangan paspor di bandara pagi ini.'),
+    ('uk', 'Де найближча лікарня?'),
+    ('uk', 'Дякую за вашу допомогу вчора.'),
+    ('bg', 'Къде е най-близката болница?'),
+    ('sr', 'Где је најближа болница?'),
+    ('mr', 'सर्वात जवळचे रुग्णालय कुठे आहे?'),
+    ('ne', 'सबैभन्दा नजिकको अस्पताल कहाँ छ?'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local language identification benchmark')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--min-confidence', type=float, default=0.9)
+    parser.add_argument('--min-accuracy', type=float, default=0.95)
+    parser.add_argument('--max-false-accepts', type=int, default=0)
+    parser.add_argument('--max-call-us', type=float, default=500.0)
+    args = parser.parse_args()
+
+    def identify(phrase):
+        detected, confidence = identify_language(phrase)
+        return (detected if confidence >= args.min_confidence else None), confidence
+
+    correct = 0
+    for expected, phrase in PHRASES:
+        detected, confidence = identify(phrase)
+        status = 'ok' if detected == expected else 'MISS'
+        correct += detected == expected
+        print(f'{status:5} {expected:6} -> {str(detected):6} ({confidence:.2f})  {phrase}')
+    accuracy = correct / len(PHRASES)
+
+    false_accepts = 0
+    for language, phrase in NEGATIVES:
+        detected, confidence = identify(phrase)
+        status = 'ok' if detected is None else 'FALSE'
+        false_accepts += detected is not None
+        print(f'{status:5} {language:6} -> {str(detected):6} ({confidence:.2f})  {phrase}')
+
+    phrases = [phrase for _, phrase in PHRASES + NEGATIVES]
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        identify_language(phrases[i % len(phrases)])
+    call_us = (time.perf_counter() - start) / args.iterations * 1e6
+
+    print(f'\nAccuracy: {accuracy:.1%} ({correct}/{len(PHRASES)}), '
+          f'false accepts: {false_accepts}/{len(NEGATIVES)}, mean {call_us:.1f}us per call')
+    failed = False
+    if accuracy < args.min_accuracy:
+        print(f'FAIL: accuracy below {args.min_accuracy:.0%}')
+        failed = True
+    if false_accepts > args.max_false_accepts:
+        print(f'FAIL: more than {args.max_false_accepts} out-of-set phrases identified locally')
+        failed = True
+    if call_us > args.max_call_us:
+        print(f'FAIL: mean call time over {args.max_call_us:.0f}us')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
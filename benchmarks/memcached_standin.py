@@ -0,0 +1,95 @@
+"""Local stand-in for memcached (text protocol get/gets/set/add/cas/delete).
+
+Good enough to exercise cache_backends.MemcachedCache without installing
+memcached:
+
+    python benchmarks/memcached_standin.py --port 11211
+"""
+import argparse
+import socketserver
+import threading
+from collections import OrderedDict
+
+
+class MemcachedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        lock = self.server.lock
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            if not parts:
+                continue
+            command = parts[0]
+            if command in (b'get', b'gets'):
+                reply = []
+                for key in parts[1:]:
+                    with lock:
+                        entry = store.get(key)
+                        if entry is not None:
+                            store.move_to_end(key)
+                    if entry is not None:
+                        value, unique = entry
+                        suffix = b' %d' % unique if command == b'gets' else b''
+                        reply.append(b'VALUE %s 0 %d%s\r\n%s\r\n' % (key, len(value), suffix, value))
+                reply.append(b'END\r\n')
+                self.wfile.write(b''.join(reply))
+            elif command in (b'set', b'add', b'cas'):
+                length = int(parts[4])
+                value = self.rfile.read(length + 2)[:-2]
+                with lock:
+                    entry = store.get(parts[1])
+                    if command == b'add' and entry is not None:
+                        reply = b'NOT_STORED\r\n'
+                    elif command == b'cas' and entry is None:
+                        reply = b'NOT_FOUND\r\n'
+                    elif command == b'cas' and entry[1] != int(parts[5]):
+                        reply = b'EXISTS\r\n'
+                    else:
+                        self.server.next_unique += 1
+                        store[parts[1]] = (value, self.server.next_unique)
+                        store.move_to_end(parts[1])
+                        while len(store) > self.server.max_entries:
+                            store.popitem(last=False)
+                        reply = b'STORED\r\n'
+                self.wfile.write(reply)
+            elif command == b'delete':
+                with lock:
+                    found = store.pop(parts[1], None) is not None
+                self.wfile.write(b'DELETED\r\n' if found else b'NOT_FOUND\r\n')
+            elif command == b'quit':
+                return
+            else:
+                self.wfile.write(b'ERROR\r\n')
+
+
+class MemcachedStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, max_entries=10000):
+        super().__init__(address, MemcachedHandler)
+        self.store = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_unique = 0
+        self.max_entries = max_entries
+
+
+def start_in_thread(host='127.0.0.1', port=0, max_entries=10000):
+    """Start a stand-in server in a daemon thread and return it."""
+    server = MemcachedStandIn((host, port), max_entries=max_entries)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='memcached stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11211)
+    parser.add_argument('--max-entries', type=int, default=10000)
+    args = parser.parse_args()
+    with MemcachedStandIn((args.host, args.port), args.max_entries) as server:
+        print(f"memcached stand-in listening on {args.host}:{args.port}")
+        server.serve_forever()
@@ -0,0 +1,346 @@
+"""Per-request memory benchmark for the request hot paths.
+
+Scenarios, each run in a fresh interpreter so peak RSS belongs to it alone:
+
+- translate:     POST /translate with the audio inlined as base64 JSON
+- speech_wav16:  POST /speech-to-text, 60s 16 kHz mono WAV (passthrough)
+- speech_wav44:  POST /speech-to-text, 60s 44.1 kHz stereo WAV (NumPy path)
+- desktop_speak: main.TranslatorApp.speak_text, gTTS path (needs the
+                 desktop dependencies; skipped otherwise)
+
+Upstream services are replaced by stand-ins. Translation echoes the text.
+TTS returns MP3-sized bytes (about 270 bytes per character, like gTTS).
+Recognition encodes the audio as WAV, as the real client does before
+uploading, and returns a fixed transcript. Playback does nothing. Every
+request uses new text or audio, so no cache can answer it.
+
+Reported per request (median of --runs):
+
+- peak:     peak traced Python allocation during the request (tracemalloc)
+- retained: traced memory still held afterwards (cache entries and leaks)
+- copies:   peak / payload, where the payload is the MP3 or the upload.
+            Roughly how many copies of it were alive at the same time.
+
+Also reported: peak RSS growth while --concurrency requests run at once.
+The exit status is 1 if a scenario goes over its copies or RSS budget
+(BUDGETS, scaled by --budget-scale).
+
+Usage:
+    python benchmarks/memory_benchmark.py [--scenarios translate speech_wav16 ...]
+        [--runs 5] [--concurrency 8] [--budget-scale 1.0]
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+import wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ('translate', 'speech_wav16', 'speech_wav44', 'desktop_speak')
+
+# Upper limits: copies of the payload alive at the peak of one request, and
+# peak RSS growth in MB while --concurrency requests run at once
+BUDGETS = {
+    'translate': {'copies': 5.5, 'rss_mb': 30},
+    'speech_wav16': {'copies': 2.5, 'rss_mb': 40},
+    'speech_wav44': {'copies': 0.6, 'rss_mb': 80},
+    'desktop_speak': {'copies': 1.0, 'rss_mb': 20},
+}
+
+TEXT_LENGTH = 1500
+MP3_BYTES_PER_CHARACTER = 270
+AUDIO_SECONDS = 60
+BOUNDARY = 'memory-benchmark-boundary'
+
+# Source of the stand-in MP3 bytes; written out in slices without copying
+MP3_SOURCE = memoryview(os.urandom(TEXT_LENGTH * 2 * MP3_BYTES_PER_CHARACTER))
+
+
+class StandInTranslator:
+    """deep_translator.GoogleTranslator that echoes the text."""
+
+    def __init__(self, source='auto', target='en', **kwargs):
+        self.target = target
+
+    def translate(self, text=None, **kwargs):
+        return text
+
+    def translate_batch(self, batch=None, **kwargs):
+        return [self.translate(text) for text in batch]
+
+
+class StandInTTS:
+    """gtts.gTTS that writes MP3-sized data in per-sentence parts."""
+
+    def __init__(self, text=None, lang='en', slow=False, **kwargs):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        # gTTS requests up to 100 characters at a time
+        for start in range(0, len(self.text), 100):
+            part = len(self.text[start:start + 100]) * MP3_BYTES_PER_CHARACTER
+            fp.write(MP3_SOURCE[start * MP3_BYTES_PER_CHARACTER:][:part])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            self.write_to_fp(f)
+
+
+def recognize_stand_in(recognizer, audio_data, language=None, show_all=False, **kwargs):
+    """Recognizer.recognize_google: the real one encodes the audio first."""
+    audio_data.get_wav_data()
+    if show_all:
+        return {'alternative': [{'transcript': 'stand-in transcript', 'confidence': 0.9}]}
+    return 'stand-in transcript'
+
+
+def install_stand_ins():
+    import deep_translator
+    import gtts
+    import speech_recognition
+
+    deep_translator.GoogleTranslator = StandInTranslator
+    gtts.gTTS = StandInTTS
+    speech_recognition.Recognizer.recognize_google = recognize_stand_in
+    sys.modules['playsound'] = types.SimpleNamespace(playsound=lambda path, block=True: None)
+
+
+def make_text(run):
+    sentence = f'Announcement {run}: the train to platform {run % 9 + 1} is delayed. '
+    return (sentence * (TEXT_LENGTH // len(sentence) + 1))[:TEXT_LENGTH]
+
+
+def make_wav(run, rate, channels):
+    """AUDIO_SECONDS of noise; different for every run (no dedup hits)."""
+    frames = AUDIO_SECONDS * rate
+    pcm = os.urandom(frames * channels * 2)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def multipart_body(wav_bytes):
+    head = (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="language"\r\n\r\nEnglish\r\n'
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="audio"; filename="speech.wav"\r\n'
+        f'Content-Type: audio/wav\r\n\r\n'
+    ).encode('ascii')
+    return head + wav_bytes + f'\r\n--{BOUNDARY}--\r\n'.encode('ascii')
+
+
+class Scenario:
+    """prepare(run) builds the input outside the measurement; request(input)
+    runs one request and returns (response, payload bytes)."""
+
+    def __init__(self, name):
+        self.name = name
+        if name == 'desktop_speak':
+            import main  # noqa: F401 (ImportError: desktop dependencies missing)
+        else:
+            import app
+
+            self.app = app.app
+
+    def prepare(self, run):
+        if self.name == 'translate' or self.name == 'desktop_speak':
+            return make_text(run)
+        rate, channels = (16000, 1) if self.name == 'speech_wav16' else (44100, 2)
+        return multipart_body(make_wav(run, rate, channels))
+
+    def request(self, prepared):
+        if self.name == 'desktop_speak':
+            return self._speak(prepared)
+        client = self.app.test_client()
+        headers = {'Accept-Encoding': 'gzip, br'}
+        if self.name == 'translate':
+            response = client.post('/translate', json={
+                'text': prepared, 'from_lang': 'English', 'to_lang': 'Hindi', 'audio_format': 'mp3'
+            }, headers=headers)
+            return response, len(prepared) * MP3_BYTES_PER_CHARACTER
+        response = client.post(
+            '/speech-to-text', data=prepared, headers=headers,
+            content_type=f'multipart/form-data; boundary={BOUNDARY}'
+        )
+        return response, len(prepared)
+
+    def _speak(self, text):
+        import main
+
+        def update_status(message, is_error=False):
+            if is_error:
+                raise RuntimeError(message)
+
+        desktop = types.SimpleNamespace(
+            current_voice=None, current_speed=150, current_volume=1.0, update_status=update_status
+        )
+        main.TranslatorApp.speak_text(desktop, text, 'hi')
+        return None, len(text) * MP3_BYTES_PER_CHARACTER
+
+    def check(self, response):
+        if response is not None and response.status_code != 200:
+            raise RuntimeError(f'{self.name}: HTTP {response.status_code}: {response.get_data()[:200]!r}')
+
+
+def read_status_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return None
+
+
+def reset_peak_rss():
+    """Reset VmHWM to the current RSS (Linux); False if not possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure_request(scenario, run):
+    prepared = scenario.prepare(run)
+    gc.collect()
+    tracemalloc.start()
+    response, payload = scenario.request(prepared)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    scenario.check(response)
+    return {'peak': peak, 'retained': current, 'payload': payload}
+
+
+def measure_concurrent(scenario, concurrency, first_run):
+    prepared = [scenario.prepare(first_run + i) for i in range(concurrency)]
+    gc.collect()
+    if not reset_peak_rss():
+        return None
+    baseline = read_status_kb('VmRSS:')
+    errors = []
+
+    def worker(item):
+        try:
+            response, _ = scenario.request(item)
+            scenario.check(response)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(item,)) for item in prepared]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return (read_status_kb('VmHWM:') - baseline) / 1024
+
+
+def run_child(name, runs, concurrency):
+    """Measure one scenario in this process; prints one JSON line."""
+    try:
+        install_stand_ins()
+        scenario = Scenario(name)
+    except ImportError as e:
+        print(json.dumps({'skipped': str(e)}))
+        return 0
+    workdir = tempfile.mkdtemp(prefix='memory_benchmark_')
+    os.chdir(workdir)  # the desktop path writes temp.mp3 to the working directory
+
+    # The first request loads libraries and fills lazy state
+    scenario.check(scenario.request(scenario.prepare(-1))[0])
+    results = [measure_request(scenario, run) for run in range(runs)]
+    start = time.perf_counter()
+    rss_mb = measure_concurrent(scenario, concurrency, runs)
+    print(json.dumps({
+        'peak': statistics.median(r['peak'] for r in results),
+        'retained': statistics.median(r['retained'] for r in results),
+        'payload': statistics.median(r['payload'] for r in results),
+        'rss_mb': rss_mb,
+        'concurrent_seconds': time.perf_counter() - start,
+    }))
+    return 0
+
+
+def run_scenario(name, runs, concurrency):
+    """Run one scenario in a fresh interpreter with throwaway state."""
+    state_dir = tempfile.mkdtemp(prefix='memory_benchmark_state_')
+    env = dict(
+        os.environ,
+        CACHE_BACKEND='memory',
+        CACHE_SNAPSHOT_DIR=os.path.join(state_dir, 'snapshots'),
+        TRAFFIC_STATS_PATH=os.path.join(state_dir, 'stats.sqlite3'),
+        JOBS_DIR=os.path.join(state_dir, 'jobs'),
+        RATE_LIMIT_PER_MINUTE='0',
+        TRACE_EXPORT='',
+    )
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', name,
+         '--runs', str(runs), '--concurrency', str(concurrency)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-request memory benchmark')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--budget-scale', type=float, default=1.0)
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.runs, args.concurrency)
+
+    print(f"{'scenario':14} {'payload':>9} {'peak':>9} {'retained':>9} {'copies':>7} "
+          f"{'RSS x' + str(args.concurrency):>10}")
+    failures = []
+    for name in args.scenarios:
+        try:
+            result = run_scenario(name, args.runs, args.concurrency)
+        except Exception as e:
+            failures.append(f'{name} failed: {e}')
+            print(f'{name:14} failed: {e}')
+            continue
+        if 'skipped' in result:
+            print(f"{name:14} skipped: {result['skipped']}")
+            continue
+        copies = result['peak'] / result['payload']
+        rss = 'n/a' if result['rss_mb'] is None else f"{result['rss_mb']:.1f}MB"
+        print(
+            f"{name:14} {result['payload'] / 1e6:7.2f}MB {result['peak'] / 1e6:7.2f}MB "
+            f"{result['retained'] / 1e6:7.2f}MB {copies:7.2f} {rss:>10}"
+        )
+        budget = BUDGETS[name]
+        if copies > budget['copies'] * args.budget_scale:
+            failures.append(f"{name}: {copies:.2f} copies of the payload (budget {budget['copies'] * args.budget_scale:g})")
+        if result['rss_mb'] is not None and result['rss_mb'] > budget['rss_mb'] * args.budget_scale:
+            failures.append(f"{name}: peak RSS grew {result['rss_mb']:.1f}MB (budget {budget['rss_mb'] * args.budget_scale:g}MB)")
+
+    if failures:
+        print('\nFAIL: ' + '; '.join(failures))
+        return 1
+    print('\nOK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Throughput and allocation benchmark for WAV downmix/resampling.
+
+Converts a synthetic stereo 44.1 kHz WAV to 16 kHz mono three ways:
+
+- numpy:  audio_resample.StreamingResampler fed in 64KB upload blocks
+- pydub:  AudioSegment.set_channels(1).set_frame_rate(16000).export()
+          (the conversion /speech-to-text used before)
+- ffmpeg: piping the WAV through the bundled ffmpeg
+
+and reports speed (seconds of audio converted per second) and peak traced
+Python/NumPy memory (tracemalloc). pydub's WAV path is audioop's linear
+interpolation without an anti-aliasing filter, so it is a speed floor
+rather than a like-for-like comparison. Exits with status 1 if the NumPy
+path runs below --min-realtime, allocates more than pydub, or its peak
+exceeds --max-peak-ratio times the size of the 16 kHz output.
+
+Usage:
+    python benchmarks/resample_benchmark.py [--seconds 60] [--rate 44100]
+        [--channels 2] [--runs 3] [--min-realtime 200] [--max-peak-ratio 2.0]
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from audio_resample import StreamingResampler  # noqa: E402
+
+BLOCK_SIZE = 64 * 1024
+
+
+def make_wav(seconds, rate, channels):
+    t = np.arange(int(seconds * rate)) / rate
+    # Speech-band tones plus noise above the 8 kHz output Nyquist
+    signal = 0.4 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 1800 * t)
+    signal += 0.05 * np.random.default_rng(0).standard_normal(len(t))
+    samples = np.repeat((signal * 20000).astype('<i2')[:, None], channels, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def convert_numpy(wav_bytes):
+    with wave.open(io.BytesIO(wav_bytes)) as wav:
+        rate, channels = wav.getframerate(), wav.getnchannels()
+    data_offset = wav_bytes.find(b'data') + 8
+    resampler = StreamingResampler(rate, channels)
+    view = memoryview(wav_bytes)
+    for start in range(data_offset, len(wav_bytes), BLOCK_SIZE):
+        resampler.feed(bytes(view[start:start + BLOCK_SIZE]))
+    return resampler.finish()
+
+
+def convert_pydub(wav_bytes):
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(io.BytesIO(wav_bytes), format='wav')
+    buffer = io.BytesIO()
+    audio.set_channels(1).set_frame_rate(16000).export(buffer, format='wav')
+    return buffer.getvalue()[44:]
+
+
+def convert_ffmpeg(wav_bytes):
+    import imageio_ffmpeg
+
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(), '-hide_banner', '-loglevel', 'error',
+        '-f', 'wav', '-i', 'pipe:0', '-ac', '1', '-ar', '16000', '-f', 's16le', 'pipe:1'
+    ]
+    return subprocess.run(command, input=wav_bytes, capture_output=True, check=True).stdout
+
+
+def measure(convert, wav_bytes, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = convert(wav_bytes)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    convert(wav_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WAV downmix/resample benchmark')
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--rate', type=int, default=44100)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--min-realtime', type=float, default=200.0)
+    parser.add_argument('--max-peak-ratio', type=float, default=2.0)
+    args = parser.parse_args()
+
+    wav_bytes = make_wav(args.seconds, args.rate, args.channels)
+    print(f'Input: {args.seconds:g}s, {args.channels}ch, {args.rate} Hz, {len(wav_bytes) / 1e6:.1f}MB\n')
+    print(f"{'path':8} {'time':>9} {'x realtime':>11} {'peak alloc':>11} {'output':>9}")
+    results = {}
+    for name, convert in (('numpy', convert_numpy), ('pydub', convert_pydub), ('ffmpeg', convert_ffmpeg)):
+        try:
+            elapsed, peak, output_bytes = measure(convert, wav_bytes, args.runs)
+        except Exception as e:
+            print(f'{name:8} skipped: {e}')
+            continue
+        results[name] = (elapsed, peak, output_bytes)
+        print(
+            f'{name:8} {elapsed * 1000:7.1f}ms {args.seconds / elapsed:10.0f}x '
+            f'{peak / 1e6:9.2f}MB {output_bytes / 1e6:7.2f}MB'
+        )
+    # ffmpeg's memory is in another process; tracemalloc sees only the pipes
+
+    failed = False
+    elapsed, peak, output_bytes = results['numpy']
+    if args.seconds / elapsed < args.min_realtime:
+        print(f'\nFAIL: NumPy path is below {args.min_realtime:g}x realtime')
+        failed = True
+    if 'pydub' in results and peak > results['pydub'][1]:
+        print('\nFAIL: NumPy path allocates more than pydub')
+        failed = True
+    if peak > args.max_peak_ratio * output_bytes:
+        print(f'\nFAIL: NumPy peak allocation is over {args.max_peak_ratio:g}x the output size')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Hit rate and memory of the TTS cache backends with 1, 2 and 8 workers.
+
+Each worker process replays the same Zipf-distributed stream of requests
+(as gunicorn would spread real traffic), calling get() and set() on a miss
+with a payload the size of a typical base64 MP3. Reports the aggregate hit
+rate and the summed proportional set size (PSS, falls back to RSS) of the
+workers.
+
+Usage:
+    python benchmarks/shared_cache_benchmark.py [--requests 4000]
+        [--workers 1 2 8] [--backends memory sqlite memcached]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import MemcachedCache, MemoryCache, SQLiteCache, make_cache_key  # noqa: E402
+from memcached_standin import start_in_thread  # noqa: E402
+
+PAYLOAD_SIZE = 32 * 1024  # ~ base64 of a short gTTS MP3
+
+
+def memory_kb():
+    """Proportional set size of this process in kB (RSS if PSS unavailable)."""
+    for path, field in (('/proc/self/smaps_rollup', 'Pss:'), ('/proc/self/status', 'VmRSS:')):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except OSError:
+            continue
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_cache(backend, config):
+    if backend == 'memory':
+        return MemoryCache('tts', max_entries=config['max_entries'])
+    if backend == 'sqlite':
+        return SQLiteCache('tts', config['path'], max_entries=config['max_entries'])
+    return MemcachedCache('tts', config['server'])
+
+
+def worker(backend, config, worker_id, n_workers, results):
+    cache = make_cache(backend, config)
+    rng = random.Random(1234)
+    keys = config['keys']
+    weights = config['weights']
+    stream = rng.choices(range(keys), weights=weights, k=config['requests'])
+    baseline = memory_kb()
+    # Round-robin the shared stream across workers like a load balancer
+    for i in range(worker_id, len(stream), n_workers):
+        key = make_cache_key(f'phrase {stream[i]}', 'hi')
+        if cache.get(key) is None:
+            cache.set(key, (f'{stream[i]}:' * (PAYLOAD_SIZE // 6))[:PAYLOAD_SIZE])
+    stats = cache.stats()
+    results.put((stats['hits'], stats['misses'], memory_kb(), memory_kb() - baseline))
+
+
+def run(backend, n_workers, config):
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=worker, args=(backend, config, i, n_workers, results))
+        for i in range(n_workers)
+    ]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    hits = sum(r[0] for r in rows)
+    misses = sum(r[1] for r in rows)
+    return hits / (hits + misses), sum(r[2] for r in rows), sum(r[3] for r in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--keys', type=int, default=2000)
+    parser.add_argument('--max-entries', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 8])
+    parser.add_argument('--backends', nargs='+', default=['memory', 'sqlite', 'memcached'])
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method('fork')
+    server = start_in_thread(max_entries=args.max_entries)
+    weights = [1.0 / (rank + 1) for rank in range(args.keys)]
+
+    print(f"{'backend':<10} {'workers':>7} {'hit rate':>9} {'PSS total':>11} {'PSS growth':>11}")
+    for backend in args.backends:
+        for n_workers in args.workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                # Fresh stand-in store per run
+                server.store.clear()
+                config = {
+                    'requests': args.requests,
+                    'keys': args.keys,
+                    'weights': weights,
+                    'max_entries': args.max_entries,
+                    'path': os.path.join(tmp, 'cache.sqlite3'),
+                    'server': '%s:%d' % server.server_address,
+                }
+                hit_rate, total_kb, growth_kb = run(backend, n_workers, config)
+            print(f"{backend:<10} {n_workers:>7} {hit_rate:>9.1%} "
+                  f"{total_kb / 1024:>9.1f}MB {growth_kb / 1024:>9.1f}MB")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Startup-time benchmark for the Flask backend.
+
+Imports app.py in a fresh interpreter, then times the first /healthz request.
+Exits with status 1 if either measurement exceeds its budget, or if a heavy
+dependency was imported eagerly.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5]
+        [--import-budget-ms 300] [--first-request-budget-ms 100]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded just by importing app.py
+HEAVY_MODULES = [
+    'deep_translator',
+    'gtts',
+    'speech_recognition',
+    'pydub',
+    'imageio_ffmpeg',
+    'numpy',
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - start) * 1000
+client = app.app.test_client()
+start = time.perf_counter()
+response = client.get('/healthz')
+first_request_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    'import_ms': import_ms,
+    'first_request_ms': first_request_ms,
+    'status': response.status_code,
+    'eager_modules': [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe():
+    """Run one cold-start measurement in a separate interpreter."""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float,
+                        default=float(os.environ.get('IMPORT_BUDGET_MS', 300)))
+    parser.add_argument('--first-request-budget-ms', type=float,
+                        default=float(os.environ.get('FIRST_REQUEST_BUDGET_MS', 100)))
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    import_ms = statistics.median(r['import_ms'] for r in results)
+    first_request_ms = statistics.median(r['first_request_ms'] for r in results)
+    eager_modules = sorted({m for r in results for m in r['eager_modules']})
+
+    print(f"import app:        {import_ms:8.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"first /healthz:    {first_request_ms:8.1f} ms (budget {args.first_request_budget_ms:.0f} ms)")
+    print(f"eager heavy deps:  {', '.join(eager_modules) or 'none'}")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append('import time over budget')
+    if first_request_ms > args.first_request_budget_ms:
+        failures.append('first request time over budget')
+    if any(r['status'] != 200 for r in results):
+        failures.append('/healthz did not return 200')
+    if eager_modules:
+        failures.append('heavy dependencies imported at startup')
+
+    if failures:
+        print(f"FAIL: {'; '.join(failures)}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Local stand-in for a trace collector.
+
+Accepts the batches posted by tracing.HttpExporter and appends each trace
+as a JSON line to a file (or stdout), printing a per-stage summary of slow
+requests:
+
+    python benchmarks/trace_collector_standin.py --port 4318 --output traces.jsonl
+    TRACE_EXPORT=http://127.0.0.1:4318/traces python app.py
+"""
+import argparse
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            traces = json.loads(self.rfile.read(length))['traces']
+        except (ValueError, KeyError) as e:
+            self.send_error(400, f'Bad trace batch: {e}')
+            return
+        self.server.record(traces)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TraceCollector(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, output=None, slow_ms=None):
+        super().__init__(address, CollectorHandler)
+        self.output = output
+        self.slow_ms = slow_ms
+        self.traces = []
+        self.lock = threading.Lock()
+
+    def record(self, traces):
+        with self.lock:
+            self.traces.extend(traces)
+            if self.output is not None:
+                for trace in traces:
+                    self.output.write(json.dumps(trace, ensure_ascii=False) + '\n')
+                self.output.flush()
+        if self.slow_ms is not None:
+            for trace in traces:
+                if trace['duration_ms'] >= self.slow_ms:
+                    stages = ', '.join(f"{s['name']}={s['duration_ms']:.0f}ms" for s in trace['spans'])
+                    print(f"{trace['trace_id']} {trace['name']} {trace['duration_ms']:.0f}ms: {stages}",
+                          file=sys.stderr)
+
+
+def start_in_thread(host='127.0.0.1', port=0, output=None):
+    """Start a collector in a daemon thread and return it (traces kept in .traces)."""
+    server = TraceCollector((host, port), output=output)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Trace collector stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4318)
+    parser.add_argument('--output', help='JSON-lines file (default: stdout)')
+    parser.add_argument('--slow-ms', type=float, default=2000, help='print stage breakdown above this')
+    args = parser.parse_args()
+    output = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    with TraceCollector((args.host, args.port), output=output, slow_ms=args.slow_ms) as server:
+        print(f'Trace collector listening on {args.host}:{args.port}', file=sys.stderr)
+        server.serve_forever()
@@ -0,0 +1,452 @@
+"""Cache backends for translations and TTS audio.
+
+Every backend exposes the same small interface:
+
+    cache.get(key)          -> str or None
+    cache.set(key, value)
+    cache.compare_and_set(key, expected, value) -> True if stored
+    cache.stats()           -> dict with hits, misses, size
+    cache.snapshot()        -> number of entries written to disk
+    len(cache)
+
+Keys are short hex strings built with make_cache_key(); values are strings
+(translated text or base64 audio).
+
+- MemoryCache lives inside one process (the original behaviour).
+- SQLiteCache is a file on local disk, shared by every gunicorn worker on
+  the host.
+- MemcachedCache talks the memcached text protocol to a network cache
+  (a real memcached or benchmarks/memcached_standin.py).
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(*parts):
+    """Build a fixed-length cache key from the given parts."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class CacheStats:
+    """Per-process hit/miss counters shared by all backends."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class MemoryCache:
+    """In-process LRU cache (one copy per worker).
+
+    With a snapshot_path, snapshot() writes the entries to disk (JSON lines,
+    least recently used first) and they are restored on first use after a
+    restart.
+    """
+
+    backend = 'memory'
+
+    def __init__(self, name, max_entries=100, snapshot_path=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.snapshot_path = snapshot_path
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+        self._restored = snapshot_path is None
+
+    def _ensure_restored(self):
+        """Load the snapshot lazily so startup does not pay for it."""
+        if self._restored:
+            return
+        with self._lock:
+            if self._restored:
+                return
+            self._restored = True
+            if not os.path.exists(self.snapshot_path):
+                return
+            try:
+                with open(self.snapshot_path, encoding='utf-8') as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        self._data[entry['k']] = entry['v']
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+                logger.info(f"Restored {len(self._data)} entries into cache '{self.name}'")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not restore cache '{self.name}' snapshot: {e}")
+
+    def snapshot(self):
+        """Write entries to snapshot_path atomically; returns the count."""
+        if self.snapshot_path is None:
+            return 0
+        self._ensure_restored()
+        with self._lock:
+            entries = list(self._data.items())
+        directory = os.path.dirname(self.snapshot_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = f'{self.snapshot_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for key, value in entries:
+                f.write(json.dumps({'k': key, 'v': value}) + '\n')
+        os.replace(temp_path, self.snapshot_path)
+        return len(entries)
+
+    def get(self, key):
+        self._ensure_restored()
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+        self._stats.record(value is not None)
+        return value
+
+    def set(self, key, value):
+        self._ensure_restored()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def compare_and_set(self, key, expected, value):
+        """Store value only if the key currently holds expected (None: absent)."""
+        self._ensure_restored()
+        with self._lock:
+            if self._data.get(key) != expected:
+                return False
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return True
+
+    def clear(self):
+        self._ensure_restored()
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        self._ensure_restored()
+        return len(self._data)
+
+    def stats(self):
+        stats = self._stats.as_dict()
+        stats.update(backend=self.backend, size=len(self), max_entries=self.max_entries)
+        return stats
+
+
+class SQLiteCache:
+    """LRU cache stored in a SQLite file shared by all processes on the host.
+
+    Each process/thread opens its own connection (connections must not cross
+    a fork). WAL mode lets readers in other workers proceed while one writes.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, name, path, max_entries=1000, timeout=5.0):
+        self.name = name
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._stats = CacheStats()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)'
+            )
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "{name}_accessed" ON "{name}" (accessed)'
+            )
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                f'SELECT value FROM "{self.name}" WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                with conn:
+                    conn.execute(
+                        f'UPDATE "{self.name}" SET accessed = ? WHERE key = ?',
+                        (time.time(), key)
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"SQLite cache read failed: {e}")
+            row = None
+        self._stats.record(row is not None)
+        return row[0] if row is not None else None
+
+    def set(self, key, value):
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, accessed) VALUES (?, ?, ?)',
+                    (key, value, time.time())
+                )
+                # Evict least recently used rows beyond the limit
+                conn.execute(
+                    f'DELETE FROM "{self.name}" WHERE key IN ('
+                    f'SELECT key FROM "{self.name}" ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"SQLite cache write failed: {e}")
+
+    def compare_and_set(self, key, expected, value):
+        """Store value only if the key currently holds expected (None: absent).
+
+        The check and the write are one statement, so concurrent callers in
+        other workers cannot both succeed against the same expected value.
+        """
+        try:
+            conn = self._connection()
+            with conn:
+                if expected is None:
+                    cursor = conn.execute(
+                        f'INSERT OR IGNORE INTO "{self.name}" (key, value, accessed) VALUES (?, ?, ?)',
+                        (key, value, time.time())
+                    )
+                else:
+                    cursor = conn.execute(
+                        f'UPDATE "{self.name}" SET value = ?, accessed = ? WHERE key = ? AND value = ?',
+                        (value, time.time(), key, expected)
+                    )
+                if cursor.rowcount != 1:
+                    return False
+                conn.execute(
+                    f'DELETE FROM "{self.name}" WHERE key IN ('
+                    f'SELECT key FROM "{self.name}" ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"SQLite cache write failed: {e}")
+            return False
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute(f'DELETE FROM "{self.name}"')
+
+    def snapshot(self):
+        # Already durable on disk
+        return 0
+
+    def __len__(self):
+        try:
+            return self._connection().execute(
+                f'SELECT COUNT(*) FROM "{self.name}"'
+            ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self):
+        stats = self._stats.as_dict()
+        stats.update(backend=self.backend, size=len(self), max_entries=self.max_entries)
+        return stats
+
+
+class MemcachedCache:
+    """Minimal memcached text-protocol client (get/set only).
+
+    Network errors are logged and treated as misses so a cache outage never
+    fails a request. Eviction is left to the server.
+    """
+
+    backend = 'memcached'
+
+    def __init__(self, name, server, ttl=24 * 3600, timeout=1.0):
+        host, _, port = server.partition(':')
+        self.name = name
+        self.address = (host or '127.0.0.1', int(port or 11211))
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._stats = CacheStats()
+
+    def _socket(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None or self._local.pid != os.getpid():
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.sock = sock
+            self._local.file = sock.makefile('rb')
+            self._local.pid = os.getpid()
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _key(self, key):
+        return f'{self.name}:{key}'
+
+    def get(self, key):
+        value = None
+        try:
+            sock = self._socket()
+            sock.sendall(f'get {self._key(key)}\r\n'.encode('ascii'))
+            reader = self._local.file
+            line = reader.readline()
+            if line.startswith(b'VALUE'):
+                length = int(line.split()[3])
+                value = reader.read(length + 2)[:-2].decode('utf-8')
+                line = reader.readline()
+            if line != b'END\r\n':
+                raise ConnectionError(f'unexpected reply {line[:40]!r}')
+        except (OSError, ValueError, IndexError) as e:
+            logger.warning(f"Memcached get failed: {e}")
+            self._reset()
+            value = None
+        self._stats.record(value is not None)
+        return value
+
+    def set(self, key, value):
+        data = value.encode('utf-8')
+        try:
+            sock = self._socket()
+            sock.sendall(
+                f'set {self._key(key)} 0 {self.ttl} {len(data)}\r\n'.encode('ascii')
+                + data + b'\r\n'
+            )
+            line = self._local.file.readline()
+            if line != b'STORED\r\n':
+                raise ConnectionError(f'unexpected reply {line[:40]!r}')
+        except OSError as e:
+            logger.warning(f"Memcached set failed: {e}")
+            self._reset()
+
+    def compare_and_set(self, key, expected, value):
+        """Store value only if the key currently holds expected (None: absent).
+
+        Uses add for a new key and gets/cas otherwise, so the server rejects
+        the write if anyone stored the key in between.
+        """
+        data = value.encode('utf-8')
+        try:
+            sock = self._socket()
+            reader = self._local.file
+            if expected is None:
+                command = f'add {self._key(key)} 0 {self.ttl} {len(data)}'
+            else:
+                sock.sendall(f'gets {self._key(key)}\r\n'.encode('ascii'))
+                line = reader.readline()
+                if line == b'END\r\n':
+                    return False
+                if not line.startswith(b'VALUE'):
+                    raise ConnectionError(f'unexpected reply {line[:40]!r}')
+                _, _, _, length, unique = line.split()
+                current = reader.read(int(length) + 2)[:-2].decode('utf-8')
+                line = reader.readline()
+                if line != b'END\r\n':
+                    raise ConnectionError(f'unexpected reply {line[:40]!r}')
+                if current != expected:
+                    return False
+                command = f'cas {self._key(key)} 0 {self.ttl} {len(data)} {unique.decode("ascii")}'
+            sock.sendall(command.encode('ascii') + b'\r\n' + data + b'\r\n')
+            line = reader.readline()
+            if line in (b'NOT_STORED\r\n', b'EXISTS\r\n', b'NOT_FOUND\r\n'):
+                return False
+            if line != b'STORED\r\n':
+                raise ConnectionError(f'unexpected reply {line[:40]!r}')
+            return True
+        except (OSError, ValueError) as e:
+            logger.warning(f"Memcached compare-and-set failed: {e}")
+            self._reset()
+            return False
+
+    def clear(self):
+        # Entries expire on the server; there is no per-namespace flush.
+        pass
+
+    def snapshot(self):
+        # The server outlives app restarts
+        return 0
+
+    def __len__(self):
+        return 0
+
+    def stats(self):
+        stats = self._stats.as_dict()
+        stats.update(backend=self.backend, server=f'{self.address[0]}:{self.address[1]}')
+        return stats
+
+
+def create_cache(name, backend=None, max_entries=100, path=None, server=None):
+    """Create the configured cache backend, falling back to memory on error.
+
+    Defaults come from the CACHE_BACKEND, CACHE_PATH, CACHE_SERVER and
+    CACHE_SNAPSHOT_DIR environment variables.
+    """
+    backend = (backend or os.environ.get('CACHE_BACKEND', 'sqlite')).lower()
+    try:
+        if backend == 'sqlite':
+            path = path or os.environ.get('CACHE_PATH', '/tmp/linguasync_cache.sqlite3')
+            return SQLiteCache(name, path, max_entries=max_entries)
+        if backend == 'memcached':
+            return MemcachedCache(name, server or os.environ.get('CACHE_SERVER', '127.0.0.1:11211'))
+        if backend != 'memory':
+            logger.warning(f"Unknown cache backend '{backend}', using memory")
+    except Exception as e:
+        logger.warning(f"Could not open {backend} cache '{name}': {e}. Using memory")
+    snapshot_dir = os.environ.get('CACHE_SNAPSHOT_DIR', '/tmp/linguasync_snapshots')
+    return MemoryCache(
+        name,
+        max_entries=max_entries,
+        snapshot_path=os.path.join(snapshot_dir, f'{name}.jsonl') if snapshot_dir else None
+    )
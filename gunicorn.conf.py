@@ -0,0 +1,72 @@
+# Gunicorn settings shared by the Procfile and render.yaml start commands.
+# Gunicorn picks this file up automatically from the working directory.
+import os
+import subprocess
+import sys
+import threading
+
+# Threads per worker. Requests must reach the app (instead of waiting in
+# gunicorn) for admission control to queue, prioritize and reject them.
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def when_ready(server):
+    """Start the /jobs worker tier next to the web workers (one per host).
+
+    Set JOBS_EMBEDDED_WORKER=0 to run `python jobs_worker.py` separately.
+    """
+    if os.environ.get('JOBS_EMBEDDED_WORKER', '1') == '0':
+        return
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs_worker.py')
+    server.jobs_worker = subprocess.Popen([sys.executable, script])
+    server.log.info(f"Started job worker tier (pid {server.jobs_worker.pid})")
+
+
+def on_exit(server):
+    """Stop the job worker tier; running jobs are requeued and resume later."""
+    jobs_worker = getattr(server, 'jobs_worker', None)
+    if jobs_worker is None or jobs_worker.poll() is not None:
+        return
+    jobs_worker.terminate()
+    try:
+        jobs_worker.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        jobs_worker.kill()
+
+
+def post_fork(server, worker):
+    """Optional background warm-up after fork.
+
+    WARM_UP_ON_FORK=1 loads heavy dependencies in a daemon thread so the
+    worker can answer /healthz while translation and audio libraries load.
+    CACHE_WARMUP=1 pre-fills the caches from recent traffic (one worker per
+    host does this).
+    """
+    if os.environ.get('CACHE_WARMUP', '0') == '1':
+        try:
+            from app import start_cache_warmup
+            start_cache_warmup()
+        except Exception as e:
+            server.log.warning(f"Worker {worker.pid} cache warm-up failed to start: {e}")
+
+    if os.environ.get('WARM_UP_ON_FORK', '0') != '1':
+        return
+
+    def run():
+        try:
+            from app import warm_up
+            warm_up()
+        except Exception as e:
+            server.log.warning(f"Worker {worker.pid} warm-up failed: {e}")
+
+    threading.Thread(target=run, name='warm-up', daemon=True).start()
+
+
+def worker_exit(server, worker):
+    """Snapshot in-memory caches and profiler samples on graceful shutdown."""
+    try:
+        from app import dump_profiles, save_cache_snapshots
+        save_cache_snapshots()
+        dump_profiles()
+    except Exception as e:
+        server.log.warning(f"Worker {worker.pid} could not save cache snapshots: {e}")
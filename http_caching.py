@@ -0,0 +1,86 @@
+"""HTTP caching and compression helpers used by app.after_request.
+
+- GET responses get a content-addressed ETag (unless the handler already set
+  one) and answer If-None-Match with 304 Not Modified.
+- Large text/JSON responses are compressed with brotli (if the optional
+  `brotli` package is installed) or gzip, per the client's Accept-Encoding.
+"""
+import hashlib
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+COMPRESS_SLICE_SIZE = 64 * 1024
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'text/html',
+    'text/plain',
+    'text/vtt',
+    'application/x-subrip',
+)
+
+# Cache-Control for audio addressed by content (never changes)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def content_etag(data):
+    """Strong ETag value derived from the response body."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def _choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    # Feeding zlib 64KB slices keeps its output buffers small, and zlib
+    # writes the gzip header and trailer itself (wbits=31): about half the
+    # peak memory of gzip.compress(), which copies the whole output twice
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    view = memoryview(data)
+    parts = [compressor.compress(view[start:start + COMPRESS_SLICE_SIZE])
+             for start in range(0, len(view), COMPRESS_SLICE_SIZE)]
+    parts.append(compressor.flush())
+    return b''.join(parts)
+
+
+def apply_http_caching(response, request):
+    """Add ETag/conditional handling and compression to a response."""
+    if response.is_streamed or response.direct_passthrough:
+        return response
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+
+    data = response.get_data()
+    etag = None
+    if request.method in ('GET', 'HEAD'):
+        # Handlers may set their own tag from the stable part of the content
+        etag = response.get_etag()[0] or content_etag(data)
+
+    mimetype = response.mimetype or ''
+    encoding = None
+    if len(data) >= MIN_COMPRESS_SIZE and mimetype in COMPRESSIBLE_TYPES:
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding(request.accept_encodings)
+        if encoding:
+            response.set_data(compress_body(data, encoding))
+            response.headers['Content-Encoding'] = encoding
+
+    if etag is not None:
+        # Each encoding is a different representation, so it gets its own tag
+        response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+        response.make_conditional(request)
+    return response
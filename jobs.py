@@ -0,0 +1,351 @@
+"""Persistent state of bulk jobs submitted to /jobs.
+
+Jobs live in a SQLite file on the persistent /tmp disk, next to one
+directory per job holding its input and result. The web workers create
+and read jobs; the worker tier (jobs_worker.py) claims and runs them.
+
+- claim() hands a queued job to a worker under a lease. A job whose lease
+  expired (its worker tier died) is claimed again and resumes.
+- Each attempt has a number; progress and completion only count when they
+  come from the current attempt, so a stale worker cannot overwrite a newer
+  one.
+- The code doing the work reports progress through JobRun, saving a
+  checkpoint (its own resume state plus how much output it has written).
+  A retried or resumed attempt starts from the last checkpoint.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+JOB_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+# First retry waits this long, doubling with each further attempt
+RETRY_BACKOFF_SECONDS = 10.0
+
+
+class JobLost(Exception):
+    """The job was taken over by a newer attempt (or removed)."""
+
+
+class JobFailed(Exception):
+    """The job cannot succeed (bad input); it is not retried."""
+
+
+def valid_job_id(job_id):
+    return bool(JOB_ID_RE.fullmatch(job_id or ''))
+
+
+class JobStore:
+    """Job records and files under `root`."""
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, 'jobs.sqlite3')
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(self.root, exist_ok=True)
+        # Autocommit mode; multi-statement updates use explicit transactions
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, '
+                'params TEXT NOT NULL, done REAL NOT NULL DEFAULT 0, total REAL, unit TEXT, '
+                'checkpoint TEXT, attempts INTEGER NOT NULL DEFAULT 0, '
+                'max_attempts INTEGER NOT NULL, error TEXT, created_at REAL NOT NULL, '
+                'updated_at REAL NOT NULL, run_after REAL NOT NULL, lease_expires REAL, '
+                'worker TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, run_after)')
+            self._initialized = True
+        return conn
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def input_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), 'input')
+
+    def result_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), 'result')
+
+    def new_job(self):
+        """Reserve a job id and create its directory."""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        return job_id
+
+    def discard(self, job_id):
+        """Remove a job's files (e.g. after a rejected upload)."""
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def create(self, job_id, kind, params, max_attempts=3):
+        """Queue a job whose input is already in input_path(job_id)."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO jobs (id, kind, status, params, max_attempts, created_at, '
+                'updated_at, run_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, STATUS_QUEUED, json.dumps(params), max_attempts, now, now, now)
+            )
+        finally:
+            conn.close()
+
+    def get(self, job_id):
+        """Public view of a job (a dict), or None if unknown."""
+        if not valid_job_id(job_id):
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        if row['status'] == STATUS_SUCCEEDED:
+            progress = 1.0
+        elif row['total']:
+            progress = min(1.0, row['done'] / row['total'])
+        else:
+            progress = None
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'params': json.loads(row['params']),
+            'progress': round(progress, 4) if progress is not None else None,
+            'done': round(row['done'], 2),
+            'total': round(row['total'], 2) if row['total'] is not None else None,
+            'unit': row['unit'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def counts(self):
+        """Number of jobs per status."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        counts = {status: 0 for status in (STATUS_QUEUED, STATUS_RUNNING) + FINISHED_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def claim(self, worker, lease_seconds):
+        """Start the next runnable job; returns the job as a dict or None.
+
+        Runnable means queued and past its retry delay, or running under an
+        expired lease. An expired job that already used all its attempts is
+        marked failed instead.
+        """
+        conn = self._connect()
+        try:
+            while True:
+                now = time.time()
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute(
+                    'SELECT * FROM jobs WHERE (status = ? AND run_after <= ?) '
+                    'OR (status = ? AND lease_expires < ?) ORDER BY created_at LIMIT 1',
+                    (STATUS_QUEUED, now, STATUS_RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                if row['status'] == STATUS_RUNNING and row['attempts'] >= row['max_attempts']:
+                    conn.execute(
+                        'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?',
+                        (STATUS_FAILED, 'Worker stopped responding', now, row['id'])
+                    )
+                    conn.execute('COMMIT')
+                    continue
+                if row['status'] == STATUS_RUNNING:
+                    logger.warning(f"Job {row['id']} lease expired; resuming")
+                conn.execute(
+                    'UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, '
+                    'lease_expires = ?, updated_at = ? WHERE id = ?',
+                    (STATUS_RUNNING, worker, now + lease_seconds, now, row['id'])
+                )
+                conn.execute('COMMIT')
+                return {
+                    'id': row['id'],
+                    'kind': row['kind'],
+                    'params': json.loads(row['params']),
+                    'attempt': row['attempts'] + 1,
+                    'checkpoint': json.loads(row['checkpoint'] or '{}'),
+                }
+        finally:
+            conn.close()
+
+    def _update_running(self, job_id, attempt, assignments, values):
+        """Update a job only if `attempt` is still the one running it."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f'UPDATE jobs SET {assignments}, updated_at = ? '
+                'WHERE id = ? AND status = ? AND attempts = ?',
+                tuple(values) + (time.time(), job_id, STATUS_RUNNING, attempt)
+            )
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def renew(self, job_id, attempt, lease_seconds):
+        """Extend the lease; False if the attempt no longer owns the job."""
+        return self._update_running(
+            job_id, attempt, 'lease_expires = ?', (time.time() + lease_seconds,)
+        )
+
+    def checkpoint(self, job_id, attempt, done, total, unit, checkpoint):
+        """Save progress and resume state; raises JobLost if superseded."""
+        if not self._update_running(
+                job_id, attempt, 'done = ?, total = ?, unit = ?, checkpoint = ?',
+                (done, total, unit, json.dumps(checkpoint))):
+            raise JobLost(job_id)
+
+    def complete(self, job_id, attempt):
+        if not self._update_running(
+                job_id, attempt, 'status = ?, error = NULL, lease_expires = NULL',
+                (STATUS_SUCCEEDED,)):
+            raise JobLost(job_id)
+
+    def fail(self, job_id, attempt, error, retry=True):
+        """Record a failed attempt; requeues with backoff while attempts remain.
+
+        Returns True if the job will be retried.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? '
+                'AND attempts = ?', (job_id, STATUS_RUNNING, attempt)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return False
+            now = time.time()
+            retry = retry and row['attempts'] < row['max_attempts']
+            if retry:
+                delay = RETRY_BACKOFF_SECONDS * 2 ** (row['attempts'] - 1)
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, run_after = ?, lease_expires = NULL, '
+                    'updated_at = ? WHERE id = ?',
+                    (STATUS_QUEUED, error, now + delay, now, job_id)
+                )
+            else:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, lease_expires = NULL, '
+                    'updated_at = ? WHERE id = ?',
+                    (STATUS_FAILED, error, now, job_id)
+                )
+            conn.execute('COMMIT')
+            return retry
+        finally:
+            conn.close()
+
+    def release(self, job_id, attempt):
+        """Put a job back in the queue without counting the attempt (shutdown)."""
+        return self._update_running(
+            job_id, attempt, 'status = ?, attempts = attempts - 1, lease_expires = NULL, run_after = ?',
+            (STATUS_QUEUED, time.time())
+        )
+
+    def prune(self, max_age_seconds):
+        """Delete finished jobs (and their files) older than max_age_seconds."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                FINISHED_STATUSES + (time.time() - max_age_seconds,)
+            ).fetchall()
+            for (job_id,) in rows:
+                conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+                self.discard(job_id)
+        finally:
+            conn.close()
+        return len(rows)
+
+
+class JobRun:
+    """One attempt at a job, as seen by the code doing the work.
+
+    The handler reads `params`, `input_path` and its own resume `state`,
+    writes the result to open_output() and calls progress() after each unit
+    of work. Output goes to a file per attempt, so a stale attempt can never
+    write into a newer one's result; a resumed attempt starts from a copy of
+    the previous output up to its last checkpoint.
+    """
+
+    def __init__(self, store, job):
+        self.store = store
+        self.id = job['id']
+        self.kind = job['kind']
+        self.params = job['params']
+        self.attempt = job['attempt']
+        self.input_path = store.input_path(self.id)
+        self.state = job['checkpoint'].get('state', {})
+        self._previous = job['checkpoint']
+        # Unique per claim: a released attempt's number is handed out again
+        self._output_name = f'result.{self.attempt}.{uuid.uuid4().hex[:8]}.part'
+        self.output = None
+
+    def open_output(self):
+        """Binary file for the result, positioned after checkpointed output."""
+        directory = self.store.job_dir(self.id)
+        self.output = open(os.path.join(directory, self._output_name), 'wb')
+        previous = self._previous.get('output')
+        remaining = self._previous.get('output_bytes', 0)
+        if previous and remaining:
+            with open(os.path.join(directory, previous), 'rb') as source:
+                while remaining:
+                    block = source.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    self.output.write(block)
+                    remaining -= len(block)
+        return self.output
+
+    def progress(self, done, total, unit, state):
+        """Checkpoint: `done` of `total` units, resume from `state`."""
+        self.output.flush()
+        self.store.checkpoint(self.id, self.attempt, done, total, unit, {
+            'state': state,
+            'output': self._output_name,
+            'output_bytes': self.output.tell(),
+        })
+
+    def finish(self):
+        """Publish the output as the job's result and mark the job done."""
+        directory = self.store.job_dir(self.id)
+        self.output.close()
+        os.replace(os.path.join(directory, self._output_name), self.store.result_path(self.id))
+        self.store.complete(self.id, self.attempt)
+        for name in os.listdir(directory):
+            if name.endswith('.part'):
+                os.remove(os.path.join(directory, name))
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
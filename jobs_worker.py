@@ -0,0 +1,273 @@
+"""Worker tier for /jobs: runs queued bulk jobs outside the web workers.
+
+    python jobs_worker.py [--workers 2]
+
+A supervisor process claims jobs from the job store (jobs.py) and runs
+each in its own child process, at most --workers at a time. A job that
+crashes its process (or is killed for using too much memory) takes only
+that process down; the supervisor records the failed attempt and the job
+is retried from its last checkpoint. While a job runs the supervisor
+renews its lease; if the whole tier dies, the leases expire and the next
+supervisor resumes the jobs. On SIGTERM running jobs are stopped and put
+back in the queue.
+
+gunicorn.conf.py starts this tier next to the web workers unless
+JOBS_EMBEDDED_WORKER=0, in which case run it as its own process on the same
+host (it shares the job store on the /tmp disk).
+
+Job kinds:
+- translate: a text file, translated chunk by chunk (see long_text.py)
+- transcribe: an audio file in any format ffmpeg reads, recognized in
+  JOB_SEGMENT_SECONDS segments
+"""
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+from jobs import JobFailed, JobLost, JobRun
+
+logger = logging.getLogger('jobs_worker')
+
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 2))
+# A job whose supervisor has not renewed it for this long is resumed elsewhere
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 120))
+JOB_RETENTION_SECONDS = float(os.environ.get('JOB_RETENTION_HOURS', 24)) * 3600
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1.0))
+# Bulk work yields the CPU to the web workers
+JOBS_NICE = int(os.environ.get('JOBS_NICE', 10))
+
+# Chunks translated in parallel per translation job
+JOB_TRANSLATE_CONCURRENCY = int(os.environ.get('JOB_TRANSLATE_CONCURRENCY', 2))
+# Speech recognition accepts about a minute of audio per request
+JOB_SEGMENT_SECONDS = float(os.environ.get('JOB_SEGMENT_SECONDS', 50))
+JOB_MAX_AUDIO_SECONDS = float(os.environ.get('JOB_MAX_AUDIO_SECONDS', 4 * 3600))
+
+DURATION_RE = re.compile(rb'Duration: (\d+):(\d\d):(\d\d(?:\.\d+)?)')
+
+
+def run_translation(run):
+    """Translate the input text, checkpointing after every chunk."""
+    import app as web
+    from long_text import iter_chunks, iter_text_blocks, translate_ordered
+
+    from_lang = run.params['from_lang']
+    to_lang = run.params['to_lang']
+    total = os.path.getsize(run.input_path)
+    skip = run.state.get('chunks', 0)
+    consumed = run.state.get('input_bytes', 0)
+    output = run.open_output()
+
+    with open(run.input_path, 'rb') as source:
+        blocks = iter_text_blocks(source)
+        if from_lang == 'auto':
+            # Chunking is deterministic, so a resumed attempt identifies the
+            # same language from the same first block
+            first_block = next(blocks, '')
+            from_lang = web.resolve_source_language(from_lang, first_block)
+            blocks = itertools.chain([first_block], blocks)
+
+        sizes = {}
+
+        def remaining_chunks():
+            for index, chunk in enumerate(itertools.islice(iter_chunks(blocks), skip, None)):
+                sizes[index] = len(chunk.encode('utf-8'))
+                yield chunk
+
+        for index, translated in translate_ordered(
+                remaining_chunks(),
+                lambda chunk: web.translate_document_chunk(chunk, from_lang, to_lang),
+                concurrency=JOB_TRANSLATE_CONCURRENCY):
+            output.write(translated.encode('utf-8'))
+            consumed += sizes.pop(index)
+            run.progress(consumed, total, 'bytes', {'chunks': skip + index + 1, 'input_bytes': consumed})
+
+
+def probe_duration(ffmpeg_path, path):
+    """Duration of a media file in seconds, or None if ffmpeg cannot tell."""
+    result = subprocess.run(
+        [ffmpeg_path, '-hide_banner', '-nostdin', '-i', path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=60
+    )
+    match = DURATION_RE.search(result.stderr)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def run_transcription(run):
+    """Transcribe the input audio segment by segment, one line per segment."""
+    import app as web
+    from audio_ingest import DECODED_SAMPLE_RATE, DECODED_SAMPLE_WIDTH, DecodedAudio
+
+    ffmpeg_path = web.get_ffmpeg_path()
+    language = run.params['language']
+    total = probe_duration(ffmpeg_path, run.input_path)
+    if total is not None and total > JOB_MAX_AUDIO_SECONDS:
+        raise JobFailed(f'Audio is too long (max {JOB_MAX_AUDIO_SECONDS:g} seconds)')
+    position = run.state.get('seconds', 0.0)
+    output = run.open_output()
+
+    bytes_per_second = DECODED_SAMPLE_RATE * DECODED_SAMPLE_WIDTH
+    segment_bytes = int(JOB_SEGMENT_SECONDS * bytes_per_second)
+    # Resume by seeking the decoder to the first unprocessed segment
+    command = [
+        ffmpeg_path, '-hide_banner', '-nostdin', '-loglevel', 'error',
+        '-ss', f'{position:.3f}', '-i', run.input_path,
+        '-vn', '-ac', '1', '-ar', str(DECODED_SAMPLE_RATE), '-f', 's16le', 'pipe:1'
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    decoded_any = False
+    try:
+        while True:
+            pcm = process.stdout.read(segment_bytes)
+            if not pcm:
+                break
+            decoded_any = True
+            audio = DecodedAudio(pcm, DECODED_SAMPLE_RATE, DECODED_SAMPLE_WIDTH, None, None, len(pcm))
+            text, _ = web.transcribe_audio(audio, [language])
+            if text:
+                output.write((text + '\n').encode('utf-8'))
+            position += audio.duration
+            if position > JOB_MAX_AUDIO_SECONDS:
+                raise JobFailed(f'Audio is too long (max {JOB_MAX_AUDIO_SECONDS:g} seconds)')
+            run.progress(position, total, 'seconds', {'seconds': position})
+    finally:
+        process.kill()
+        process.wait()
+    if not decoded_any and position == 0:
+        raise JobFailed('Could not decode the audio file')
+
+
+HANDLERS = {
+    'translate': run_translation,
+    'transcribe': run_transcription,
+}
+
+
+def run_job(job):
+    """Child process entry point: run one attempt and record its outcome."""
+    import app as web
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    run = JobRun(web.job_store, job)
+    start_time = time.time()
+    try:
+        HANDLERS[run.kind](run)
+        run.finish()
+        logger.info(f"Job {run.id} ({run.kind}) finished in {time.time() - start_time:.1f}s")
+    except JobLost:
+        logger.warning(f"Job {run.id} attempt {run.attempt} was superseded; stopping")
+    except JobFailed as e:
+        logger.warning(f"Job {run.id} failed: {e}")
+        web.job_store.fail(run.id, run.attempt, str(e), retry=False)
+    except Exception as e:
+        logger.error(f"Job {run.id} attempt {run.attempt} failed: {e}", exc_info=True)
+        web.job_store.fail(run.id, run.attempt, f'{type(e).__name__}: {e}')
+    finally:
+        run.close()
+
+
+class Supervisor:
+    """Claims jobs and runs each in a child process, `workers` at a time."""
+
+    def __init__(self, store, workers=JOBS_WORKERS, lease_seconds=JOB_LEASE_SECONDS,
+                 poll_interval=JOB_POLL_SECONDS, retention_seconds=JOB_RETENTION_SECONDS):
+        self.store = store
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.running = {}  # job id -> (process, attempt)
+        self.stopping = threading.Event()
+
+    def _reap(self):
+        for job_id, (process, attempt) in list(self.running.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self.running[job_id]
+            if process.exitcode != 0:
+                # The child died before recording an outcome
+                retry = self.store.fail(
+                    job_id, attempt, f'Worker process exited with code {process.exitcode}'
+                )
+                logger.error(
+                    f"Job {job_id} worker process exited with code {process.exitcode}"
+                    f"{'; will retry' if retry else ''}"
+                )
+
+    def _start_jobs(self):
+        while len(self.running) < self.workers and not self.stopping.is_set():
+            job = self.store.claim(self.name, self.lease_seconds)
+            if job is None:
+                return
+            process = multiprocessing.Process(
+                target=run_job, args=(job,), name=f"job-{job['id'][:8]}"
+            )
+            process.start()
+            self.running[job['id']] = (process, job['attempt'])
+            logger.info(f"Started job {job['id']} ({job['kind']}, attempt {job['attempt']})")
+
+    def run(self):
+        logger.info(f"Job worker tier {self.name} started with {self.workers} workers")
+        last_renewal = last_prune = 0.0
+        while not self.stopping.is_set():
+            self._reap()
+            now = time.monotonic()
+            if now - last_renewal >= self.lease_seconds / 4:
+                last_renewal = now
+                for job_id, (_, attempt) in self.running.items():
+                    self.store.renew(job_id, attempt, self.lease_seconds)
+            if now - last_prune >= 3600:
+                last_prune = now
+                pruned = self.store.prune(self.retention_seconds)
+                if pruned:
+                    logger.info(f"Removed {pruned} finished jobs")
+            self._start_jobs()
+            self.stopping.wait(self.poll_interval)
+        self._shutdown()
+
+    def _shutdown(self):
+        """Stop running jobs and requeue them; they resume from their checkpoints."""
+        for process, _ in self.running.values():
+            process.terminate()
+        for job_id, (process, attempt) in self.running.items():
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            self.store.release(job_id, attempt)
+        logger.info(f"Job worker tier {self.name} stopped; requeued {len(self.running)} jobs")
+        self.running.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued /jobs work')
+    parser.add_argument('--workers', type=int, default=JOBS_WORKERS)
+    args = parser.parse_args()
+
+    import app as web
+
+    if JOBS_NICE:
+        os.nice(JOBS_NICE)
+    # Children are forked from here, so load the libraries once up front
+    web.warm_up()
+    supervisor = Supervisor(web.job_store, workers=args.workers)
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: supervisor.stopping.set())
+    supervisor.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""Local language identification for the supported languages.
+
+Most supported languages have a script of their own (Bengali, Tamil,
+Hangul, ...), so counting letters per Unicode block settles them outright.
+Latin, Cyrillic and Devanagari text is scored with small character n-gram
+models built from the samples below, one per supported language plus one
+per unsupported neighbour sharing the script (Portuguese, Ukrainian,
+Marathi, ...). Text is left to upstream detection (None) when it is too
+short, when a neighbour fits best, when it uses letters outside the winning
+language's alphabet, or when too few of its trigrams occur in the winning
+model at all.
+
+Only the first MAX_SAMPLE_CHARS characters are examined; a call takes tens
+of microseconds, against a network round trip for upstream detection.
+"""
+import bisect
+import math
+import re
+from functools import lru_cache
+
+MAX_SAMPLE_CHARS = 200
+NGRAM_SIZES = (1, 2, 3)
+# Fewer letters than this in a modelled script are left to upstream detection
+MIN_LETTERS = 12
+# Share of the text's trigrams the winning model must have seen
+MIN_TRIGRAM_COVERAGE = 0.4
+# Add-alpha smoothing over the vocabulary of all samples, so models built from
+# samples of different lengths give unseen n-grams comparable penalties
+SMOOTHING = 0.5
+
+# (first code point, last code point, script)
+SCRIPT_RANGES = sorted([
+    (0x0041, 0x005A, 'latin'),
+    (0x0061, 0x007A, 'latin'),
+    (0x00C0, 0x00D6, 'latin'),
+    (0x00D8, 0x00F6, 'latin'),
+    (0x00F8, 0x024F, 'latin'),
+    (0x0400, 0x04FF, 'cyrillic'),
+    (0x0900, 0x097F, 'devanagari'),
+    (0x0980, 0x09FF, 'bengali'),
+    (0x0A00, 0x0A7F, 'gurmukhi'),
+    (0x0A80, 0x0AFF, 'gujarati'),
+    (0x0B80, 0x0BFF, 'tamil'),
+    (0x0C00, 0x0C7F, 'telugu'),
+    (0x0C80, 0x0CFF, 'kannada'),
+    (0x1100, 0x11FF, 'hangul'),
+    (0x3040, 0x30FF, 'kana'),
+    (0x3130, 0x318F, 'hangul'),
+    (0x3400, 0x4DBF, 'han'),
+    (0x4E00, 0x9FFF, 'han'),
+    (0xAC00, 0xD7AF, 'hangul'),
+    (0xFF66, 0xFF9F, 'kana'),
+])
+_RANGE_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+
+SCRIPT_LANGUAGES = {
+    'cyrillic': 'ru',
+    'devanagari': 'hi',
+    'bengali': 'bn',
+    'gurmukhi': 'pa',
+    'gujarati': 'gu',
+    'tamil': 'ta',
+    'telugu': 'te',
+    'kannada': 'kn',
+    'hangul': 'ko',
+    'kana': 'ja',
+    'han': 'zh-CN',
+}
+
+# Training text for the n-gram models: the same everyday sentences in each
+# language, rich in function words and typical letter sequences.
+LANGUAGE_SAMPLES = {
+    'en': (
+        "Hello, how are you today? I would like to know where the station is. "
+        "Thank you very much for your help. The weather is nice and the sun is shining. "
+        "We are going to the market this afternoon with our friends. Can you tell me "
+        "what time it is? My name is John and I live in a small town near the river. "
+        "Please speak more slowly, I do not understand everything. The children have "
+        "already eaten their breakfast and they are playing in the garden. What would "
+        "you like to drink? This is the best restaurant in the city, everyone says so. "
+        "I think that we should leave early tomorrow morning because the road will be "
+        "busy. Where did you buy that beautiful shirt? They have been working here for "
+        "three years and they still enjoy it. Could you please send me the documents "
+        "before Friday? It was nice to meet you, see you soon."
+    ),
+    'es': (
+        "Hola, ¿cómo estás hoy? Me gustaría saber dónde está la estación. Muchas "
+        "gracias por tu ayuda. El tiempo es agradable y el sol está brillando. Vamos "
+        "al mercado esta tarde con nuestros amigos. ¿Puedes decirme qué hora es? Me "
+        "llamo Juan y vivo en un pueblo pequeño cerca del río. Por favor, habla más "
+        "despacio, no entiendo todo. Los niños ya han desayunado y están jugando en el "
+        "jardín. ¿Qué te gustaría beber? Este es el mejor restaurante de la ciudad, "
+        "todo el mundo lo dice. Creo que deberíamos salir temprano mañana por la mañana "
+        "porque la carretera estará llena. ¿Dónde compraste esa camisa tan bonita? "
+        "Ellos trabajan aquí desde hace tres años y todavía les gusta. ¿Podrías "
+        "enviarme los documentos antes del viernes? Mucho gusto, hasta pronto."
+    ),
+    'de': (
+        "Hallo, wie geht es dir heute? Ich möchte wissen, wo der Bahnhof ist. Vielen "
+        "Dank für deine Hilfe. Das Wetter ist schön und die Sonne scheint. Wir gehen "
+        "heute Nachmittag mit unseren Freunden auf den Markt. Kannst du mir sagen, wie "
+        "spät es ist? Ich heiße Johann und wohne in einer kleinen Stadt in der Nähe "
+        "des Flusses. Bitte sprich langsamer, ich verstehe nicht alles. Die Kinder "
+        "haben schon gefrühstückt und spielen im Garten. Was möchtest du trinken? Das "
+        "ist das beste Restaurant der Stadt, das sagen alle. Ich glaube, dass wir "
+        "morgen früh losfahren sollten, weil die Straße voll sein wird. Wo hast du "
+        "dieses schöne Hemd gekauft? Sie arbeiten seit drei Jahren hier und es gefällt "
+        "ihnen immer noch. Könnten Sie mir bitte die Unterlagen vor Freitag schicken? "
+        "Schön, Sie kennenzulernen, bis bald."
+    ),
+    'fr': (
+        "Bonjour, comment allez-vous aujourd'hui ? Je voudrais savoir où se trouve la "
+        "gare. Merci beaucoup pour votre aide. Il fait beau et le soleil brille. Nous "
+        "allons au marché cet après-midi avec nos amis. Pouvez-vous me dire quelle "
+        "heure il est ? Je m'appelle Jean et j'habite dans une petite ville près de la "
+        "rivière. Parlez plus lentement, s'il vous plaît, je ne comprends pas tout. "
+        "Les enfants ont déjà pris leur petit déjeuner et ils jouent dans le jardin. "
+        "Qu'est-ce que vous voulez boire ? C'est le meilleur restaurant de la ville, "
+        "tout le monde le dit. Je pense que nous devrions partir tôt demain matin parce "
+        "que la route sera chargée. Où avez-vous acheté cette belle chemise ? Ils "
+        "travaillent ici depuis trois ans et ils aiment toujours ça. Pourriez-vous "
+        "m'envoyer les documents avant vendredi ? Enchanté, à bientôt."
+    ),
+    'ru': (
+        "Здравствуйте, как у вас дела сегодня? Я хотел бы узнать, где находится вокзал. "
+        "Большое спасибо за вашу помощь. Погода хорошая, и светит солнце. Сегодня днём "
+        "мы идём на рынок с нашими друзьями. Вы можете сказать мне, который час? Меня "
+        "зовут Иван, и я живу в маленьком городе недалеко от реки. Пожалуйста, говорите "
+        "медленнее, я не всё понимаю. Дети уже позавтракали и играют в саду. Что вы "
+        "хотите выпить? Это лучший ресторан в городе, все так говорят. Я думаю, что нам "
+        "нужно выехать завтра рано утром, потому что дорога будет загружена. Где вы "
+        "купили эту красивую рубашку? Они работают здесь уже три года, и им всё ещё "
+        "нравится. Не могли бы вы прислать мне документы до пятницы? Приятно "
+        "познакомиться, до скорой встречи."
+    ),
+    'hi': (
+        "नमस्ते, आज आप कैसे हैं? मैं जानना चाहता हूँ कि स्टेशन कहाँ है। आपकी मदद के लिए "
+        "बहुत धन्यवाद। मौसम अच्छा है और धूप निकली है। हम आज दोपहर अपने दोस्तों के साथ "
+        "बाज़ार जा रहे हैं। क्या आप मुझे बता सकते हैं कि कितने बजे हैं? मेरा नाम जॉन है "
+        "और मैं नदी के पास एक छोटे से शहर में रहता हूँ। कृपया धीरे बोलिए, मुझे सब कुछ "
+        "समझ में नहीं आता। बच्चों ने नाश्ता कर लिया है और वे बगीचे में खेल रहे हैं। आप "
+        "क्या पीना चाहेंगे? यह शहर का सबसे अच्छा रेस्टोरेंट है, सब लोग यही कहते हैं। "
+        "मुझे लगता है कि हमें कल सुबह जल्दी निकलना चाहिए क्योंकि सड़क पर भीड़ होगी। आपने "
+        "वह सुंदर कमीज़ कहाँ से खरीदी? वे तीन साल से यहाँ काम कर रहे हैं और उन्हें अब भी "
+        "अच्छा लगता है। क्या आप शुक्रवार से पहले मुझे दस्तावेज़ भेज सकते हैं? आपसे मिलकर "
+        "खुशी हुई, फिर मिलेंगे।"
+    ),
+}
+
+# Neighbours: unsupported languages that share a script with a supported
+# one. When one of them fits best the text is left to upstream detection
+# instead of being forced onto the nearest supported language.
+NEIGHBOUR_SAMPLES = {
+    'pt': (
+        "Olá, como você está hoje? Eu gostaria de saber onde fica a estação. O tempo "
+        "está bom e o sol está brilhando. Vamos ao mercado esta tarde com os nossos "
+        "amigos. Você pode me dizer que horas são? As crianças já tomaram o café da "
+        "manhã e estão brincando no jardim. Onde você comprou essa camisa tão bonita? "
+        "Muito prazer, até logo. Muito obrigado pela sua ajuda. Por favor, fale mais "
+        "devagar, eu não entendo tudo. Este é o melhor restaurante da cidade."
+    ),
+    'it': (
+        "Ciao, come stai oggi? Vorrei sapere dove si trova la stazione. Il tempo è bello "
+        "e il sole splende. Andiamo al mercato questo pomeriggio con i nostri amici. "
+        "Puoi dirmi che ore sono? I bambini hanno già fatto colazione e stanno giocando "
+        "in giardino. Dove hai comprato quella bella camicia? Piacere di conoscerti, a "
+        "presto. Grazie mille per il tuo aiuto. Per favore, parla più lentamente, non "
+        "capisco tutto. Questo è il miglior ristorante della città."
+    ),
+    'nl': (
+        "Hallo, hoe gaat het vandaag met je? Ik wil graag weten waar het station is. Het "
+        "weer is mooi en de zon schijnt. We gaan vanmiddag met onze vrienden naar de "
+        "markt. Kun je me vertellen hoe laat het is? De kinderen hebben al ontbeten en "
+        "spelen in de tuin. Waar heb je dat mooie overhemd gekocht? Leuk je te "
+        "ontmoeten, tot ziens. Heel erg bedankt voor je hulp. Praat alsjeblieft wat "
+        "langzamer, ik begrijp niet alles. Dit is het beste restaurant van de stad."
+    ),
+    'sv': (
+        "Hej, hur mår du idag? Jag skulle vilja veta var stationen ligger. Vädret är "
+        "fint och solen skiner. Vi går till marknaden i eftermiddag med våra vänner. Kan "
+        "du säga mig vad klockan är? Barnen har redan ätit frukost och leker i "
+        "trädgården. Var köpte du den där fina skjortan? Trevligt att träffas, vi ses "
+        "snart. Tack så mycket för din hjälp. Snälla prata lite långsammare, jag förstår "
+        "inte allt. Det här är den bästa restaurangen i staden."
+    ),
+    'tr': (
+        "Merhaba, bugün nasılsın? İstasyonun nerede olduğunu öğrenmek istiyorum. Hava "
+        "güzel ve güneş parlıyor. Bu öğleden sonra arkadaşlarımızla pazara gidiyoruz. "
+        "Bana saatin kaç olduğunu söyleyebilir misin? Çocuklar kahvaltılarını yaptılar "
+        "ve bahçede oynuyorlar. O güzel gömleği nereden aldın? Tanıştığımıza memnun "
+        "oldum, görüşmek üzere. Yardımın için çok teşekkür ederim. Lütfen daha yavaş "
+        "konuş, her şeyi anlamıyorum. Burası şehrin en iyi restoranı."
+    ),
+    'pl': (
+        "Cześć, jak się masz dzisiaj? Chciałbym wiedzieć, gdzie jest dworzec. Pogoda "
+        "jest ładna i świeci słońce. Dziś po południu idziemy na targ z naszymi "
+        "przyjaciółmi. Czy możesz mi powiedzieć, która jest godzina? Dzieci już zjadły "
+        "śniadanie i bawią się w ogrodzie. Gdzie kupiłeś tę piękną koszulę? Miło cię "
+        "poznać, do zobaczenia. Bardzo dziękuję za twoją pomoc. Proszę, mów wolniej, nie "
+        "wszystko rozumiem. To najlepsza restauracja w mieście."
+    ),
+    'ro': (
+        "Bună, ce mai faci astăzi? Aș vrea să știu unde este gara. Vremea este frumoasă "
+        "și soarele strălucește. Mergem la piață în această după-amiază cu prietenii "
+        "noștri. Poți să-mi spui cât este ceasul? Copiii au luat deja micul dejun și se "
+        "joacă în grădină. De unde ai cumpărat cămașa aceea frumoasă? Încântat de "
+        "cunoștință, pe curând. Mulțumesc foarte mult pentru ajutor. Te rog, vorbește "
+        "mai rar, nu înțeleg tot. Acesta este cel mai bun restaurant din oraș."
+    ),
+    'uk': (
+        "Привіт, як у тебе справи сьогодні? Я хотів би дізнатися, де знаходиться вокзал. "
+        "Погода гарна і світить сонце. Сьогодні вдень ми йдемо на ринок з нашими "
+        "друзями. Ти можеш сказати мені, котра година? Діти вже поснідали і граються в "
+        "саду. Де ти купив цю гарну сорочку? Приємно познайомитися, до зустрічі. Щиро "
+        "дякую за твою допомогу. Будь ласка, говори повільніше, я не все розумію. Це "
+        "найкращий ресторан у місті."
+    ),
+    'bg': (
+        "Здравей, как си днес? Бих искал да знам къде е гарата. Времето е хубаво и "
+        "слънцето грее. Днес следобед отиваме на пазара с нашите приятели. Можеш ли да "
+        "ми кажеш колко е часът? Децата вече закусиха и играят в градината. Къде купи "
+        "тази хубава риза? Приятно ми е да се запознаем, до скоро. Много благодаря за "
+        "помощта ти. Моля те, говори по-бавно, не разбирам всичко. Това е най-добрият "
+        "ресторант в града."
+    ),
+    'sr': (
+        "Здраво, како си данас? Желео бих да знам где је железничка станица. Време је "
+        "лепо и сунце сија. Данас поподне идемо на пијацу са нашим пријатељима. Можеш ли "
+        "да ми кажеш колико је сати? Деца су већ доручковала и играју се у башти. Где си "
+        "купио ту лепу кошуљу? Драго ми је што смо се упознали, видимо се ускоро. Хвала "
+        "ти пуно на помоћи. Молим те, говори спорије, не разумем све. Ово је најбољи "
+        "ресторан у граду."
+    ),
+    'mr': (
+        "नमस्कार, आज तुम्ही कसे आहात? मला स्टेशन कुठे आहे ते जाणून घ्यायचे आहे. हवामान "
+        "छान आहे आणि ऊन पडले आहे. आज दुपारी आम्ही आमच्या मित्रांसोबत बाजारात जात आहोत. "
+        "तुम्ही मला किती वाजले ते सांगू शकता का? मुलांनी नाश्ता केला आहे आणि ती बागेत "
+        "खेळत आहेत. तुम्ही तो सुंदर शर्ट कुठून विकत घेतला? तुम्हाला भेटून आनंद झाला, "
+        "पुन्हा भेटू. तुमच्या मदतीबद्दल खूप आभार. कृपया हळू बोला, मला सगळे समजत नाही. हे "
+        "शहरातील सर्वात चांगले उपाहारगृह आहे."
+    ),
+    'ne': (
+        "नमस्ते, आज तपाईंलाई कस्तो छ? म स्टेसन कहाँ छ भनेर जान्न चाहन्छु। मौसम राम्रो छ "
+        "र घाम लागेको छ। आज दिउँसो हामी हाम्रा साथीहरूसँग बजार जाँदैछौं। तपाईं मलाई कति "
+        "बज्यो भनेर भन्न सक्नुहुन्छ? बच्चाहरूले खाजा खाइसकेका छन् र बगैंचामा खेलिरहेका "
+        "छन्। तपाईंले त्यो राम्रो कमिज कहाँबाट किन्नुभयो? तपाईंलाई भेटेर खुसी लाग्यो, "
+        "फेरि भेटौंला। तपाईंको सहयोगको लागि धेरै धन्यवाद। कृपया बिस्तारै बोल्नुहोस्, "
+        "मैले सबै बुझिनँ। यो सहरको सबैभन्दा राम्रो रेस्टुरेन्ट हो।"
+    ),
+}
+
+# Letters a supported language writes with; anything else (Portuguese ã,
+# Turkish ı, Ukrainian і, ...) rules it out
+_BASIC_LATIN = 'abcdefghijklmnopqrstuvwxyz'
+ALPHABETS = {
+    'en': _BASIC_LATIN,
+    'es': _BASIC_LATIN + 'áéíóúüñ',
+    'de': _BASIC_LATIN + 'äöüß',
+    'fr': _BASIC_LATIN + 'àâæçéèêëîïôœùûüÿ',
+    'ru': 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+}
+
+# Letters plus combining marks, so Devanagari vowel signs and viramas stay
+# inside their words
+WORD_RE = re.compile(r"(?:[^\W\d_]|[\u0300-\u036F\u0900-\u0903\u093A-\u094F\u0962\u0963])+")
+
+
+def script_of(char):
+    """Unicode script bucket of a letter, or None for other characters."""
+    code_point = ord(char)
+    index = bisect.bisect_right(_RANGE_STARTS, code_point) - 1
+    if index >= 0:
+        start, end, script = SCRIPT_RANGES[index]
+        if code_point <= end:
+            return script
+    return None
+
+
+def _ngrams(text):
+    for word in WORD_RE.findall(text.lower()):
+        padded = f' {word} '
+        for size in NGRAM_SIZES:
+            for i in range(len(padded) - size + 1):
+                gram = padded[i:i + size]
+                if gram != ' ':
+                    yield gram
+
+
+def _script_counts(text):
+    counts = {}
+    for char in text:
+        if char.isalpha():
+            script = script_of(char)
+            if script is not None:
+                counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+@lru_cache(maxsize=1)
+def _models():
+    """{script: [(lang, supported, log-probability table, unseen log-probability)]}."""
+    samples = [(lang, True, sample) for lang, sample in LANGUAGE_SAMPLES.items()]
+    samples += [(lang, False, sample) for lang, sample in NEIGHBOUR_SAMPLES.items()]
+    all_counts = []
+    vocabulary = set()
+    for lang, supported, sample in samples:
+        counts = {}
+        for gram in _ngrams(sample):
+            counts[gram] = counts.get(gram, 0) + 1
+        vocabulary.update(counts)
+        all_counts.append(counts)
+
+    models = {}
+    for (lang, supported, sample), counts in zip(samples, all_counts):
+        denominator = sum(counts.values()) + SMOOTHING * len(vocabulary)
+        table = {gram: math.log((count + SMOOTHING) / denominator) for gram, count in counts.items()}
+        script_counts = _script_counts(sample)
+        script = max(script_counts, key=script_counts.get)
+        models.setdefault(script, []).append(
+            (lang, supported, table, math.log(SMOOTHING / denominator))
+        )
+    return models
+
+
+def _identify_by_model(text, script, candidates):
+    models = [
+        model for model in _models()[script]
+        if not model[1] or candidates is None or model[0] in candidates
+    ]
+    grams = list(_ngrams(text))
+    if not grams or not any(supported for _, supported, _, _ in models):
+        return None, 0.0
+    scores = [sum(table.get(gram, unseen) for gram in grams) for _, _, table, unseen in models]
+    best = max(range(len(models)), key=scores.__getitem__)
+    lang, supported, table, _ = models[best]
+    if not supported:
+        return None, 0.0
+
+    alphabet = ALPHABETS.get(lang)
+    if alphabet is not None and any(
+        char not in alphabet for char in text.lower() if char.isalpha() and script_of(char) == script
+    ):
+        return None, 0.0
+    trigrams = [gram for gram in grams if len(gram) == 3]
+    if trigrams and sum(gram in table for gram in trigrams) / len(trigrams) < MIN_TRIGRAM_COVERAGE:
+        return None, 0.0
+
+    # Relative likelihood of the best model among all models for the script
+    confidence = 1.0 / sum(math.exp(score - scores[best]) for score in scores)
+    return lang, confidence
+
+
+def identify_language(text, candidates=None):
+    """Return (language code, confidence 0..1) for text, or (None, 0.0).
+
+    candidates limits the answer to a set of language codes (by default all
+    supported ones).
+    """
+    sample = text[:MAX_SAMPLE_CHARS]
+    counts = _script_counts(sample)
+    if not counts:
+        return None, 0.0
+
+    letters = sum(counts.values())
+    # Japanese mixes kana with Han characters; kana alone decides it
+    if counts.get('kana'):
+        counts['kana'] += counts.pop('han', 0)
+    script = max(counts, key=counts.get)
+    share = counts[script] / letters
+
+    if script in _models():
+        if counts[script] < MIN_LETTERS:
+            return None, 0.0
+        lang, confidence = _identify_by_model(sample, script, candidates)
+        return lang, confidence * share
+    lang = SCRIPT_LANGUAGES.get(script)
+    if lang is None or (candidates is not None and lang not in candidates):
+        return None, 0.0
+    return lang, share
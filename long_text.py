@@ -0,0 +1,116 @@
+"""Chunked translation of documents longer than the backend's limit.
+
+The input is read incrementally, cut at paragraph or sentence boundaries
+into chunks that fit the translator's request limit, and translated
+concurrently. Results are yielded in input order as soon as each prefix is
+complete. At most `concurrency * 2` chunks are in flight, so memory stays
+bounded regardless of input size.
+"""
+import codecs
+import contextvars
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Upstream limit is 5000 characters; keep headroom for batching separators
+MAX_CHUNK_CHARS = 4500
+READ_BLOCK_SIZE = 64 * 1024
+
+SENTENCE_END_RE = re.compile(r'[.!?।॥。！？][\'"”’)\]]*\s+')
+
+
+def iter_text_blocks(stream, encoding='utf-8', block_size=READ_BLOCK_SIZE):
+    """Yield decoded text blocks from a binary or text file-like object."""
+    decoder = None
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        if isinstance(block, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            block = decoder.decode(block)
+        if block:
+            yield block
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+def _split_point(buffer, max_chars):
+    """Find where to cut buffer so the first piece is at most max_chars."""
+    window = buffer[:max_chars]
+    paragraph = window.rfind('\n\n')
+    if paragraph > 0:
+        return paragraph + 2
+    last_sentence = None
+    for match in SENTENCE_END_RE.finditer(window):
+        last_sentence = match.end()
+    if last_sentence:
+        return last_sentence
+    line = window.rfind('\n')
+    if line > 0:
+        return line + 1
+    space = window.rfind(' ')
+    if space > 0:
+        return space + 1
+    return max_chars
+
+
+def iter_chunks(blocks, max_chars=MAX_CHUNK_CHARS):
+    """Group text blocks into chunks of at most max_chars characters.
+
+    Chunks are cut at paragraph breaks, then sentence ends, then line
+    breaks or spaces, and only mid-word as a last resort. Concatenating the
+    chunks gives back the input exactly.
+    """
+    buffer = ''
+    for block in blocks:
+        buffer += block
+        while len(buffer) > max_chars:
+            cut = _split_point(buffer, max_chars)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer:
+        yield buffer
+
+
+def translate_chunk(chunk, translate_fn):
+    """Translate a chunk, keeping its leading and trailing whitespace."""
+    core = chunk.strip()
+    if not core:
+        return chunk
+    start = len(chunk) - len(chunk.lstrip())
+    end = start + len(core)
+    return chunk[:start] + translate_fn(core) + chunk[end:]
+
+
+def map_ordered(items, fn, concurrency=4, thread_name_prefix='long-text'):
+    """Apply fn to items concurrently and yield (index, result) in order.
+
+    Reading ahead stops once `concurrency * 2` items are pending, which
+    bounds memory. If the consumer stops early (e.g. the client
+    disconnected), queued items are cancelled.
+    """
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=thread_name_prefix)
+    pending = deque()
+    try:
+        for index, item in enumerate(items):
+            # Run in a copy of the caller's context so request tracing follows
+            context = contextvars.copy_context()
+            pending.append((index, pool.submit(context.run, fn, item)))
+            # Emit every finished prefix; block only when the window is full
+            while pending and (pending[0][1].done() or len(pending) >= concurrency * 2):
+                head_index, future = pending.popleft()
+                yield head_index, future.result()
+        while pending:
+            head_index, future = pending.popleft()
+            yield head_index, future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def translate_ordered(chunks, translate_fn, concurrency=4):
+    """Translate chunks concurrently and yield (index, translation) in order."""
+    return map_ordered(chunks, lambda chunk: translate_chunk(chunk, translate_fn), concurrency)
@@ -1,12 +1,11 @@
 import customtkinter as ctk
-import speech_recognition as sr
-from gtts import gTTS
-from deep_translator import GoogleTranslator
 import threading
 import os
-from playsound import playsound
 import queue
-import pyttsx3
+
+# speech_recognition, gtts, deep_translator, pyttsx3 and playsound are
+# imported where they are first used so the window appears without waiting
+# on them.
 
 # Define language codes here
 LANGUAGE_CODES = {
@@ -88,15 +87,23 @@ class TranslatorApp:
         self.current_speed = 150
         self.current_volume = 1.0
         
-        # Initialize text-to-speech engine
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', self.current_speed)
-        self.engine.setProperty('volume', self.current_volume)
+        # Text-to-speech engine is created on first access (see `engine`)
+        self._engine = None
         
         # Create main container
         self.create_layout()
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    @property
+    def engine(self):
+        """Initialize the pyttsx3 engine on first use."""
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            self._engine.setProperty('rate', self.current_speed)
+            self._engine.setProperty('volume', self.current_volume)
+        return self._engine
+
     def create_layout(self):
         # Header section
         self.header = ctk.CTkFrame(self.window, fg_color="transparent")
@@ -318,6 +325,8 @@ class TranslatorApp:
         if not self.is_voice_mode:
             # Text input mode
             try:
+                from deep_translator import GoogleTranslator
+
                 input_text = self.input_text.get("0.0", "end").strip()
                 if not input_text or input_text == "Type your text here...":
                     self.update_status("Please enter text to translate", True)
@@ -358,6 +367,9 @@ class TranslatorApp:
         self.update_status("Ready")
 
     def translation_loop(self):
+        import speech_recognition as sr
+        from deep_translator import GoogleTranslator
+
         r = sr.Recognizer()
         
         while self.is_running:
@@ -500,6 +512,8 @@ class TranslatorApp:
     def speak_text(self, text, lang_code):
         try:
             if lang_code == 'en':  # Use pyttsx3 for English
+                import pyttsx3
+
                 # Ensure current settings are applied
                 if self.current_voice:
                     self.engine.setProperty('voice', self.current_voice)
@@ -519,6 +533,9 @@ class TranslatorApp:
                 temp_engine.stop()
                 
             else:  # Use gTTS for other languages
+                from gtts import gTTS
+                from playsound import playsound
+
                 voice = gTTS(text, lang=lang_code)
                 voice.save('temp.mp3')
                 playsound('temp.mp3')
@@ -793,6 +810,8 @@ class SettingsPopup:
                 voice = self.voice_map[voice_name]
                 self.app.current_voice = voice.id
                 
+                import pyttsx3
+
                 # Create temporary engine for testing
                 temp_engine = pyttsx3.init()
                 temp_engine.setProperty('voice', voice.id)
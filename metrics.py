@@ -0,0 +1,37 @@
+"""Per-worker counters exposed by the /metrics endpoint.
+
+Counters live in the worker process; with several gunicorn workers each
+/metrics response describes the worker that served it (see "pid").
+"""
+import os
+import threading
+import time
+
+
+class Metrics:
+    """Thread-safe named counters."""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(sorted(self._counters.items()))
+        return {
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'counters': counters
+        }
+
+
+metrics = Metrics()
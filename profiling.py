@@ -0,0 +1,209 @@
+"""Opt-in sampling profiler for live workers.
+
+Selected requests (a random PROFILE_SAMPLE_RATE fraction, or any request
+sent with an `X-Profile` header carrying the debug token) are sampled by a
+background thread every `interval` seconds while they run:
+
+- wall samples record the request thread's stack on every tick, whether it
+  is computing or waiting on I/O;
+- CPU samples are weighted by the CPU time the thread actually used since
+  the previous tick (Linux/Unix per-thread CPU clocks).
+
+Stacks are aggregated in memory as collapsed stacks ("a;b;c count"), the
+input format of flamegraph.pl, speedscope and similar tools. When nothing
+is being profiled the sampler thread exits, so the idle cost is zero.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+TRUNCATED_STACK = '[truncated]'
+
+
+class _ProfiledThread:
+    __slots__ = ('name', 'clock_id', 'last_cpu', 'cpu_credit')
+
+    def __init__(self, name, clock_id):
+        self.name = name
+        self.clock_id = clock_id
+        self.last_cpu = time.clock_gettime(clock_id) if clock_id is not None else None
+        self.cpu_credit = 0.0
+
+    def cpu_delta(self):
+        if self.clock_id is None:
+            return None
+        try:
+            now = time.clock_gettime(self.clock_id)
+        except OSError:
+            return None
+        delta = now - self.last_cpu
+        self.last_cpu = now
+        return delta
+
+
+def _thread_cpu_clock():
+    """CPU-time clock of the calling thread, or None where unsupported."""
+    try:
+        clock_id = time.pthread_getcpuclockid(threading.get_ident())
+        time.clock_gettime(clock_id)
+        return clock_id
+    except (AttributeError, OSError):
+        return None
+
+
+class SamplingProfiler:
+    """Collects wall and CPU stack samples from selected request threads."""
+
+    def __init__(self, interval=0.005, sample_rate=0.0, max_stacks=20000):
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.max_stacks = max_stacks
+        self.profiled_requests = 0
+        self._active = {}
+        self._stacks = {'wall': {}, 'cpu': {}}
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started_at = time.time()
+
+    def should_profile(self, requested=False):
+        """Decide whether to profile a request (explicitly requested or sampled)."""
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def start(self, name):
+        """Start sampling the calling thread; returns a token for stop()."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = _ProfiledThread(name, _thread_cpu_clock())
+            self.profiled_requests += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        return thread_id
+
+    def stop(self, token):
+        with self._lock:
+            self._active.pop(token, None)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+            self._labels[code] = label
+        return label
+
+    def _stack_key(self, frame):
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ';'.join(labels)
+
+    def _add(self, kind, stack, count):
+        stacks = self._stacks[kind]
+        if stack not in stacks and len(stacks) >= self.max_stacks:
+            stack = TRUNCATED_STACK
+        stacks[stack] = stacks.get(stack, 0) + count
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active.items())
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, state in active:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = self._stack_key(frame)
+                cpu_samples = 0
+                delta = state.cpu_delta()
+                if delta is not None:
+                    # Whole sampling intervals of CPU used since the last tick
+                    state.cpu_credit += delta / self.interval
+                    cpu_samples = int(state.cpu_credit)
+                    state.cpu_credit -= cpu_samples
+                samples.append((stack, cpu_samples))
+            del frames
+            with self._lock:
+                for stack, cpu_samples in samples:
+                    self._add('wall', stack, 1)
+                    if cpu_samples:
+                        self._add('cpu', stack, cpu_samples)
+            time.sleep(self.interval)
+
+    def collapsed(self, kind='wall'):
+        """Aggregated samples in collapsed-stack format, heaviest first."""
+        with self._lock:
+            stacks = sorted(self._stacks[kind].items(), key=lambda item: -item[1])
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def hotspots(self, kind='wall', limit=30):
+        """Functions by self samples (leaf) and total samples (anywhere on stack)."""
+        with self._lock:
+            stacks = list(self._stacks[kind].items())
+        total_samples = sum(count for _, count in stacks)
+        own = {}
+        inclusive = {}
+        for stack, count in stacks:
+            frames = stack.split(';')
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for label in set(frames):
+                inclusive[label] = inclusive.get(label, 0) + count
+        top = sorted(inclusive, key=lambda label: (-own.get(label, 0), -inclusive[label]))[:limit]
+        return {
+            'samples': total_samples,
+            'functions': [
+                {
+                    'function': label,
+                    'self': own.get(label, 0),
+                    'total': inclusive[label],
+                    'self_percent': round(100.0 * own.get(label, 0) / total_samples, 1) if total_samples else 0.0
+                }
+                for label in top
+            ]
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'profiled_requests': self.profiled_requests,
+                'active': len(self._active),
+                'sample_rate': self.sample_rate,
+                'interval_ms': round(self.interval * 1000, 2),
+                'distinct_stacks': {kind: len(stacks) for kind, stacks in self._stacks.items()},
+                'since': self._started_at
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stacks = {'wall': {}, 'cpu': {}}
+            self.profiled_requests = 0
+            self._started_at = time.time()
+
+    def dump(self, directory):
+        """Write wall and CPU collapsed stacks for this process; returns the paths."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for kind in ('wall', 'cpu'):
+            data = self.collapsed(kind)
+            if not data:
+                continue
+            path = os.path.join(directory, f'profile-{os.getpid()}-{kind}.folded')
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            paths.append(path)
+        return paths
@@ -0,0 +1,72 @@
+"""Recognize one recording in several candidate languages at once.
+
+Each candidate language is sent to the recognizer concurrently (with
+show_all=True so the response carries a confidence score). As soon as a
+result reaches the confidence threshold the race stops: attempts that have
+not started are cancelled and the ones already in flight are abandoned
+(their HTTP requests finish in the background and are ignored). If no
+attempt is confident enough, the most confident transcript wins once all
+have answered or the deadline passes.
+"""
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+def best_alternative(result):
+    """(transcript, confidence) from a recognize_google(show_all=True) result.
+
+    Google lists the most likely alternative first and only that one carries
+    a confidence; a missing confidence counts as 0.
+    """
+    if not isinstance(result, dict):
+        return None, 0.0
+    alternatives = result.get('alternative') or []
+    if not alternatives:
+        return None, 0.0
+    best = alternatives[0]
+    return best.get('transcript'), float(best.get('confidence', 0.0))
+
+
+def race_recognition(executor, recognize_fn, languages, min_confidence=0.8, timeout=30.0):
+    """Run recognize_fn(language) for each language on executor.
+
+    recognize_fn returns a show_all result (or None when nothing was
+    understood). Returns (language, transcript, confidence, abandoned) for
+    the winning attempt, where abandoned is the number of attempts stopped
+    early; language is None if no attempt produced a transcript. If every
+    attempt raised, the first error is re-raised.
+    """
+    futures = {}
+    for language in languages:
+        # Each attempt runs in a copy of the caller's context (request tracing)
+        context = contextvars.copy_context()
+        futures[executor.submit(context.run, recognize_fn, language)] = language
+
+    deadline = time.monotonic() + timeout
+    pending = set(futures)
+    best = (None, None, 0.0)
+    errors = []
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    transcript, confidence = best_alternative(future.result())
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if transcript and (best[0] is None or confidence > best[2]):
+                    best = (futures[future], transcript, confidence)
+            if best[0] is not None and best[2] >= min_confidence:
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+
+    if best[0] is None and errors and len(errors) == len(futures):
+        raise errors[0]
+    return best[0], best[1], best[2], len(pending)
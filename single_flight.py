@@ -0,0 +1,155 @@
+"""Collapse concurrent calls for the same key into one.
+
+The first caller for a key (the leader) runs the work; callers arriving
+while it runs wait for and share its result, or its exception. Used for
+clients that retry an upload while the original is still being processed.
+
+SingleFlight works within one process. SharedFlight adds a lease row in a
+shared cache (see cache_backends) so that callers in other gunicorn
+workers wait for the leader too.
+"""
+import json
+import threading
+import time
+import uuid
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-key deduplication of in-progress work (within one process)."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None, on_wait=None):
+        """Run fn() once per key at a time; returns (result, shared).
+
+        shared is True when the result came from another caller's run.
+        Waiting callers re-raise the leader's exception; TimeoutError is
+        raised if the leader takes longer than timeout. on_wait, if given,
+        is called before a caller starts waiting for another caller's run.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            if on_wait is not None:
+                on_wait()
+            if not flight.done.wait(timeout):
+                raise TimeoutError('Timed out waiting for an identical request')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+class SharedFlight:
+    """Per-key deduplication across processes that share a cache.
+
+    Callers in this process are merged by a SingleFlight first. Its leader
+    then claims a lease row in the cache with compare_and_set; callers in
+    other processes find the lease, poll the row and share the result the
+    leader writes into it. Results must be JSON-serializable (tuples come
+    back as lists). A lease not finished within lease_seconds is treated as
+    abandoned (its worker died) and can be claimed by a new caller.
+    """
+
+    def __init__(self, cache, lease_seconds=120, poll_interval=0.25):
+        self.cache = cache
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._local = SingleFlight()
+
+    def do(self, key, fn, timeout=None, on_wait=None):
+        """Run fn() once per key across processes; returns (result, shared).
+
+        Same contract as SingleFlight.do, except that a caller waiting on
+        another process gets TimeoutError, not the leader's exception, if
+        that leader fails or disappears (the caller's own work has already
+        been stopped by on_wait, so it cannot take over).
+        """
+        (result, shared_elsewhere), shared = self._local.do(
+            key, lambda: self._lead_or_wait(key, fn, timeout, on_wait),
+            timeout=timeout, on_wait=on_wait
+        )
+        return result, shared or shared_elsewhere
+
+    def in_flight(self):
+        return self._local.in_flight()
+
+    def _lead_or_wait(self, key, fn, timeout, on_wait):
+        lease_key = f'lease:{key}'
+        deadline = None if timeout is None else time.monotonic() + timeout
+        watched = None
+        while True:
+            raw = self.cache.get(lease_key)
+            lease = json.loads(raw) if raw else None
+            if lease is not None and lease['owner'] == watched:
+                if lease['state'] == 'done':
+                    return lease['result'], True
+                if lease['state'] == 'failed':
+                    raise TimeoutError('The identical request being waited on failed')
+            running = (
+                lease is not None and lease['state'] == 'running' and lease['expires'] > time.time()
+            )
+            if running:
+                if watched is None and on_wait is not None:
+                    on_wait()
+                watched = lease['owner']
+            elif watched is not None:
+                raise TimeoutError('The identical request being waited on was abandoned')
+            else:
+                claim = json.dumps({
+                    'owner': uuid.uuid4().hex,
+                    'state': 'running',
+                    'expires': time.time() + self.lease_seconds
+                })
+                if self.cache.compare_and_set(lease_key, raw, claim):
+                    return self._lead(lease_key, claim, fn), False
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError('Timed out waiting for an identical request')
+            time.sleep(self.poll_interval)
+
+    def _lead(self, lease_key, claim, fn):
+        owner = json.loads(claim)['owner']
+        try:
+            result = fn()
+        except BaseException:
+            self.cache.compare_and_set(
+                lease_key, claim, json.dumps({'owner': owner, 'state': 'failed'})
+            )
+            raise
+        self.cache.compare_and_set(
+            lease_key, claim, json.dumps({'owner': owner, 'state': 'done', 'result': result})
+        )
+        return result
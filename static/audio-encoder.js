@@ -0,0 +1,124 @@
+// Web Worker: turns decoded recording channels into a 16 kHz mono 16-bit
+// PCM WAV, the format /speech-to-text passes straight to recognition
+// without any server-side conversion.
+//
+// Message in:  {id, channels: [Float32Array, ...], sampleRate}
+// Message out: {id, wav: ArrayBuffer, seconds} or {id, error}
+//
+// Resampling uses the same windowed-sinc low-pass as audio_resample.py
+// (Blackman window, 16 taps per output step, cutoff at 0.9 x the output
+// Nyquist frequency), read from a precomputed table.
+
+const TARGET_RATE = 16000;
+const TAPS_PER_STEP = 16;
+const TABLE_RESOLUTION = 64;  // kernel samples per input sample
+
+function downmix(channels) {
+    if (channels.length === 1) {
+        return channels[0];
+    }
+    const mono = new Float32Array(channels[0].length);
+    for (const channel of channels) {
+        for (let i = 0; i < mono.length; i++) {
+            mono[i] += channel[i];
+        }
+    }
+    const scale = 1 / channels.length;
+    for (let i = 0; i < mono.length; i++) {
+        mono[i] *= scale;
+    }
+    return mono;
+}
+
+// Low-pass kernel sampled every 1/TABLE_RESOLUTION input samples over
+// [-half, half]
+function kernelTable(step) {
+    const half = Math.ceil(TAPS_PER_STEP * step / 2);
+    const cutoff = 0.9 / step;
+    const size = 2 * half * TABLE_RESOLUTION + 1;
+    const table = new Float32Array(size);
+    for (let k = 0; k < size; k++) {
+        const x = k / TABLE_RESOLUTION - half;
+        const t = k / (size - 1);
+        const window = 0.42 - 0.5 * Math.cos(2 * Math.PI * t) + 0.08 * Math.cos(4 * Math.PI * t);
+        const arg = Math.PI * cutoff * x;
+        const sinc = arg === 0 ? 1 : Math.sin(arg) / arg;
+        table[k] = cutoff * sinc * window;
+    }
+    return { table, half };
+}
+
+function resample(input, inRate) {
+    const step = inRate / TARGET_RATE;
+    if (step === 1) {
+        return input;
+    }
+    const length = Math.round(input.length / step);
+    const output = new Float32Array(length);
+    if (step < 1) {
+        // Upsampling: linear interpolation is enough for speech recognition
+        for (let i = 0; i < length; i++) {
+            const position = i * step;
+            const index = Math.floor(position);
+            const next = Math.min(index + 1, input.length - 1);
+            output[i] = input[index] + (input[next] - input[index]) * (position - index);
+        }
+        return output;
+    }
+    const { table, half } = kernelTable(step);
+    for (let i = 0; i < length; i++) {
+        const center = i * step;
+        const first = Math.max(0, Math.ceil(center - half));
+        const last = Math.min(input.length - 1, Math.floor(center + half));
+        let sum = 0;
+        let weights = 0;
+        // Consecutive input samples are TABLE_RESOLUTION table entries apart
+        let k = Math.round((first - center + half) * TABLE_RESOLUTION);
+        for (let j = first; j <= last; j++, k += TABLE_RESOLUTION) {
+            const weight = table[k];
+            sum += input[j] * weight;
+            weights += weight;
+        }
+        output[i] = weights ? sum / weights : 0;
+    }
+    return output;
+}
+
+function encodeWav(samples) {
+    const buffer = new ArrayBuffer(44 + samples.length * 2);
+    const view = new DataView(buffer);
+    const writeString = (offset, text) => {
+        for (let i = 0; i < text.length; i++) {
+            view.setUint8(offset + i, text.charCodeAt(i));
+        }
+    };
+    writeString(0, 'RIFF');
+    view.setUint32(4, 36 + samples.length * 2, true);
+    writeString(8, 'WAVE');
+    writeString(12, 'fmt ');
+    view.setUint32(16, 16, true);
+    view.setUint16(20, 1, true);                 // PCM
+    view.setUint16(22, 1, true);                 // mono
+    view.setUint32(24, TARGET_RATE, true);
+    view.setUint32(28, TARGET_RATE * 2, true);   // byte rate
+    view.setUint16(32, 2, true);                 // block align
+    view.setUint16(34, 16, true);                // bits per sample
+    writeString(36, 'data');
+    view.setUint32(40, samples.length * 2, true);
+    for (let i = 0; i < samples.length; i++) {
+        const sample = Math.max(-1, Math.min(1, samples[i]));
+        view.setInt16(44 + i * 2, Math.round(sample * 32767), true);
+    }
+    return buffer;
+}
+
+self.onmessage = (event) => {
+    const { id, channels, sampleRate } = event.data;
+    try {
+        const samples = resample(downmix(channels), sampleRate);
+        const wav = encodeWav(samples);
+        self.postMessage({ id, wav, seconds: samples.length / TARGET_RATE }, [wav]);
+    } catch (error) {
+        self.postMessage({ id, error: error.message || String(error) });
+    }
+};
@@ -0,0 +1,188 @@
+"""Streaming SRT/WebVTT parsing, cue batching and output formatting.
+
+Subtitle files are read block by block (see long_text.iter_text_blocks)
+and parsed into cues as they arrive; nothing holds more than the current
+batch. Cues keep their identifier and timing; their text is joined into a
+single line for translation (so each cue is one line of a batched upstream
+request) and wrapped back into the original number of lines afterwards.
+
+WebVTT header, NOTE, STYLE and REGION blocks, and anything else that is not
+a cue, are passed through unchanged to WebVTT output (SRT has no place for
+them and drops them).
+"""
+import re
+
+TIMESTAMP = r'(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})'
+TIMING_RE = re.compile(rf'^\s*{TIMESTAMP}\s*-->\s*{TIMESTAMP}(.*)$')
+# Inline markup: HTML-style tags (<i>, <v Speaker>) and ASS overrides ({\an8})
+MARKUP_RE = re.compile(r'<[^>]*>|\{\\[^}]*\}')
+
+# A batch is one upstream request: stay well under the 5000-character limit
+MAX_BATCH_CHARS = 2000
+MAX_BATCH_CUES = 40
+
+FORMATS = ('srt', 'vtt')
+MIMETYPES = {'srt': 'application/x-subrip', 'vtt': 'text/vtt'}
+
+
+def _seconds(hours, minutes, seconds, millis):
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+class Cue:
+    """One subtitle cue: identifier (may be None), timing and text lines."""
+
+    def __init__(self, identifier, start, end, settings, lines):
+        self.identifier = identifier
+        self.start = start
+        self.end = end
+        self.settings = settings
+        self.lines = lines
+
+    @property
+    def text(self):
+        """The cue's text on a single line."""
+        return ' '.join(line.strip() for line in self.lines if line.strip())
+
+
+class Passthrough:
+    """A block that is not a cue (WebVTT header, NOTE, STYLE ...)."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+
+def iter_raw_blocks(text_blocks):
+    """Yield blank-line separated blocks as lists of lines."""
+    buffer = ''
+    current = []
+    for block in text_blocks:
+        buffer += block
+        lines = buffer.split('\n')
+        buffer = lines.pop()
+        for line in lines:
+            line = line.rstrip('\r')
+            if line.strip():
+                current.append(line)
+            elif current:
+                yield current
+                current = []
+    if buffer.strip():
+        current.append(buffer.rstrip('\r'))
+    if current:
+        yield current
+
+
+def parse_block(lines):
+    """A Cue, or Passthrough if the block has no timing line."""
+    for position, line in enumerate(lines):
+        match = TIMING_RE.match(line)
+        if match:
+            groups = match.groups()
+            identifier = ' '.join(lines[:position]).strip() or None
+            return Cue(
+                identifier, _seconds(*groups[0:4]), _seconds(*groups[4:8]),
+                groups[8].strip(), lines[position + 1:]
+            )
+    return Passthrough('\n'.join(lines))
+
+
+def read_subtitles(text_blocks):
+    """Parse a subtitle stream; returns (format, iterator of Cue/Passthrough).
+
+    The format ('srt' or 'vtt') is taken from the WEBVTT signature.
+    """
+    blocks = iter_raw_blocks(text_blocks)
+    first = next(blocks, None)
+    if first is None:
+        return 'srt', iter(())
+    first[0] = first[0].lstrip('\ufeff')
+    subtitle_format = 'vtt' if first[0].startswith('WEBVTT') else 'srt'
+
+    def items():
+        yield Passthrough('\n'.join(first)) if subtitle_format == 'vtt' else parse_block(first)
+        for lines in blocks:
+            yield parse_block(lines)
+
+    return subtitle_format, items()
+
+
+def batch_cues(items, max_chars=MAX_BATCH_CHARS, max_cues=MAX_BATCH_CUES):
+    """Group items into lists holding at most max_cues cues / max_chars of text.
+
+    Passthrough blocks stay in place inside the batches.
+    """
+    batch = []
+    cues = 0
+    characters = 0
+    for item in items:
+        if isinstance(item, Cue):
+            size = len(item.text) + 1
+            if cues and (cues >= max_cues or characters + size > max_chars):
+                yield batch
+                batch, cues, characters = [], 0, 0
+            cues += 1
+            characters += size
+        batch.append(item)
+    if batch:
+        yield batch
+
+
+def format_timestamp(seconds, subtitle_format):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    separator = ',' if subtitle_format == 'srt' else '.'
+    return f'{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}'
+
+
+def wrap_lines(text, count):
+    """Split text into `count` lines of similar length at spaces."""
+    words = text.split()
+    if count <= 1 or len(words) < 2:
+        return [text]
+    count = min(count, len(words))
+    target = len(text) / count
+    lines = []
+    current = []
+    for position, word in enumerate(words):
+        current.append(word)
+        remaining_words = len(words) - position - 1
+        remaining_lines = count - len(lines) - 1
+        if (remaining_lines and remaining_words >= remaining_lines
+                and len(' '.join(current)) >= target):
+            lines.append(' '.join(current))
+            current = []
+    lines.append(' '.join(current))
+    return lines
+
+
+def format_item(item, subtitle_format, number, text=None):
+    """Serialize a Passthrough, or a Cue with translated `text`, as one block.
+
+    SRT cues are numbered with `number`; WebVTT keeps cue identifiers.
+    """
+    if isinstance(item, Passthrough):
+        if subtitle_format == 'srt':
+            return ''
+        return item.raw + '\n\n'
+    if text is None:
+        lines = item.lines
+    else:
+        # An empty cue stays empty: a blank line would end the block early
+        lines = wrap_lines(text, len(item.lines)) if text.strip() else []
+    timing = (
+        f'{format_timestamp(item.start, subtitle_format)} --> '
+        f'{format_timestamp(item.end, subtitle_format)}'
+    )
+    if subtitle_format == 'vtt' and item.settings:
+        timing += ' ' + item.settings
+    header = str(number) if subtitle_format == 'srt' else item.identifier
+    block = '\n'.join(([header] if header else []) + [timing] + lines)
+    return block + '\n\n'
+
+
+def speech_text(text):
+    """Cue text without inline markup, for TTS."""
+    return ' '.join(MARKUP_RE.sub('', text).split())
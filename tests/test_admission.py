@@ -0,0 +1,217 @@
+"""Tests for rate limiting, the admission queue and streamed-response slots.
+
+Run with: python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+STATE_DIR = tempfile.mkdtemp(prefix='linguasync_test_')
+os.environ.update(
+    CACHE_BACKEND='memory',
+    CACHE_SNAPSHOT_DIR=os.path.join(STATE_DIR, 'snapshots'),
+    TRAFFIC_STATS_PATH=os.path.join(STATE_DIR, 'stats.sqlite3'),
+    JOBS_DIR=os.path.join(STATE_DIR, 'jobs'),
+    RATE_LIMIT_PER_MINUTE='0',
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import deep_translator  # noqa: E402
+
+from admission import (  # noqa: E402
+    PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, AdmissionController, Overloaded,
+    RateLimiter
+)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not reached')
+        time.sleep(0.005)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_burst_then_retry_after(self):
+        limiter = RateLimiter(rate=1.0, burst=3)
+        self.assertEqual([limiter.allow('a')[0] for _ in range(4)], [True, True, True, False])
+        self.assertEqual(limiter.allow('a'), (False, 1))
+
+    def test_cost(self):
+        limiter = RateLimiter(rate=0.5, burst=10)
+        self.assertEqual(limiter.allow('a', cost=8), (True, 0))
+        self.assertEqual(limiter.allow('a', cost=8), (False, 12))
+        self.assertTrue(limiter.allow('a', cost=2)[0])
+
+    def test_refill(self):
+        limiter = RateLimiter(rate=1.0, burst=2)
+        with mock.patch('admission.time.monotonic', return_value=100.0):
+            limiter.allow('a', cost=2)
+            self.assertFalse(limiter.allow('a')[0])
+        with mock.patch('admission.time.monotonic', return_value=101.5):
+            self.assertTrue(limiter.allow('a')[0])
+            self.assertFalse(limiter.allow('a')[0])
+
+    def test_clients_are_separate(self):
+        limiter = RateLimiter(rate=1.0, burst=1)
+        self.assertTrue(limiter.allow('a')[0])
+        self.assertTrue(limiter.allow('b')[0])
+        self.assertFalse(limiter.allow('a')[0])
+
+    def test_disabled(self):
+        limiter = RateLimiter(rate=0, burst=1)
+        self.assertTrue(all(limiter.allow('a')[0] for _ in range(10)))
+
+    def test_client_table_is_bounded(self):
+        limiter = RateLimiter(rate=1.0, burst=1, max_clients=2)
+        for client in 'abc':
+            limiter.allow(client)
+        self.assertEqual(list(limiter._buckets), ['b', 'c'])
+        # 'a' was forgotten and starts with a full bucket again
+        self.assertTrue(limiter.allow('a')[0])
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def start_waiter(self, controller, priority, name, admitted, errors):
+        def run():
+            try:
+                controller.acquire(priority)
+                admitted.append(name)
+            except Overloaded as e:
+                errors.append((name, e.reason))
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def test_admits_up_to_max_concurrent(self):
+        controller = AdmissionController(max_concurrent=2, max_queue=0, max_wait=1)
+        self.assertEqual(controller.acquire(), 0.0)
+        self.assertEqual(controller.acquire(), 0.0)
+        with self.assertRaises(Overloaded) as caught:
+            controller.acquire()
+        self.assertEqual(caught.exception.reason, 'queue full')
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+        controller.release()
+        self.assertEqual(controller.acquire(), 0.0)
+        stats = controller.stats()
+        self.assertEqual((stats['active'], stats['admitted'], stats['rejected_queue_full']), (2, 3, 1))
+
+    def test_queue_runs_highest_priority_first(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=10, max_wait=5)
+        controller.acquire()
+        admitted, errors = [], []
+        order = [
+            (PRIORITY_BULK, 'bulk 1'), (PRIORITY_NORMAL, 'normal'),
+            (PRIORITY_BULK, 'bulk 2'), (PRIORITY_INTERACTIVE, 'interactive'),
+        ]
+        for queued, (priority, name) in enumerate(order, 1):
+            self.start_waiter(controller, priority, name, admitted, errors)
+            wait_until(lambda: controller.stats()['queue_length'] == queued)
+        self.assertEqual(controller.stats()['queue_by_priority'], {'interactive': 1, 'normal': 1, 'bulk': 2})
+        for count in range(1, len(order) + 1):
+            controller.release()
+            wait_until(lambda: len(admitted) == count)
+        self.assertEqual(admitted, ['interactive', 'normal', 'bulk 1', 'bulk 2'])
+        self.assertEqual(errors, [])
+        controller.release()
+        self.assertEqual(controller.stats()['active'], 0)
+
+    def test_queue_limit(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=2, max_wait=5)
+        controller.acquire()
+        admitted, errors = [], []
+        for name in ('first', 'second'):
+            self.start_waiter(controller, PRIORITY_NORMAL, name, admitted, errors)
+        wait_until(lambda: controller.stats()['queue_length'] == 2)
+        with self.assertRaises(Overloaded) as caught:
+            controller.acquire(PRIORITY_INTERACTIVE)
+        self.assertEqual(caught.exception.reason, 'queue full')
+        for count in (1, 2):
+            controller.release()
+            wait_until(lambda: len(admitted) == count)
+
+    def test_wait_timeout_and_cancelled_waiters_are_skipped(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=5, max_wait=0.1)
+        controller.acquire()
+        with self.assertRaises(Overloaded) as caught:
+            controller.acquire()
+        self.assertEqual(caught.exception.reason, 'queue wait timeout')
+        self.assertEqual(controller.stats()['queue_length'], 0)
+
+        # The timed-out entry is still in the heap; release must skip it
+        controller.max_wait = 5
+        admitted, errors = [], []
+        self.start_waiter(controller, PRIORITY_BULK, 'later', admitted, errors)
+        wait_until(lambda: controller.stats()['queue_length'] == 1)
+        controller.release()
+        wait_until(lambda: admitted == ['later'])
+        controller.release()
+        stats = controller.stats()
+        self.assertEqual((stats['active'], stats['rejected_timeout'], stats['admitted']), (0, 1, 2))
+
+
+class StandInTranslator:
+    def __init__(self, source='auto', target='en', **kwargs):
+        pass
+
+    def translate(self, text=None, **kwargs):
+        return text.upper()
+
+
+class StreamedSlotTest(unittest.TestCase):
+    """Streamed responses hold their admission slot until the body is done."""
+
+    @classmethod
+    def setUpClass(cls):
+        import app
+        cls.app = app
+
+    def setUp(self):
+        patcher = mock.patch.object(deep_translator, 'GoogleTranslator', StandInTranslator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = self.app.app.test_client()
+
+    def post_long(self, text, **kwargs):
+        return self.client.post('/translate/long', json={
+            'text': text, 'from_lang': 'English', 'to_lang': 'Hindi'
+        }, **kwargs)
+
+    def active(self):
+        return self.app.admission.stats()['active']
+
+    def test_slot_is_released_when_the_body_is_read(self):
+        max_concurrent = self.app.admission.max_concurrent
+        for i in range(2 * max_concurrent):
+            # Read without closing, as a client that never calls close()
+            response = self.post_long(f'Paragraph number {i}.')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(json.loads(response.get_data().splitlines()[-1])['done'])
+            self.assertEqual(self.active(), 0)
+
+    def test_slot_is_held_while_streaming(self):
+        response = self.post_long('First paragraph.\n\nSecond paragraph.', buffered=False)
+        body = iter(response.response)
+        next(body)
+        self.assertEqual(self.active(), 1)
+        for _ in body:
+            pass
+        self.assertEqual(self.active(), 0)
+        response.close()
+        self.assertEqual(self.active(), 0)
+
+    def test_slot_is_released_when_closed_early(self):
+        response = self.post_long('A paragraph that is never read.', buffered=False)
+        self.assertEqual(self.active(), 1)
+        response.close()
+        self.assertEqual(self.active(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
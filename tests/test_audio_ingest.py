@@ -0,0 +1,266 @@
+"""Tests for streaming upload ingestion: sniffing, WAV headers, decoder choice.
+
+The ffmpeg route runs a small stand-in script instead of ffmpeg: it
+answers any input with 0.1 s of silence, and fails on input starting with
+"GARBAGE" the way ffmpeg does on undecodable data.
+
+Run with: python -m unittest discover tests
+"""
+import glob
+import hashlib
+import io
+import os
+import stat
+import struct
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_ingest  # noqa: E402
+from audio_ingest import (  # noqa: E402
+    AudioIngest, UploadRejected, parse_wav_header, read_multipart, sniff_container
+)
+
+FFMPEG_STANDIN = '''#!{python}
+import sys
+args = sys.argv[1:]
+source = args[args.index('-i') + 1]
+data = sys.stdin.buffer.read() if source == 'pipe:0' else open(source, 'rb').read()
+if data.startswith(b'GARBAGE'):
+    sys.stderr.write('pipe:0: Invalid data found when processing input\\n')
+    sys.exit(1)
+sys.stdout.buffer.write(b'\\0' * 3200)
+'''
+
+
+def make_wav(pcm, rate=16000, channels=1, bits=16, audio_format=1, data_size=None,
+             chunks_before_data=b'', extensible=False):
+    block_align = channels * bits // 8
+    if extensible:
+        fmt_body = struct.pack(
+            '<HHIIHHHHIH14s', 0xFFFE, channels, rate, rate * block_align, block_align, bits,
+            22, bits, 0, audio_format, b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+        )
+    else:
+        fmt_body = struct.pack('<HHIIHH', audio_format, channels, rate, rate * block_align, block_align, bits)
+    body = (
+        b'WAVE'
+        + b'fmt ' + struct.pack('<I', len(fmt_body)) + fmt_body
+        + chunks_before_data
+        + b'data' + struct.pack('<I', len(pcm) if data_size is None else data_size) + pcm
+    )
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def feed_in_blocks(ingest, data, block_size=5):
+    for start in range(0, len(data), block_size):
+        ingest.feed(data[start:start + block_size])
+
+
+class SniffTest(unittest.TestCase):
+    def test_magic_numbers(self):
+        cases = {
+            b'RIFF\x24\x00\x00\x00WAVEfmt ': 'wav',
+            b'OggS\x00\x02\x00\x00\x00\x00\x00\x00': 'ogg',
+            b'\x1aE\xdf\xa3\x9fB\x86\x81\x01B\xf7\x81': 'webm',
+            b'fLaC\x00\x00\x00"\x10\x00\x10\x00': 'flac',
+            b'\x00\x00\x00\x20ftypM4A ': 'mp4',
+            b'FORM\x00\x00\x00\x00AIFF': 'aiff',
+            b'ID3\x04\x00\x00\x00\x00\x00\x00\x00\x00': 'mp3',
+            b'\xff\xfb\x90\x64\x00\x00\x00\x00\x00\x00\x00\x00': 'mp3',
+        }
+        for head, container in cases.items():
+            self.assertEqual(sniff_container(head), container, head)
+
+    def test_unknown_and_short_input(self):
+        for head in (b'', b'\xff', b'GARBAGE DATA', b'RIFF\x00\x00\x00\x00AVI '):
+            self.assertIsNone(sniff_container(head), head)
+
+
+class ParseWavHeaderTest(unittest.TestCase):
+    def test_plain_header(self):
+        data = make_wav(b'\x01\x00' * 10, rate=44100, channels=2)
+        fmt, data_offset, data_size = parse_wav_header(data)
+        self.assertEqual(fmt, {'format': 1, 'channels': 2, 'sample_rate': 44100, 'block_align': 4, 'bits': 16})
+        self.assertEqual((data_offset, data_size), (44, 20))
+
+    def test_chunks_before_data_with_odd_size(self):
+        data = make_wav(b'\x00\x00' * 4, chunks_before_data=b'LIST\x03\x00\x00\x00abc\x00')
+        _, data_offset, data_size = parse_wav_header(data)
+        self.assertEqual(data[data_offset:data_offset + data_size], b'\x00\x00' * 4)
+
+    def test_extensible_format(self):
+        fmt, _, _ = parse_wav_header(make_wav(b'\x00' * 8, bits=32, audio_format=3, extensible=True))
+        self.assertEqual((fmt['format'], fmt['bits']), (3, 32))
+
+    def test_streamed_data_size_is_unknown(self):
+        for size in (0, 0xFFFFFFFF):
+            self.assertIsNone(parse_wav_header(make_wav(b'', data_size=size))[2])
+
+    def test_truncated_header_needs_more_data(self):
+        data = make_wav(b'\x00\x00' * 4)
+        for length in (12, 20, 30, 40):
+            self.assertIsNone(parse_wav_header(data[:length]), length)
+
+    def test_data_before_format(self):
+        data = b'RIFF\x00\x00\x00\x00WAVEdata\x04\x00\x00\x00\x00\x00\x00\x00'
+        with self.assertRaises(UploadRejected):
+            parse_wav_header(data)
+
+    def test_no_data_chunk(self):
+        junk = b'junk' + struct.pack('<I', 4) + b'\x00' * 4
+        data = make_wav(b'')[:36] + junk * (audio_ingest.MAX_WAV_HEADER_BYTES // len(junk) + 1)
+        with self.assertRaises(UploadRejected):
+            parse_wav_header(data)
+
+
+class AudioIngestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.ffmpeg = os.path.join(self.directory.name, 'ffmpeg')
+        with open(self.ffmpeg, 'w') as f:
+            f.write(FFMPEG_STANDIN.format(python=sys.executable))
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IXUSR)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def ingest(self, data, max_bytes=1024 * 1024, max_seconds=10, block_size=5):
+        ingest = AudioIngest(self.ffmpeg, max_bytes, max_seconds, self.directory.name)
+        self.addCleanup(ingest.close)
+        feed_in_blocks(ingest, data, block_size)
+        return ingest
+
+    def test_16k_mono_wav_passes_through(self):
+        pcm = bytes(range(256)) * 4
+        data = make_wav(pcm)
+        ingest = self.ingest(data)
+        self.assertEqual(ingest.digest, hashlib.sha256(data).hexdigest())
+        audio = ingest.finish()
+        self.assertEqual((audio.decoder, audio.container, audio.sample_rate, audio.sample_width),
+                         ('passthrough', 'wav', 16000, 2))
+        self.assertEqual(audio.pcm, pcm)
+        self.assertEqual((audio.upload_bytes, audio.digest), (len(data), ingest.digest))
+
+    def test_trailing_chunks_are_ignored(self):
+        pcm = b'\x01\x00' * 100
+        audio = self.ingest(make_wav(pcm) + b'LIST\x04\x00\x00\x00info').finish()
+        self.assertEqual(audio.pcm, pcm)
+
+    def test_other_wav_is_resampled_with_numpy(self):
+        pcm = b'\x00\x10\x00\x10' * 4410
+        audio = self.ingest(make_wav(pcm, rate=44100, channels=2), block_size=1000).finish()
+        self.assertEqual((audio.decoder, audio.sample_rate, audio.sample_width), ('numpy', 16000, 2))
+        self.assertAlmostEqual(audio.duration, 0.1, places=2)
+
+    def test_without_numpy(self):
+        with mock.patch.object(audio_ingest, '_resampling_supported', False):
+            mono = self.ingest(make_wav(b'\x00\x00' * 441, rate=44100)).finish()
+            self.assertEqual((mono.decoder, mono.sample_rate), ('passthrough', 44100))
+            stereo = self.ingest(make_wav(b'\x00\x00' * 882, rate=44100, channels=2)).finish()
+            self.assertEqual((stereo.decoder, stereo.sample_rate), ('ffmpeg', 16000))
+
+    def test_compressed_audio_goes_to_ffmpeg(self):
+        audio = self.ingest(b'OggS' + b'\x00' * 500).finish()
+        self.assertEqual((audio.decoder, audio.container, audio.duration), ('ffmpeg', 'ogg', 0.1))
+
+    def test_mp4_is_spooled_and_removed(self):
+        ingest = self.ingest(b'\x00\x00\x00\x20ftypM4A ' + b'\x00' * 500)
+        spooled = glob.glob(os.path.join(self.directory.name, 'upload_*.mp4'))
+        self.assertEqual(len(spooled), 1)
+        self.assertEqual(ingest.finish().decoder, 'ffmpeg')
+        self.assertEqual(glob.glob(os.path.join(self.directory.name, 'upload_*.mp4')), [])
+
+    def test_unknown_input_is_left_to_ffmpeg(self):
+        with self.assertRaises(UploadRejected) as caught:
+            self.ingest(b'GARBAGE' + b'\x00' * 100).finish()
+        self.assertEqual(caught.exception.status_code, 415)
+        self.assertIn('Invalid data found', str(caught.exception))
+
+    def test_short_upload_is_sniffed_on_finish(self):
+        audio = self.ingest(b'OggS\x00').finish()
+        self.assertEqual(audio.container, 'ogg')
+
+    def test_truncated_wav_header(self):
+        with self.assertRaises(UploadRejected) as caught:
+            self.ingest(make_wav(b'\x00\x00' * 10)[:30]).finish()
+        self.assertIn('truncated header', str(caught.exception))
+
+    def test_wav_without_samples(self):
+        with self.assertRaises(UploadRejected) as caught:
+            self.ingest(make_wav(b'')).finish()
+        self.assertIn('no samples', str(caught.exception))
+
+    def test_empty_upload(self):
+        with self.assertRaises(UploadRejected):
+            self.ingest(b'').finish()
+
+    def test_size_budget_is_enforced_while_feeding(self):
+        ingest = AudioIngest(self.ffmpeg, 1000, 10, self.directory.name)
+        self.addCleanup(ingest.close)
+        ingest.feed(make_wav(b'\x00\x00' * 400))
+        with self.assertRaises(UploadRejected) as caught:
+            ingest.feed(b'\x00' * 200)
+        self.assertEqual(caught.exception.status_code, 413)
+
+    def test_duration_budget_is_enforced_while_feeding(self):
+        for rate, channels in ((16000, 1), (44100, 2)):
+            ingest = AudioIngest(self.ffmpeg, 10 * 1024 * 1024, 1, self.directory.name)
+            self.addCleanup(ingest.close)
+            ingest.feed(make_wav(b'', rate=rate, channels=channels, data_size=0))
+            with self.assertRaises(UploadRejected) as caught:
+                for _ in range(100):
+                    ingest.feed(b'\x00' * 4096)
+            self.assertEqual(caught.exception.status_code, 413)
+            self.assertIn('too long', str(caught.exception))
+
+
+class ReadMultipartTest(unittest.TestCase):
+    def body(self, *parts):
+        lines = []
+        for name, value, filename in parts:
+            disposition = f'form-data; name="{name}"'
+            if filename:
+                disposition += f'; filename="{filename}"'
+            lines.append(b'--BOUNDARY\r\nContent-Disposition: ' + disposition.encode())
+            if filename:
+                lines.append(b'\r\nContent-Type: audio/webm')
+            lines.append(b'\r\n\r\n' + value + b'\r\n')
+        lines.append(b'--BOUNDARY--\r\n')
+        return io.BytesIO(b''.join(lines))
+
+    def test_file_and_fields(self):
+        received = []
+        fields, content_type = read_multipart(
+            self.body(('language', b'Hindi', None), ('audio', b'\x1aE\xdf\xa3' * 1000, 'a.webm'),
+                      ('race', b'true', None)),
+            'BOUNDARY', 'audio', received.append, block_size=100
+        )
+        self.assertEqual(fields, {'language': 'Hindi', 'race': 'true'})
+        self.assertEqual(content_type, 'audio/webm')
+        self.assertEqual(b''.join(received), b'\x1aE\xdf\xa3' * 1000)
+
+    def test_missing_file(self):
+        fields, content_type = read_multipart(
+            self.body(('language', b'Hindi', None)), 'BOUNDARY', 'audio', lambda data: None
+        )
+        self.assertEqual((fields, content_type), ({'language': 'Hindi'}, None))
+
+    def test_oversized_field(self):
+        with self.assertRaises(UploadRejected):
+            read_multipart(
+                self.body(('language', b'x' * (audio_ingest.MAX_FIELD_BYTES + 1), None)),
+                'BOUNDARY', 'audio', lambda data: None
+            )
+
+    def test_truncated_body(self):
+        body = self.body(('audio', b'\x00' * 1000, 'a.webm')).getvalue()[:600]
+        with self.assertRaises(UploadRejected):
+            read_multipart(io.BytesIO(body), 'BOUNDARY', 'audio', lambda data: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Tests for compare_and_set on the cache backends.
+
+Run with: python -m unittest discover tests
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import MemcachedCache, MemoryCache, SQLiteCache  # noqa: E402
+from benchmarks import memcached_standin  # noqa: E402
+
+WORKERS = 4
+INCREMENTS = 50
+
+
+def increment(path, barrier, increments):
+    """Add 1 to the shared counter `increments` times, retrying lost races."""
+    cache = SQLiteCache('counters', path)
+    barrier.wait()
+    for _ in range(increments):
+        while True:
+            current = cache.get('count')
+            if cache.compare_and_set('count', current, str(int(current or 0) + 1)):
+                break
+
+
+def claim(path, barrier, winners):
+    """Try to store this process's id over the same starting value."""
+    cache = SQLiteCache('documents', path)
+    barrier.wait()
+    if cache.compare_and_set('doc', 'v0', str(os.getpid())):
+        winners.put(os.getpid())
+
+
+class CompareAndSetContract:
+    """Behaviour every backend must share; subclasses set self.cache."""
+
+    def test_absent_key(self):
+        self.assertTrue(self.cache.compare_and_set('a', None, '1'))
+        self.assertFalse(self.cache.compare_and_set('a', None, '2'))
+        self.assertEqual(self.cache.get('a'), '1')
+
+    def test_expected_value(self):
+        self.cache.set('a', '1')
+        self.assertFalse(self.cache.compare_and_set('a', '0', '2'))
+        self.assertTrue(self.cache.compare_and_set('a', '1', '2'))
+        self.assertEqual(self.cache.get('a'), '2')
+
+    def test_missing_key_with_expected_value(self):
+        self.assertFalse(self.cache.compare_and_set('missing', '1', '2'))
+        self.assertIsNone(self.cache.get('missing'))
+
+
+class MemoryCacheTest(CompareAndSetContract, unittest.TestCase):
+    def setUp(self):
+        self.cache = MemoryCache('test')
+
+
+class MemcachedCacheTest(CompareAndSetContract, unittest.TestCase):
+    def setUp(self):
+        self.server = memcached_standin.start_in_thread()
+        self.cache = MemcachedCache('test', '%s:%d' % self.server.server_address)
+
+    def tearDown(self):
+        self.cache._reset()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SQLiteCacheTest(CompareAndSetContract, unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache('test', self.path)
+        self.context = multiprocessing.get_context('spawn')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_workers(self, target, *args):
+        context = self.context
+        barrier = context.Barrier(WORKERS)
+        processes = [
+            context.Process(target=target, args=(self.path, barrier) + args)
+            for _ in range(WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+
+    def test_processes_do_not_lose_updates(self):
+        SQLiteCache('counters', self.path)
+        self.run_workers(increment, INCREMENTS)
+        self.assertEqual(SQLiteCache('counters', self.path).get('count'), str(WORKERS * INCREMENTS))
+
+    def test_one_process_wins_a_race(self):
+        documents = SQLiteCache('documents', self.path)
+        documents.set('doc', 'v0')
+        winners = self.context.Queue()
+        self.run_workers(claim, winners)
+        winner = winners.get(timeout=5)
+        self.assertTrue(winners.empty())
+        self.assertEqual(documents.get('doc'), str(winner))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Regression tests for /translate/incremental with overlapping edits.
+
+Run with: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+STATE_DIR = tempfile.mkdtemp(prefix='linguasync_test_')
+os.environ.update(
+    CACHE_BACKEND='memory',
+    CACHE_SNAPSHOT_DIR=os.path.join(STATE_DIR, 'snapshots'),
+    TRAFFIC_STATS_PATH=os.path.join(STATE_DIR, 'stats.sqlite3'),
+    JOBS_DIR=os.path.join(STATE_DIR, 'jobs'),
+    RATE_LIMIT_PER_MINUTE='0',
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import deep_translator  # noqa: E402
+
+# Sentences containing this word are held until the test releases them
+SLOW_WORD = 'Beta'
+slow_started = threading.Event()
+release_slow = threading.Event()
+
+
+class StandInTranslator:
+    """Prefixes every line with 'T:'; blocks on SLOW_WORD."""
+
+    def __init__(self, source='auto', target='en', **kwargs):
+        pass
+
+    def translate(self, text=None, **kwargs):
+        if SLOW_WORD in text:
+            slow_started.set()
+            release_slow.wait(10)
+        return '\n'.join('T:' + line for line in text.split('\n'))
+
+
+deep_translator.GoogleTranslator = StandInTranslator
+
+import app  # noqa: E402
+
+
+class ClientDocument:
+    """Applies /translate/incremental patches like the web interface does."""
+
+    def __init__(self, client, document_id):
+        self.client = client
+        self.document_id = document_id
+        self.version = None
+        self.segments = []
+
+    def send(self, text):
+        response = self.client.post('/translate/incremental', json={
+            'document_id': self.document_id,
+            'base_version': self.version,
+            'text': text,
+            'from_lang': 'English',
+            'to_lang': 'Hindi',
+        })
+        data = response.get_json()
+        assert data['success'], data
+        return data
+
+    def apply(self, data):
+        if data['reset']:
+            self.segments = []
+        for op in reversed(data['ops']):
+            self.segments[op['start']:op['end']] = [s['text'] + s['trailing'] for s in op['segments']]
+        self.version = data['version']
+
+    @property
+    def text(self):
+        return ''.join(self.segments)
+
+
+class IncrementalTranslationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        slow_started.clear()
+        release_slow.clear()
+
+    def expected(self, text):
+        fresh = ClientDocument(self.client, f'fresh-{id(text)}-{len(text)}')
+        fresh.apply(fresh.send(text))
+        return fresh.text
+
+    def test_overlapping_edits_do_not_corrupt_the_document(self):
+        document = ClientDocument(self.client, 'overlap')
+        document.apply(document.send('Alpha.'))
+        base_version = document.version
+
+        # Edit A is slow; the client supersedes it with edit B and never
+        # applies A's response
+        slow_client = ClientDocument(app.app.test_client(), 'overlap')
+        slow_client.version = base_version
+        slow_result = {}
+        slow_edit = threading.Thread(
+            target=lambda: slow_result.update(slow_client.send('Alpha. Beta.'))
+        )
+        slow_edit.start()
+        self.assertTrue(slow_started.wait(10))
+
+        document.apply(document.send('Alpha. Gamma.'))
+        release_slow.set()
+        slow_edit.join(10)
+
+        # A finished after B was stored: it must not replace B's version
+        self.assertIsNone(slow_result['version'])
+        self.assertNotEqual(slow_result['version'], document.version)
+
+        text = 'Alpha. Gamma. Delta.'
+        document.apply(document.send(text))
+        self.assertEqual(document.text, self.expected(text))
+
+    def test_versions_do_not_repeat(self):
+        first = ClientDocument(self.client, 'tokens-1')
+        second = ClientDocument(self.client, 'tokens-2')
+        first.apply(first.send('Alpha.'))
+        second.apply(second.send('Alpha.'))
+        self.assertNotEqual(first.version, second.version)
+
+    def test_with_audio_false_string(self):
+        response = self.client.post('/translate/incremental', json={
+            'document_id': 'no-audio',
+            'base_version': None,
+            'text': 'Alpha.',
+            'with_audio': 'false',
+        })
+        segments = response.get_json()['ops'][0]['segments']
+        self.assertNotIn('audio', segments[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""Tests for SingleFlight and SharedFlight.
+
+Run with: python -m unittest discover tests
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import MemoryCache, SQLiteCache  # noqa: E402
+from single_flight import SharedFlight, SingleFlight  # noqa: E402
+
+
+def transcribe_once(path, barrier, runs, results):
+    """One worker process: run the shared flight for the same key."""
+    flight = SharedFlight(SQLiteCache('transcriptions', path), poll_interval=0.05)
+    barrier.wait()
+
+    def work():
+        runs.put(os.getpid())
+        time.sleep(0.5)
+        return ['hello', 'en']
+
+    results.put(flight.do('key', work, timeout=10))
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_run(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+        waited = []
+
+        def work():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', work)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(
+            flight.do('k', work, on_wait=lambda: waited.append(1))
+        ))
+        follower.start()
+        while flight._flights['k'].waiters == 0:
+            time.sleep(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(waited, [1])
+        self.assertEqual(sorted(results, key=lambda r: r[1]), [('result', False), ('result', True)])
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_waiters_get_the_leaders_exception(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise ValueError('boom')
+
+        errors = []
+
+        def call():
+            try:
+                flight.do('k', fail)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        started.wait(5)
+        threads.append(threading.Thread(target=call))
+        threads[1].start()
+        while flight._flights['k'].waiters == 0:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(errors), 2)
+
+
+class SharedFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_processes_share_one_run(self):
+        SQLiteCache('transcriptions', self.path)
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(2)
+        runs = context.Queue()
+        results = context.Queue()
+        processes = [
+            context.Process(target=transcribe_once, args=(self.path, barrier, runs, results))
+            for _ in range(2)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+        outcomes = sorted([results.get(timeout=5), results.get(timeout=5)], key=lambda r: r[1])
+        self.assertEqual(outcomes, [(['hello', 'en'], False), (['hello', 'en'], True)])
+        runs.get(timeout=5)
+        self.assertTrue(runs.empty())
+
+    def test_abandoned_lease_is_taken_over(self):
+        cache = MemoryCache('transcriptions')
+        cache.set('lease:key', json.dumps({'owner': 'dead', 'state': 'running', 'expires': time.time() - 1}))
+        flight = SharedFlight(cache, poll_interval=0.01)
+        self.assertEqual(flight.do('key', lambda: 'fresh', timeout=1), ('fresh', False))
+
+    def test_finished_lease_is_not_reused_by_later_callers(self):
+        cache = MemoryCache('transcriptions')
+        flight = SharedFlight(cache, poll_interval=0.01)
+        flight.do('key', lambda: '', timeout=1)
+        self.assertEqual(flight.do('key', lambda: 'second', timeout=1), ('second', False))
+
+    def test_waiter_in_another_process_times_out_when_leader_fails(self):
+        cache = MemoryCache('transcriptions')
+        claim = json.dumps({'owner': 'other', 'state': 'running', 'expires': time.time() + 60})
+        cache.set('lease:key', claim)
+        flight = SharedFlight(cache, poll_interval=0.01)
+        stopped = []
+
+        def fail_leader():
+            time.sleep(0.1)
+            cache.compare_and_set('lease:key', claim, json.dumps({'owner': 'other', 'state': 'failed'}))
+
+        threading.Thread(target=fail_leader).start()
+        with self.assertRaises(TimeoutError):
+            flight.do('key', lambda: 'unused', timeout=5, on_wait=lambda: stopped.append(1))
+        self.assertEqual(stopped, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
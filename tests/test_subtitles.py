@@ -0,0 +1,176 @@
+"""Tests for SRT/WebVTT parsing, cue batching and formatting.
+
+Run with: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitles import (  # noqa: E402
+    MAX_BATCH_CHARS, MAX_BATCH_CUES, Cue, Passthrough, batch_cues, format_item, read_subtitles,
+    speech_text, wrap_lines
+)
+
+SRT = (
+    '1\n'
+    '00:00:01,000 --> 00:00:02,500\n'
+    'Hello there.\n'
+    '\n'
+    '2\n'
+    '00:00:03,000 --> 00:00:05,250\n'
+    'This cue has\n'
+    'two lines.\n'
+    '\n'
+)
+
+VTT = (
+    'WEBVTT - Example\n'
+    '\n'
+    'NOTE written by hand\n'
+    '\n'
+    'intro\n'
+    '00:00:01.000 --> 00:00:02.500 align:start\n'
+    '<v Anna>Hello there.\n'
+    '\n'
+    '01:00:03.000 --> 01:00:05.250\n'
+    'This cue has\n'
+    'two lines.\n'
+    '\n'
+)
+
+
+def parse(text, block_size=7):
+    """Parse text fed in small blocks, as the endpoint streams it."""
+    blocks = [text[i:i + block_size] for i in range(0, len(text), block_size)]
+    subtitle_format, items = read_subtitles(iter(blocks))
+    return subtitle_format, list(items)
+
+
+def render(subtitle_format, items, output_format=None, translate=None):
+    output_format = output_format or subtitle_format
+    out = []
+    number = 0
+    for item in items:
+        text = None
+        if isinstance(item, Cue):
+            number += 1
+            text = translate(item.text) if translate else None
+        out.append(format_item(item, output_format, number, text))
+    return ''.join(out)
+
+
+def make_cue(text, index=0):
+    return Cue(None, index, index + 1, '', [text])
+
+
+class ParseTest(unittest.TestCase):
+    def test_srt_round_trip(self):
+        subtitle_format, items = parse(SRT)
+        self.assertEqual(subtitle_format, 'srt')
+        self.assertEqual(render(subtitle_format, items), SRT)
+
+    def test_vtt_round_trip(self):
+        subtitle_format, items = parse(VTT)
+        self.assertEqual(subtitle_format, 'vtt')
+        self.assertEqual(render(subtitle_format, items), VTT)
+
+    def test_short_vtt_timestamps_are_written_in_full(self):
+        _, items = parse('WEBVTT\n\n00:01.000 --> 00:02.500\nHi\n')
+        self.assertEqual(format_item(items[1], 'vtt', 1), '00:00:01.000 --> 00:00:02.500\nHi\n\n')
+
+    def test_cue_fields(self):
+        _, items = parse(VTT)
+        self.assertIsInstance(items[0], Passthrough)
+        self.assertIsInstance(items[1], Passthrough)
+        cue = items[2]
+        self.assertEqual((cue.identifier, cue.start, cue.end, cue.settings), ('intro', 1.0, 2.5, 'align:start'))
+        self.assertEqual(items[3].start, 3603.0)
+
+    def test_multi_line_cue_is_one_line_of_text(self):
+        _, items = parse(SRT)
+        self.assertEqual(items[1].lines, ['This cue has', 'two lines.'])
+        self.assertEqual(items[1].text, 'This cue has two lines.')
+
+    def test_crlf_and_bom(self):
+        subtitle_format, items = parse('\ufeff' + SRT.replace('\n', '\r\n'))
+        self.assertEqual(subtitle_format, 'srt')
+        self.assertEqual(render(subtitle_format, items), SRT)
+
+    def test_missing_final_blank_line(self):
+        _, items = parse(SRT.rstrip('\n'))
+        self.assertEqual(items[1].text, 'This cue has two lines.')
+
+    def test_empty_input(self):
+        self.assertEqual(parse(''), ('srt', []))
+
+    def test_srt_to_vtt_keeps_numbers_as_identifiers(self):
+        subtitle_format, items = parse(SRT)
+        self.assertEqual(render(subtitle_format, items, 'vtt'), SRT.replace(',', '.'))
+
+    def test_vtt_to_srt_drops_passthrough_blocks(self):
+        subtitle_format, items = parse(VTT)
+        self.assertTrue(render(subtitle_format, items, 'srt').startswith('1\n00:00:01,000 --> 00:00:02,500\n'))
+
+
+class FormatTest(unittest.TestCase):
+    def test_translation_is_wrapped_to_the_original_line_count(self):
+        _, items = parse(SRT)
+        block = format_item(items[1], 'srt', 2, 'Dieser Hinweis hat zwei Zeilen.')
+        header, timing, *lines = block.rstrip('\n').split('\n')
+        self.assertEqual((header, timing), ('2', '00:00:03,000 --> 00:00:05,250'))
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(' '.join(lines), 'Dieser Hinweis hat zwei Zeilen.')
+
+    def test_empty_cue(self):
+        _, items = parse('1\n00:00:01,000 --> 00:00:02,000\n\n2\n00:00:03,000 --> 00:00:04,000\nHi\n')
+        self.assertEqual(items[0].lines, [])
+        self.assertEqual(items[0].text, '')
+        for text in (None, '', '  '):
+            self.assertEqual(format_item(items[0], 'srt', 1, text), '1\n00:00:01,000 --> 00:00:02,000\n\n')
+        # Translating a cue to nothing must not leave a blank line in the block
+        self.assertEqual(format_item(items[1], 'srt', 2, ''), '2\n00:00:03,000 --> 00:00:04,000\n\n')
+
+    def test_wrap_lines(self):
+        self.assertEqual(wrap_lines('one two three four five', 2), ['one two three', 'four five'])
+        self.assertEqual(len(wrap_lines('one two three four five six', 3)), 3)
+        self.assertEqual(wrap_lines('single', 3), ['single'])
+
+    def test_speech_text_strips_markup(self):
+        self.assertEqual(speech_text('<v Anna><i>Hello</i>  {\\an8}there'), 'Hello there')
+
+
+class BatchTest(unittest.TestCase):
+    def test_cue_limit(self):
+        cues = [make_cue(f'line {i}', i) for i in range(2 * MAX_BATCH_CUES + 1)]
+        sizes = [len(batch) for batch in batch_cues(cues)]
+        self.assertEqual(sizes, [MAX_BATCH_CUES, MAX_BATCH_CUES, 1])
+
+    def test_character_limit(self):
+        text = 'x' * 499  # 500 characters with the line separator
+        cues = [make_cue(text, i) for i in range(9)]
+        batches = list(batch_cues(cues))
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 1])
+        for batch in batches:
+            self.assertLessEqual(sum(len(cue.text) + 1 for cue in batch), MAX_BATCH_CHARS)
+
+    def test_oversized_cue_gets_its_own_batch(self):
+        cues = [make_cue('short'), make_cue('y' * (MAX_BATCH_CHARS + 10)), make_cue('short')]
+        self.assertEqual([len(batch) for batch in batch_cues(cues)], [1, 1, 1])
+
+    def test_passthrough_blocks_stay_in_order_and_do_not_count(self):
+        items = [Passthrough('WEBVTT')] + [make_cue(str(i), i) for i in range(MAX_BATCH_CUES)]
+        items.insert(5, Passthrough('NOTE'))
+        batches = list(batch_cues(items))
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([item for batch in batches for item in batch], items)
+
+    def test_batching_preserves_order(self):
+        cues = [make_cue(f'cue {i}', i) for i in range(100)]
+        flattened = [cue for batch in batch_cues(cues, max_chars=50, max_cues=7) for cue in batch]
+        self.assertEqual(flattened, cues)
+
+
+if __name__ == '__main__':
+    unittest.main()
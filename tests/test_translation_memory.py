@@ -0,0 +1,115 @@
+"""Tests for sentence splitting and near-duplicate reuse in translation_memory.
+
+Run with: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import MemoryCache  # noqa: E402
+from translation_memory import TranslationMemory, split_sentences, substitute_placeholders  # noqa: E402
+
+
+class SplitSentencesTest(unittest.TestCase):
+    def test_round_trip(self):
+        text = 'Hello there.  How are you?\nFine, thanks!  '
+        segments = split_sentences(text)
+        self.assertEqual([s for s, _ in segments], ['Hello there.', 'How are you?', 'Fine, thanks!'])
+        self.assertEqual(''.join(s + t for s, t in segments), text)
+
+    def test_abbreviations_do_not_end_sentences(self):
+        segments = split_sentences('Dr. Smith met J. R. Tolkien. Then he left.')
+        self.assertEqual([s for s, _ in segments], ['Dr. Smith met J. R. Tolkien.', 'Then he left.'])
+
+
+class SubstitutePlaceholdersTest(unittest.TestCase):
+    def test_number_swap(self):
+        self.assertEqual(
+            substitute_placeholders(
+                'Order 12345 has shipped.', 'Order 67890 has shipped.',
+                'Bestellung 12345 wurde versandt.'
+            ),
+            'Bestellung 67890 wurde versandt.'
+        )
+
+    def test_several_numbers(self):
+        self.assertEqual(
+            substitute_placeholders(
+                'The train leaves at 10:30 in 2024.', 'The train leaves at 11:45 in 2025.',
+                'Der Zug fährt 2024 um 10:30.'
+            ),
+            'Der Zug fährt 2025 um 11:45.'
+        )
+
+    def test_counts_are_not_swapped(self):
+        # "1 file" -> "2 files" would need the noun to change too
+        self.assertIsNone(substitute_placeholders(
+            'You have 1 file.', 'You have 2 file.', 'Sie haben 1 Datei.'
+        ))
+        self.assertIsNone(substitute_placeholders(
+            'Delete 5 messages?', 'Delete 21 messages?', 'Удалить 5 сообщений?'
+        ))
+
+    def test_counts_with_the_same_plural_form(self):
+        self.assertEqual(
+            substitute_placeholders('You have 2 files.', 'You have 3 files.', 'Sie haben 2 Dateien.'),
+            'Sie haben 3 Dateien.'
+        )
+
+    def test_capitalised_words_are_not_swapped(self):
+        # German nouns are capitalised; "Hunde" must be translated, not copied
+        self.assertIsNone(substitute_placeholders(
+            'Ich sehe Anna im Park.', 'Ich sehe Hunde im Park.', 'I see Anna in the park.'
+        ))
+        self.assertIsNone(substitute_placeholders(
+            'Call Anna tomorrow.', 'Call Maria tomorrow.', 'Ruf Anna morgen an.'
+        ))
+
+    def test_number_missing_from_translation(self):
+        self.assertIsNone(substitute_placeholders(
+            'Room 12 is free.', 'Room 14 is free.', 'कमरा १२ खाली है।'
+        ))
+
+    def test_number_repeated_in_translation(self):
+        self.assertIsNone(substitute_placeholders(
+            'Gate 7.', 'Gate 8.', 'Tor 7 (7).'
+        ))
+
+    def test_word_changes_are_rejected(self):
+        self.assertIsNone(substitute_placeholders(
+            'Order 12345 has shipped.', 'Order 12345 was cancelled.', 'Bestellung 12345 wurde versandt.'
+        ))
+
+    def test_identical_sentences_need_no_substitution(self):
+        self.assertIsNone(substitute_placeholders('Gate 7.', 'Gate 7.', 'Tor 7.'))
+
+
+class TranslationMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.memory = TranslationMemory(MemoryCache('tm'))
+        self.upstream = []
+
+    def translate(self, text):
+        def upstream(batch):
+            self.upstream.append(batch)
+            return '\n'.join('T:' + line for line in batch.split('\n'))
+        return self.memory.translate(text, 'en', 'de', upstream)
+
+    def test_exact_and_fuzzy_reuse(self):
+        self.translate('Your order 12345 has shipped today.')
+        translated, counts = self.translate('Your order 12345 has shipped today. Your order 67890 has shipped today.')
+        self.assertEqual(translated, 'T:Your order 12345 has shipped today. T:Your order 67890 has shipped today.')
+        self.assertEqual((counts['exact'], counts['fuzzy'], counts['upstream_characters']), (1, 1, 0))
+        self.assertEqual(len(self.upstream), 1)
+
+    def test_noun_change_goes_upstream(self):
+        self.translate('Ich sehe Anna im Park heute.')
+        translated, counts = self.translate('Ich sehe Hunde im Park heute.')
+        self.assertEqual(counts['fuzzy'], 0)
+        self.assertEqual(translated, 'T:Ich sehe Hunde im Park heute.')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+"""Per-request tracing with stage spans and a slow-request log.
+
+Each request gets a trace id (taken from an incoming X-Trace-Id header or
+generated). Code records stages with `with span('translate.upstream'):`;
+spans outside a request are no-ops. When the request ends the trace is
+exported as one JSON object to:
+
+- a JSON-lines file (TRACE_EXPORT=file:/path/to/traces.jsonl), or
+- an HTTP collector (TRACE_EXPORT=http://host:port/path), posted in batches
+  from a background thread.
+
+Requests slower than the slow-request threshold are also logged with their
+full stage breakdown. Every log record carries a `trace_id` attribute.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('slow_requests')
+
+TRACE_ID_RE = re.compile(r'^[0-9A-Za-z_-]{8,64}$')
+
+_current_trace = ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """Spans recorded during one request."""
+
+    def __init__(self, name, trace_id=None):
+        self.trace_id = trace_id if trace_id and TRACE_ID_RE.match(trace_id) else uuid.uuid4().hex
+        self.name = name
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.attrs = {}
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name, offset, duration, attrs):
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'start_ms': round(offset * 1000, 2),
+                'duration_ms': round(duration * 1000, 2),
+                **attrs
+            })
+
+    def to_dict(self, duration):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'timestamp': self.wall_start,
+            'duration_ms': round(duration * 1000, 2),
+            'attrs': self.attrs,
+            'spans': spans
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else '-'
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record a stage of the current request; yields a dict for extra attributes."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs['error'] = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        trace.add_span(name, start - trace.start, time.perf_counter() - start, attrs)
+
+
+class FileExporter:
+    """Append traces as JSON lines, rotating the file at max_bytes."""
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, trace_dict):
+        line = json.dumps(trace_dict, ensure_ascii=False) + '\n'
+        with self._lock:
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError as e:
+                logger.warning(f"Could not write trace: {e}")
+
+
+class HttpExporter:
+    """POST batches of traces to a collector from a background thread.
+
+    Traces are dropped (and counted) if the collector cannot keep up.
+    """
+
+    def __init__(self, url, batch_size=50, flush_interval=2.0, max_pending=1000, timeout=2.0):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # Started lazily so it exists in each forked worker
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                    self._thread.start()
+
+    def export(self, trace_dict):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace_dict)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            body = json.dumps({'traces': batch}).encode('utf-8')
+            try:
+                req = urllib.request.Request(
+                    self.url, data=body, headers={'Content-Type': 'application/json'}
+                )
+                urllib.request.urlopen(req, timeout=self.timeout).close()
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning(f"Could not export {len(batch)} traces: {e}")
+
+
+def create_exporter(spec):
+    """Build an exporter from a TRACE_EXPORT value ('' disables export)."""
+    if not spec:
+        return None
+    if spec.startswith('file:'):
+        return FileExporter(spec[len('file:'):])
+    if spec.startswith(('http://', 'https://')):
+        return HttpExporter(spec)
+    logger.warning(f"Unknown TRACE_EXPORT '{spec}', traces will not be exported")
+    return None
+
+
+class Tracer:
+    """Starts and finishes request traces."""
+
+    def __init__(self, exporter=None, slow_threshold=2.0, slow_log_path=None):
+        self.exporter = exporter
+        self.slow_threshold = slow_threshold
+        self.slow_log = FileExporter(slow_log_path) if slow_log_path else None
+
+    def start(self, name, trace_id=None):
+        trace = Trace(name, trace_id)
+        token = _current_trace.set(trace)
+        return trace, token
+
+    def finish(self, trace, token):
+        duration = time.perf_counter() - trace.start
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Finished from another context (e.g. after a streamed response)
+            _current_trace.set(None)
+        trace_dict = trace.to_dict(duration)
+        if self.exporter is not None:
+            self.exporter.export(trace_dict)
+        if self.slow_threshold and duration >= self.slow_threshold:
+            stages = ', '.join(f"{s['name']}={s['duration_ms']:.0f}ms" for s in trace_dict['spans'])
+            slow_logger.warning(
+                f"Slow request {trace.trace_id} {trace.name} took {duration:.2f}s: {stages or 'no spans'}"
+            )
+            if self.slow_log is not None:
+                self.slow_log.export(trace_dict)
+        return trace_dict
+
+
+def install_log_record_trace_ids():
+    """Give every log record a `trace_id` attribute for format strings."""
+    previous_factory = logging.getLogRecordFactory()
+
+    def factory(*args, **kwargs):
+        record = previous_factory(*args, **kwargs)
+        record.trace_id = current_trace_id()
+        return record
+
+    logging.setLogRecordFactory(factory)
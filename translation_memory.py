@@ -0,0 +1,360 @@
+"""Sentence-level translation memory with near-duplicate matching.
+
+Input text is split into sentences. Each sentence is looked up in a shared
+cache (see cache_backends.py); only sentences that are new are sent upstream,
+batched into a single request. Sentences that are near-duplicates of a stored
+one (found through a MinHash/LSH index over character n-grams) are reused
+when they differ only in numbers (ids, years, times) that the stored
+translation carries over verbatim.
+"""
+import difflib
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from cache_backends import make_cache_key
+from tracing import span
+
+# Sentence = text up to terminal punctuation (Latin, Devanagari danda, CJK)
+# or a line break, plus the whitespace that follows it.
+SENTENCE_RE = re.compile(
+    r'[^.!?।॥。！？\n]*'
+    r'(?:[.!?।॥。！？]+[\'"”’)\]]*|\n|$)'
+    r'\s*'
+)
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+# Abbreviations and initials (e.g., J. R.) whose period does not end a sentence
+ABBREVIATION_RE = re.compile(
+    r'(?:^|\s)(?:Mr|Mrs|Ms|Dr|Prof|Sr|Jr|St|vs|etc|[A-Za-z](?:\.[A-Za-z])*)\.$',
+    re.IGNORECASE
+)
+
+# Separator used to send several sentences upstream in one request
+BATCH_SEPARATOR = '\n'
+
+
+def split_sentences(text):
+    """Split text into (sentence, trailing_whitespace) pairs.
+
+    Joining every sentence with its trailing whitespace gives back the
+    original text exactly.
+    """
+    segments = []
+    for match in SENTENCE_RE.finditer(text):
+        chunk = match.group(0)
+        if not chunk:
+            continue
+        sentence = chunk.rstrip()
+        trailing = chunk[len(sentence):]
+        if segments and (not sentence or (
+                ABBREVIATION_RE.search(segments[-1][0]) and '\n' not in segments[-1][1])):
+            # Whitespace only, or the previous "sentence" ended in an
+            # abbreviation: merge into the previous segment
+            previous, previous_trailing = segments[-1]
+            if sentence:
+                segments[-1] = (previous + previous_trailing + sentence, trailing)
+            else:
+                segments[-1] = (previous, previous_trailing + trailing)
+        else:
+            segments.append((sentence, trailing))
+    return segments
+
+
+def diff_segments(old_segments, new_segments):
+    """Return the non-equal (i1, i2, j1, j2) ranges between two segment lists.
+
+    Ranges are in the difflib opcode convention: old_segments[i1:i2] is
+    replaced by new_segments[j1:j2].
+    """
+    matcher = difflib.SequenceMatcher(a=old_segments, b=new_segments, autojunk=False)
+    return [
+        (i1, i2, j1, j2)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def _counts_next_word(tokens, position):
+    """True if the number at position is followed by a word it may count."""
+    following = tokens[position + 1] if position + 1 < len(tokens) else ''
+    return any(c.isalpha() for c in following)
+
+
+def _plural_class(number):
+    """The grammatical number a count selects in the supported languages.
+
+    0, 1 and more differ in most of them ("1 file", "2 files"); Slavic
+    languages also split by the last digits (1/21 файл, 2/22 файла,
+    5/11 файлов).
+    """
+    n = int(number)
+    if n % 10 == 1 and n % 100 != 11:
+        slavic = 'one'
+    elif 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        slavic = 'few'
+    else:
+        slavic = 'many'
+    return min(n, 2), slavic
+
+
+def substitute_placeholders(old_source, new_source, old_translation):
+    """Adapt a stored translation to a near-identical source sentence.
+
+    Only numbers are substituted (translators copy them through); other
+    words, including capitalised ones that may be German nouns, are not.
+    A number followed by a word may be counting it, so it is only swapped
+    for one with the same plural class (see _plural_class).
+
+    Returns the adapted translation, or None if the sentences differ in
+    anything other than such one-to-one number substitutions whose old
+    number appears exactly once in the stored translation.
+    """
+    old_tokens = TOKEN_RE.findall(old_source)
+    new_tokens = TOKEN_RE.findall(new_source)
+    matcher = difflib.SequenceMatcher(a=old_tokens, b=new_tokens, autojunk=False)
+
+    replacements = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        if tag != 'replace' or i2 - i1 != j2 - j1:
+            return None
+        for offset in range(i2 - i1):
+            old, new = old_tokens[i1 + offset], new_tokens[j1 + offset]
+            if not (old.isdecimal() and new.isdecimal()):
+                return None
+            counting = (_counts_next_word(old_tokens, i1 + offset)
+                        or _counts_next_word(new_tokens, j1 + offset))
+            if counting and _plural_class(old) != _plural_class(new):
+                return None
+            pattern = re.compile(r'(?<!\w)' + re.escape(old) + r'(?!\w)')
+            found = list(pattern.finditer(old_translation))
+            if len(found) != 1:
+                return None
+            replacements.append((found[0].start(), found[0].end(), new))
+
+    if not replacements:
+        return None
+
+    replacements.sort()
+    pieces = []
+    position = 0
+    for start, end, new in replacements:
+        if start < position:
+            return None
+        pieces.append(old_translation[position:start])
+        pieces.append(new)
+        position = end
+    pieces.append(old_translation[position:])
+    return ''.join(pieces)
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over character n-grams of stored sentences.
+
+    Bounded to max_entries sentences (least recently added are dropped).
+    Lookups are keyed by a namespace such as the (from, to) language pair.
+    """
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm=48, bands=16, ngram=3, max_entries=5000):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.max_entries = max_entries
+        # Deterministic permutation coefficients (a * x + b) mod PRIME
+        self._perms = [
+            (zlib.crc32(f'a{i}'.encode()) | 1, zlib.crc32(f'b{i}'.encode()))
+            for i in range(num_perm)
+        ]
+        self._buckets = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _shingles(self, text):
+        text = ' '.join(text.lower().split())
+        if len(text) <= self.ngram:
+            return {text}
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    def _band_keys(self, namespace, text):
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in self._shingles(text)]
+        signature = [
+            min((a * h + b) % self.PRIME for h in hashes)
+            for a, b in self._perms
+        ]
+        return [
+            (namespace, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def add(self, namespace, text):
+        entry = (namespace, text)
+        keys = self._band_keys(namespace, text)
+        with self._lock:
+            if entry in self._entries:
+                self._entries.move_to_end(entry)
+                return
+            self._entries[entry] = keys
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(text)
+            while len(self._entries) > self.max_entries:
+                (_, old_text), old_keys = self._entries.popitem(last=False)
+                for key in old_keys:
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(old_text)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def query(self, namespace, text, threshold=0.5, limit=3):
+        """Return up to `limit` stored sentences with n-gram Jaccard >= threshold."""
+        keys = self._band_keys(namespace, text)
+        with self._lock:
+            candidates = set()
+            for key in keys:
+                candidates.update(self._buckets.get(key, ()))
+        candidates.discard(text)
+
+        shingles = self._shingles(text)
+        scored = []
+        for candidate in candidates:
+            other = self._shingles(candidate)
+            similarity = len(shingles & other) / len(shingles | other)
+            if similarity >= threshold:
+                scored.append((similarity, candidate))
+        scored.sort(reverse=True)
+        return [candidate for _, candidate in scored[:limit]]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TranslationMemory:
+    """Translate text sentence by sentence, reusing stored translations."""
+
+    def __init__(self, cache, index=None, fuzzy_threshold=0.5):
+        self.cache = cache
+        self.index = index if index is not None else NearDuplicateIndex()
+        self.fuzzy_threshold = fuzzy_threshold
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'sentences': 0,
+            'exact_hits': 0,
+            'fuzzy_hits': 0,
+            'input_characters': 0,
+            'upstream_characters': 0,
+        }
+
+    def _key(self, sentence, from_lang, to_lang):
+        return make_cache_key('tm', sentence, from_lang, to_lang)
+
+    def lookup(self, sentence, from_lang, to_lang):
+        """Return (translation, kind) for a sentence, kind in {'exact', 'fuzzy'}."""
+        translation = self.cache.get(self._key(sentence, from_lang, to_lang))
+        if translation is not None:
+            return translation, 'exact'
+
+        namespace = (from_lang, to_lang)
+        for candidate in self.index.query(namespace, sentence, self.fuzzy_threshold):
+            stored = self.cache.get(self._key(candidate, from_lang, to_lang))
+            if stored is None:
+                continue
+            adapted = substitute_placeholders(candidate, sentence, stored)
+            if adapted is not None:
+                return adapted, 'fuzzy'
+        return None, None
+
+    def store(self, sentence, from_lang, to_lang, translation):
+        self.cache.set(self._key(sentence, from_lang, to_lang), translation)
+        self.index.add((from_lang, to_lang), sentence)
+
+    def translate_sentences(self, sentences, from_lang, to_lang, translate_fn):
+        """Translate a list of sentences, sending only unknown ones upstream.
+
+        translate_fn(text) -> str performs one upstream request. Missing
+        sentences are joined with newlines into a single request; if the
+        result does not split back into the same number of lines, each
+        sentence is translated on its own.
+
+        Returns (translations, counts) where counts has exact, fuzzy and
+        upstream_characters.
+        """
+        translations = [None] * len(sentences)
+        counts = {'exact': 0, 'fuzzy': 0, 'upstream_characters': 0}
+        missing = OrderedDict()
+
+        with span('translation_memory.lookup', sentences=len(sentences)) as attrs:
+            for i, sentence in enumerate(sentences):
+                if not sentence.strip():
+                    translations[i] = sentence
+                    continue
+                translation, kind = self.lookup(sentence, from_lang, to_lang)
+                if translation is not None:
+                    translations[i] = translation
+                    counts[kind] += 1
+                else:
+                    missing.setdefault(sentence, []).append(i)
+            attrs.update(exact=counts['exact'], fuzzy=counts['fuzzy'], missing=len(missing))
+
+        if missing:
+            pending = list(missing)
+            results = None
+            if len(pending) > 1:
+                joined = BATCH_SEPARATOR.join(pending)
+                counts['upstream_characters'] += len(joined)
+                lines = (translate_fn(joined) or '').split(BATCH_SEPARATOR)
+                if len(lines) == len(pending):
+                    results = [line.strip() for line in lines]
+            if results is None:
+                results = []
+                for sentence in pending:
+                    counts['upstream_characters'] += len(sentence)
+                    results.append(translate_fn(sentence))
+
+            for sentence, translation in zip(pending, results):
+                if not translation:
+                    continue
+                self.store(sentence, from_lang, to_lang, translation)
+                for i in missing[sentence]:
+                    translations[i] = translation
+
+        return translations, counts
+
+    def translate(self, text, from_lang, to_lang, translate_fn):
+        """Translate text, reusing stored sentence translations.
+
+        Returns (translated_text, counts); translated_text is None if any
+        sentence could not be translated.
+        """
+        segments = split_sentences(text)
+        sentences = [sentence for sentence, _ in segments]
+        translations, counts = self.translate_sentences(sentences, from_lang, to_lang, translate_fn)
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['sentences'] += len(sentences)
+            self._stats['exact_hits'] += counts['exact']
+            self._stats['fuzzy_hits'] += counts['fuzzy']
+            self._stats['input_characters'] += len(text)
+            self._stats['upstream_characters'] += counts['upstream_characters']
+
+        if any(t is None for t in translations):
+            return None, counts
+        translated_text = ''.join(
+            translation + trailing
+            for translation, (_, trailing) in zip(translations, segments)
+        ).strip()
+        return translated_text, counts
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['indexed_sentences'] = len(self.index)
+        return stats
@@ -0,0 +1,163 @@
+"""Traffic statistics and cache warm-up.
+
+TrafficStats counts how often each short phrase is translated per language
+pair. Counts are buffered in memory and flushed to a SQLite file on the
+persistent /tmp disk, so they survive restarts and are shared by workers.
+
+run_warmup() pre-fills the caches with the top-N phrases per language pair,
+calling upstream at a limited rate. Only one worker per host runs it (an
+exclusive lock file decides which).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every worker may warm up
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Longer texts are unlikely to repeat verbatim and are not worth warming
+MAX_PHRASE_LENGTH = 200
+
+
+class TrafficStats:
+    """Per-(phrase, from_lang, to_lang) request counts."""
+
+    def __init__(self, path, flush_every=50, flush_interval=30.0, max_rows=20000):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._pending = {}
+        self._pending_total = 0
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS phrase_stats ('
+                    'text TEXT NOT NULL, from_lang TEXT NOT NULL, to_lang TEXT NOT NULL, '
+                    'count INTEGER NOT NULL, last_seen REAL NOT NULL, '
+                    'PRIMARY KEY (text, from_lang, to_lang))'
+                )
+            self._initialized = True
+        return conn
+
+    def record(self, text, from_lang, to_lang):
+        """Count one request; flushes to disk periodically."""
+        if len(text) > MAX_PHRASE_LENGTH:
+            return
+        with self._lock:
+            key = (text, from_lang, to_lang)
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self._pending_total += 1
+            due = (
+                self._pending_total >= self.flush_every
+                or time.time() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered counts to disk and prune the least recent rows."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._pending_total = 0
+            self._last_flush = time.time()
+        if not pending:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO phrase_stats (text, from_lang, to_lang, count, last_seen) '
+                    'VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (text, from_lang, to_lang) '
+                    'DO UPDATE SET count = count + excluded.count, last_seen = excluded.last_seen',
+                    [(t, f, to, count, now) for (t, f, to), count in pending.items()]
+                )
+                conn.execute(
+                    'DELETE FROM phrase_stats WHERE rowid IN ('
+                    'SELECT rowid FROM phrase_stats ORDER BY last_seen DESC LIMIT -1 OFFSET ?)',
+                    (self.max_rows,)
+                )
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not save traffic stats: {e}")
+
+    def top_phrases(self, per_pair=50, max_age_seconds=7 * 24 * 3600):
+        """Return {(from_lang, to_lang): [text, ...]} most requested first."""
+        try:
+            conn = self._connect()
+            rows = conn.execute(
+                'SELECT text, from_lang, to_lang FROM ('
+                'SELECT text, from_lang, to_lang, count, ROW_NUMBER() OVER ('
+                'PARTITION BY from_lang, to_lang ORDER BY count DESC) AS rank '
+                'FROM phrase_stats WHERE last_seen >= ?) '
+                'WHERE rank <= ? ORDER BY count DESC',
+                (time.time() - max_age_seconds, per_pair)
+            ).fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read traffic stats: {e}")
+            return {}
+        top = {}
+        for text, from_lang, to_lang in rows:
+            top.setdefault((from_lang, to_lang), []).append(text)
+        return top
+
+
+def acquire_warmup_lock(path):
+    """Return an open lock file if this process should run the warm-up."""
+    if fcntl is None:
+        return open(path, 'a')
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def run_warmup(stats, warm_phrase, per_pair=50, calls_per_second=1.0, max_calls=500):
+    """Pre-fill caches with the most requested phrases.
+
+    warm_phrase(text, from_lang, to_lang) fills the caches for one phrase
+    and returns True if it had to call upstream. Upstream calls are spaced
+    to at most calls_per_second and stop after max_calls.
+
+    Returns (phrases_checked, upstream_calls).
+    """
+    interval = 1.0 / calls_per_second if calls_per_second > 0 else 0
+    checked = 0
+    calls = 0
+    for (from_lang, to_lang), phrases in stats.top_phrases(per_pair).items():
+        for text in phrases:
+            if calls >= max_calls:
+                return checked, calls
+            checked += 1
+            try:
+                called_upstream = warm_phrase(text, from_lang, to_lang)
+            except Exception as e:
+                logger.warning(f"Warm-up of '{text[:30]}' ({from_lang}->{to_lang}) failed: {e}")
+                called_upstream = True
+            if called_upstream:
+                calls += 1
+                time.sleep(interval)
+    return checked, calls